@@ -1,23 +1,53 @@
+import io
+import itertools
 import json
 import os
+import time
 import uuid
 import zipfile
 from datetime import datetime
+from functools import wraps
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 from flask import (
     Flask,
+    Response,
     abort,
+    after_this_request,
+    g,
     jsonify,
+    make_response,
     render_template,
     request,
+    send_file,
     send_from_directory,
     url_for,
 )
 from PIL import Image
 from werkzeug.utils import secure_filename
 
+import bg_engine
+import chunked_upload
+import color_management
+import dedup
+import delivery
+import heic_engine
+import image_probe
+import meme_engine
+import multipage
+import palette
+import pipeline
+import profiling
+import qr_engine
+import scheduler
+import site_build
+import storage
+import strip_engine
+import zip_input
+from event_log import EventLog
+from job_store import JobStore
+
 # Optional ReportLab for PDF conversion
 try:
     from reportlab.pdfgen import canvas
@@ -27,14 +57,8 @@ try:
 except Exception:
     PDF_SUPPORTED = False
 
-# Optional HEIC decoding
-try:
-    from pillow_heif import register_heif_opener  # type: ignore
-
-    register_heif_opener()
-    HEIF_SUPPORTED = True
-except Exception:
-    HEIF_SUPPORTED = False
+# Optional HEIC decoding; heic_engine registers the Pillow opener with primary-image-only options
+HEIF_SUPPORTED = heic_engine.HEIF_SUPPORTED
 
 # Optional Real-ESRGAN support
 REAL_ESRGAN_STATE = {
@@ -46,14 +70,27 @@ REAL_ESRGAN_STATE = {
 BRAND_NAME = "ImageForge"
 ROOT_DIR = Path(__file__).resolve().parent
 UPLOAD_FOLDER = ROOT_DIR / "uploads"
+CHUNKED_FOLDER = UPLOAD_FOLDER / "chunked"
 CONVERTED_FOLDER = ROOT_DIR / "converted"
 METADATA_SUFFIX = ".json"
 MODEL_FOLDER = ROOT_DIR / "models"
+PROFILE_FOLDER = ROOT_DIR / "profiles"
+FEEDBACK_FOLDER = ROOT_DIR / "feedback"
+RATINGS_FOLDER = FEEDBACK_FOLDER / "ratings"
+DIST_FOLDER = ROOT_DIR / "static" / "dist"
+STORAGE_FOLDER = ROOT_DIR / "storage"
+JOB_DB_PATH = Path(os.environ.get("IMAGEFORGE_JOB_DB", str(ROOT_DIR / "jobs.sqlite3")))
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "bmp", "tiff", "ico", "heic"}
 CONVERT_FORMATS = {"png", "jpg", "jpeg", "webp", "gif", "bmp", "tiff", "ico", "pdf"}
 MAX_SINGLE_BATCH = 10
-MAX_HEIC_BATCH = 5
+# HEIC decodes run ahead in parallel under HEIC_MEMORY_BUDGET_MB, so HEIC batches can match the normal cap
+MAX_HEIC_BATCH = int(os.environ.get("MAX_HEIC_BATCH", "10"))
 MAX_FILE_SIZE = 15 * 1024 * 1024  # 15MB
+# /api/convert decodes, resizes and encodes several uploads at once; Pillow releases the GIL meanwhile
+CONVERT_WORKERS = max(1, int(os.environ.get("CONVERT_WORKERS", str(min(4, os.cpu_count() or 1)))))
+CONVERT_MEMORY_BUDGET = int(os.environ.get("CONVERT_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+# Pillow refuses to decode above twice its warning threshold; only the strip engine goes beyond
+DECODE_MAX_PIXELS = 2 * Image.MAX_IMAGE_PIXELS
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("IMAGEFORGE_SECRET", os.urandom(24))
@@ -67,6 +104,16 @@ UPLOAD_FOLDER.mkdir(exist_ok=True)
 CONVERTED_FOLDER.mkdir(exist_ok=True)
 MODEL_FOLDER.mkdir(exist_ok=True)
 
+JOB_STORE = JobStore(JOB_DB_PATH)
+FEEDBACK_LOG = EventLog(FEEDBACK_FOLDER, "feedback")
+LANES = scheduler.LaneScheduler()
+RATINGS_LOG = EventLog(RATINGS_FOLDER, "ratings")
+# Generated files, stored by content hash; STORAGE_BACKEND=s3 switches to an S3-compatible bucket
+STORAGE = storage.from_env(STORAGE_FOLDER)
+# Pages and bundles from `python cli.py build-site`, served from memory when enabled
+PRERENDERED_SITE = os.environ.get("PRERENDERED_SITE", "false").lower() == "true"
+SITE = site_build.load(DIST_FOLDER, int(os.environ.get("PAGE_MAX_AGE", "300"))) if PRERENDERED_SITE else None
+
 
 def extension_from_name(name: str) -> str:
     return name.rsplit(".", 1)[-1].lower() if "." in name else ""
@@ -111,6 +158,107 @@ def branded_filename(original_name: str, output_ext: str, used: set) -> str:
     return candidate
 
 
+def stored_url(key: str, name: str, download: bool = False) -> str:
+    """URL of a stored output; ``name`` is only the filename the browser sees"""
+    if download:
+        return url_for("stored_file", key=key, name=name, download="true")
+    return url_for("stored_file", key=key, name=name)
+
+
+def store_output(path: Path, ext: str) -> Tuple[str, int]:
+    """Commit a finished output from ``STORAGE.staging`` and return its key and size"""
+    size_bytes = path.stat().st_size
+    return STORAGE.commit(path, ext), size_bytes
+
+
+def uploaded_files(field: str) -> list:
+    """Multipart files for ``field`` plus any completed chunked uploads named in ``upload_ids``"""
+    files = [item for item in request.files.getlist(field) if item.filename]
+    upload_ids = request.form.getlist("upload_ids") or request.form.getlist("upload_id")
+    for upload_id in upload_ids:
+        handle = chunked_upload.take_completed(CHUNKED_FOLDER, upload_id)
+        files.append(handle)
+
+        @after_this_request
+        def discard_upload(response, handle=handle):
+            handle.discard()
+            return response
+
+    return files
+
+
+def _upload_cost(stream, filename: str, operation: str, enhance: bool) -> float:
+    try:
+        width, height = strip_engine.probe_size(stream)
+        pixels = width * height
+    except Exception:
+        stream.seek(0, os.SEEK_END)
+        pixels = int(stream.tell() / scheduler.FALLBACK_BYTES_PER_PIXEL)
+        stream.seek(0)
+    input_format = normalise_extension(extension_from_name(filename))
+    return scheduler.estimate_cost(pixels, input_format, operation, enhance)
+
+
+def estimate_request_cost(operation: str) -> float:
+    """Header-only cost estimate for every upload in the current request"""
+    enhance = request.form.get("enhance", "false").lower() == "true"
+    if operation == "batch":
+        operation = request.form.get("operation", "convert")
+    if operation == "compress" and (request.form.get("max_size") or request.form.get("target_size")):
+        operation = "compress_target"
+
+    cost = 0.0
+    for key in request.files:
+        for storage in request.files.getlist(key):
+            if storage.filename:
+                cost += _upload_cost(storage.stream, storage.filename, operation, enhance)
+    for upload_id in request.form.getlist("upload_ids") or request.form.getlist("upload_id"):
+        try:
+            state = chunked_upload.get_session(CHUNKED_FOLDER, upload_id)
+            with open(chunked_upload.part_path(CHUNKED_FOLDER, upload_id), "rb") as stream:
+                cost += _upload_cost(stream, state["filename"], operation, enhance)
+        except (chunked_upload.UploadError, OSError):
+            # Unknown uploads are rejected by the route itself
+            continue
+    return cost
+
+
+def scheduled(operation: str):
+    """Run the view in the fast or heavy lane, depending on the estimated cost of its uploads"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cost = estimate_request_cost(operation)
+            try:
+                with LANES.slot(cost) as lane:
+                    response = make_response(view(*args, **kwargs))
+            except scheduler.LaneBusy as err:
+                response = jsonify({"success": False, "error": str(err)})
+                response.status_code = 503
+                response.headers["Retry-After"] = "5"
+                lane = err.lane
+            response.headers["X-ImageForge-Lane"] = lane
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def probe_upload(source, streamable: bool = False) -> Dict:
+    """Header-only validation, so unreadable or oversized images fail before any pixel decode"""
+    info = image_probe.probe(source)
+    limit = strip_engine.STRIP_MAX_PIXELS if streamable else DECODE_MAX_PIXELS
+    image_probe.check_pixels(info["width"], info["height"], limit)
+    return info
+
+
+def uploaded_file(field: str):
+    files = uploaded_files(field)
+    return files[0] if files else None
+
+
 def init_realesrgan() -> None:
     if REAL_ESRGAN_STATE["ready"] or REAL_ESRGAN_STATE["error"]:
         return
@@ -179,6 +327,7 @@ def process_convert(image: Image.Image, options: Dict, original_ext: str) -> Tup
     if target_format not in CONVERT_FORMATS:
         raise ValueError(f"Unsupported output format: {target_format}")
 
+    image = color_management.to_srgb(image)
     output = image
     pil_format = resolve_pil_format(target_format)
     save_kwargs: Dict = {"format": pil_format}
@@ -190,6 +339,10 @@ def process_convert(image: Image.Image, options: Dict, original_ext: str) -> Tup
         save_kwargs.update({"optimize": True})
     elif target_format == "webp":
         save_kwargs.update({"quality": 85, "method": 6})
+    elif target_format == "tiff":
+        compression = multipage.parse_compression(options.get("compression"))
+        output = multipage.tiff_ready(image, compression)
+        save_kwargs = multipage.tiff_save_kwargs(compression)
     elif target_format == "ico":
         size = min(max(image.width, image.height), 256)
         output = image.resize((size, size), Image.LANCZOS)
@@ -200,51 +353,113 @@ def process_convert(image: Image.Image, options: Dict, original_ext: str) -> Tup
     return output, target_format, {"save_kwargs": save_kwargs, "original_format": original_ext}
 
 
-def convert_image_to_pdf(image: Image.Image, output_path: Path) -> None:
-    """Convert an image to PDF format using ReportLab"""
+def convert_image_to_pdf(image, output_path: Path) -> None:
+    """Convert an image, or an iterable of pages, to PDF format using ReportLab"""
     if not PDF_SUPPORTED:
         raise ValueError("PDF conversion not supported. Install reportlab: pip install reportlab")
     
-    # Convert to RGB if necessary
-    if image.mode in ('RGBA', 'LA', 'P'):
-        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-        if image.mode == 'P':
-            image = image.convert('RGBA')
-        rgb_image.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-        image = rgb_image
-    elif image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Create PDF with image dimensions
-    pdf_canvas = canvas.Canvas(str(output_path), pagesize=(image.width, image.height))
-    
-    # Draw image on PDF
-    img_reader = ImageReader(image)
-    pdf_canvas.drawImage(img_reader, 0, 0, width=image.width, height=image.height)
+    pages = [image] if isinstance(image, Image.Image) else image
+    pdf_canvas = None
+    for image in pages:
+        image = color_management.to_srgb(image)
+        # Convert to RGB if necessary
+        if image.mode in ('RGBA', 'LA', 'P'):
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            if image.mode == 'P':
+                image = image.convert('RGBA')
+            rgb_image.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+            image = rgb_image
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Create PDF with image dimensions; each page takes the size of its image
+        if pdf_canvas is None:
+            pdf_canvas = canvas.Canvas(str(output_path), pagesize=(image.width, image.height))
+        else:
+            pdf_canvas.setPageSize((image.width, image.height))
+        
+        # Draw image on PDF; ReportLab copies the pixels here, so the page can be released
+        img_reader = ImageReader(image)
+        pdf_canvas.drawImage(img_reader, 0, 0, width=image.width, height=image.height)
+        pdf_canvas.showPage()
     
+    if pdf_canvas is None:
+        raise ValueError("No pages to convert.")
     # Save PDF
     pdf_canvas.save()
 
 
+def write_pages(pages, output_path: Path, output_ext: str, save_kwargs: Dict, compression: Optional[str], stem: str) -> None:
+    """One multi-page PDF or TIFF, or a ZIP holding one ``output_ext`` image per page"""
+    if output_ext == "pdf":
+        convert_image_to_pdf(pages, output_path)
+    elif output_ext == "tiff":
+        multipage.write_tiff(pages, output_path, compression)
+    else:
+        multipage.write_zip(pages, output_path, secure_filename(stem) or "page", output_ext, save_kwargs)
 
-def process_resize(image: Image.Image, options: Dict) -> Tuple[Image.Image, str, Dict]:
+
+def process_pages(
+    document: Image.Image,
+    output_base: Path,
+    stem: str,
+    operation: str,
+    options: Dict,
+    original_ext: str,
+    enhance: bool,
+) -> Tuple[Path, str, Dict]:
+    """Run ``operation`` on every page of a multi-page TIFF while holding one decoded page.
+
+    Returns the output path, its extension (``pdf``, ``tiff`` or ``zip``) and the first page's extras.
+    """
+    state: Dict = {}
+
+    def processed():
+        for page in multipage.iter_pages(document):
+            page = color_management.to_srgb(page)
+            if page.mode not in {"RGB", "RGBA", "L", "LA"}:
+                # Bilevel fax pages stay single-channel instead of growing to RGBA
+                page = page.convert("L" if page.mode == "1" else "RGBA")
+            output, output_ext, extra = prepare_operation(page, operation, options, original_ext)
+            output, note = enhance_image_if_requested(output, enhance)
+            state.setdefault("first", (output_ext, extra, note))
+            yield output
+
+    pages = processed()
+    first = next(pages)
+    output_ext, extra, note = state["first"]
+    container = multipage.container_ext(output_ext)
+    output_path = output_base.with_name(f"{output_base.name}.{container}")
+    save_kwargs = dict(extra.get("save_kwargs", {}))
+    save_kwargs.setdefault("format", resolve_pil_format(output_ext))
+    compression = multipage.parse_compression(options.get("compression"))
+    write_pages(itertools.chain([first], pages), output_path, output_ext, save_kwargs, compression, stem)
+    return output_path, container, {**extra, "page_format": output_ext, "pages": document.n_frames, "enhancement": note}
+
+
+def resize_dimensions(size: Tuple[int, int], options: Dict) -> Tuple[int, int]:
+    image_width, image_height = size
     mode = options.get("resize_mode", "pixels")
     maintain_aspect = options.get("maintain_aspect", "true").lower() == "true"
 
     if mode == "percentage":
         percentage = parse_positive_int(options.get("percentage")) or 100
-        width = max(1, int(image.width * (percentage / 100)))
-        height = max(1, int(image.height * (percentage / 100)))
+        width = max(1, int(image_width * (percentage / 100)))
+        height = max(1, int(image_height * (percentage / 100)))
     else:
-        width = parse_positive_int(options.get("width")) or image.width
-        height = parse_positive_int(options.get("height")) or image.height
+        width = parse_positive_int(options.get("width")) or image_width
+        height = parse_positive_int(options.get("height")) or image_height
         if maintain_aspect:
-            aspect = image.width / image.height
+            aspect = image_width / image_height
             if width / height > aspect:
                 width = int(height * aspect)
             else:
                 height = int(width / aspect)
+    return width, height
 
+
+def process_resize(image: Image.Image, options: Dict) -> Tuple[Image.Image, str, Dict]:
+    width, height = resize_dimensions(image.size, options)
     resized = image.resize((width, height), Image.LANCZOS)
     return resized, "png", {
         "save_kwargs": {"format": "PNG", "optimize": True},
@@ -277,20 +492,25 @@ def process_compress(image: Image.Image, options: Dict, original_ext: str) -> Tu
     return output, target_format, {"save_kwargs": save_kwargs, "quality": quality}
 
 
-def process_crop(image: Image.Image, options: Dict) -> Tuple[Image.Image, str, Dict]:
+def crop_area(size: Tuple[int, int], options: Dict) -> Tuple[int, int, int, int]:
+    image_width, image_height = size
     x = parse_positive_int(options.get("x")) or 0
     y = parse_positive_int(options.get("y")) or 0
-    width = parse_positive_int(options.get("width")) or image.width
-    height = parse_positive_int(options.get("height")) or image.height
+    width = parse_positive_int(options.get("width")) or image_width
+    height = parse_positive_int(options.get("height")) or image_height
 
-    x = min(max(0, x), image.width - 1)
-    y = min(max(0, y), image.height - 1)
-    width = min(width, image.width - x)
-    height = min(height, image.height - y)
+    x = min(max(0, x), image_width - 1)
+    y = min(max(0, y), image_height - 1)
+    width = min(width, image_width - x)
+    height = min(height, image_height - y)
 
     if width <= 0 or height <= 0:
         raise ValueError("Invalid crop dimensions")
+    return x, y, width, height
 
+
+def process_crop(image: Image.Image, options: Dict) -> Tuple[Image.Image, str, Dict]:
+    x, y, width, height = crop_area(image.size, options)
     cropped = image.crop((x, y, x + width, y + height))
     return cropped, "png", {
         "save_kwargs": {"format": "PNG", "optimize": True},
@@ -298,6 +518,42 @@ def process_crop(image: Image.Image, options: Dict) -> Tuple[Image.Image, str, D
     }
 
 
+def stream_output_ext(operation: str, options: Dict) -> Optional[str]:
+    """Format the strip engine would write for ``operation``, or ``None`` when it cannot stream it."""
+    if operation in {"resize", "crop"}:
+        output_ext = "png"
+    elif operation == "convert":
+        output_ext = normalise_extension(options.get("format", "png"))
+    else:
+        return None
+    return output_ext if output_ext in strip_engine.STREAMABLE_OUTPUTS else None
+
+
+def stream_operation(source_path: Path, output_path: Path, operation: str, options: Dict) -> Optional[Tuple[str, Dict]]:
+    """Run ``operation`` through the strip engine when the image is too large to decode at once.
+
+    Returns ``(output_ext, extra)``, or ``None`` when the normal in-memory path should be used.
+    """
+    size = strip_engine.probe_size(source_path)
+    output_ext = stream_output_ext(operation, options)
+    if output_ext is None or not strip_engine.should_stream(size, output_ext):
+        return None
+
+    if operation == "resize":
+        width, height = resize_dimensions(size, options)
+        strip_engine.stream_resize(source_path, output_path, (width, height), output_ext)
+        extra = {"original_size": f"{size[0]}x{size[1]}", "new_size": f"{width}x{height}"}
+    elif operation == "crop":
+        x, y, width, height = crop_area(size, options)
+        strip_engine.stream_crop(source_path, output_path, (x, y, x + width, y + height), output_ext)
+        extra = {"crop_area": f"{x},{y},{width},{height}"}
+    else:
+        strip_engine.stream_convert(source_path, output_path, output_ext)
+        extra = {"original_format": extension_from_name(source_path.name)}
+    extra["streamed"] = True
+    return output_ext, extra
+
+
 def prepare_operation(image: Image.Image, operation: str, options: Dict, original_ext: str) -> Tuple[Image.Image, str, Dict]:
     if operation == "resize":
         return process_resize(image, options)
@@ -317,7 +573,9 @@ def handle_file(
     job_id: str,
     index: int,
     used_names: set,
+    decoded: Optional[Tuple[Image.Image, Dict]] = None,
 ) -> Dict:
+    """Process one upload; ``decoded`` is a HEIC image already decoded by ``heic_engine.decode_ahead``"""
     original_name = manifest_entry.get("original_name") or file_storage.filename
     original_extension = normalise_extension(
         manifest_entry.get("original_extension") or extension_from_name(original_name)
@@ -345,34 +603,86 @@ def handle_file(
     working_extension = incoming_extension or original_extension or "tmp"
     temp_name = f"{job_id}_{index}.{working_extension}"
     temp_path = UPLOAD_FOLDER / temp_name
-    file_storage.save(temp_path)
-
     try:
-        image = Image.open(temp_path)
-        if image.mode not in {"RGB", "RGBA", "L", "LA"}:
-            image = image.convert("RGBA")
-
-        processed_image, output_ext, extra = prepare_operation(image, operation, options, original_extension)
-        processed_image, enhancement_note = enhance_image_if_requested(processed_image, enhance)
-
-        raw_filename = f"{job_id}_{index}.{output_ext}"
-        raw_path = CONVERTED_FOLDER / raw_filename
-        save_kwargs = extra.get("save_kwargs", {})
-        if "format" not in save_kwargs:
-            save_kwargs["format"] = resolve_pil_format(output_ext)
-        processed_image.save(raw_path, **save_kwargs)
-
+        # Inside the try: a zip member can fail partway through the write and leave a partial file
+        file_storage.save(temp_path)
+        info = probe_upload(temp_path, streamable=not enhance and stream_output_ext(operation, options) is not None)
+        size = (info["width"], info["height"])
+        if operation == "crop":
+            crop_area(size, options)
+        elif operation == "resize":
+            image_probe.check_pixels(*resize_dimensions(size, options), DECODE_MAX_PIXELS)
+
+        # Every page of a multi-page TIFF is processed unless only the first one is asked for
+        paged = info["format"] == "tiff" and info["frames"] > 1 and options.get("pages", "all") != "first"
+        pages = info["frames"] if paged else 1
+        heic = info["format"] == "heif"
+        heic_info = None
+        if paged or heic:
+            # Pages and HEIC images are decoded whole, never streamed
+            image_probe.check_pixels(*size, DECODE_MAX_PIXELS)
+
+        streamed = None
+        if not enhance and not paged and not heic:
+            stream_path = STORAGE.staging("streaming")
+            streamed = stream_operation(temp_path, stream_path, operation, options)
+
+        if paged:
+            with Image.open(temp_path) as document:
+                raw_path, output_ext, extra = process_pages(
+                    document,
+                    STORAGE.staging("pages").with_suffix(""),
+                    Path(original_name).stem,
+                    operation,
+                    options,
+                    original_extension,
+                    enhance,
+                )
+            enhancement_note = extra["enhancement"]
+        elif streamed is not None:
+            output_ext, extra = streamed
+            enhancement_note = None
+            raw_path = stream_path
+        else:
+            if heic and decoded is None:
+                decoded = heic_engine.open_primary(temp_path, heic_target(operation, options, enhance))
+            if decoded is not None:
+                image, heic_info = decoded
+            else:
+                image = Image.open(temp_path)
+            image = color_management.to_srgb(image)
+            if image.mode not in {"RGB", "RGBA", "L", "LA"}:
+                image = image.convert("RGBA")
+
+            operation_options = options
+            if heic_info and heic_info["source"] == "exif_preview":
+                # The preview is smaller than the original; resize to the size the original would get
+                width, height = resize_dimensions(heic_info["original_size"], options)
+                operation_options = {
+                    **options,
+                    "resize_mode": "pixels",
+                    "width": str(width),
+                    "height": str(height),
+                    "maintain_aspect": "false",
+                }
+            processed_image, output_ext, extra = prepare_operation(image, operation, operation_options, original_extension)
+            if heic_info and "original_size" in extra:
+                extra["original_size"] = "{}x{}".format(*heic_info["original_size"])
+            processed_image, enhancement_note = enhance_image_if_requested(processed_image, enhance)
+
+            raw_path = STORAGE.staging(output_ext)
+            save_kwargs = extra.get("save_kwargs", {})
+            if "format" not in save_kwargs:
+                save_kwargs["format"] = resolve_pil_format(output_ext)
+            processed_image.save(raw_path, **save_kwargs)
+
+        key, size_bytes = store_output(raw_path, output_ext)
         final_name = branded_filename(original_name, output_ext, used_names)
-        final_path = CONVERTED_FOLDER / final_name
-        if final_path.exists():
-            final_path.unlink()
-        raw_path.rename(final_path)
-
-        size_bytes = final_path.stat().st_size
-        download_url = url_for("download_file", filename=final_name, download="true")
+        download_url = stored_url(key, final_name, download=True)
 
         return {
             "display_name": final_name,
+            "storage_key": key,
             "original_name": original_name,
             "input_format": original_extension,
             "output_format": output_ext,
@@ -380,13 +690,65 @@ def handle_file(
             "download_url": download_url,
             "enhancement": enhancement_note,
             "converted_from_heic": converted_from_heic,
+            "pages": pages,
+            "heic_source": heic_info["source"] if heic_info else None,
         }
     finally:
         if temp_path.exists():
             temp_path.unlink()
 
 
-def create_metadata(job_id: str, results: list, bundle: Dict) -> Dict:
+def heic_target(operation: str, options: Dict, enhance: bool):
+    """Output size for a given source size when a smaller embedded preview could serve it, else ``None``"""
+    if operation != "resize" or enhance:
+        return None
+    return lambda size: resize_dimensions(size, options)
+
+
+def heic_decode_jobs(files: list, manifest: list, representatives: list, operation: str, options: Dict, enhance: bool) -> list:
+    """``decode_ahead`` jobs for the HEIC uploads that will be processed (duplicates reuse a result)"""
+    jobs = []
+    if not HEIF_SUPPORTED:
+        return jobs
+    target = heic_target(operation, options, enhance)
+    for index, file_storage in enumerate(files):
+        entry = manifest[index] if index < len(manifest) else {}
+        if representatives[index] != index or entry.get("converted_from_heic"):
+            continue
+        try:
+            info = probe_upload(file_storage.stream)
+        except ValueError:
+            # handle_file reports the problem for this file
+            continue
+        finally:
+            file_storage.stream.seek(0)
+        if info["format"] != "heif":
+            continue
+        data = file_storage.stream.read()
+        file_storage.stream.seek(0)
+        cost = heic_engine.decoded_bytes(info["width"], info["height"])
+        jobs.append((index, cost, lambda data=data: heic_engine.open_primary(io.BytesIO(data), target)))
+    return jobs
+
+
+def duplicate_result(original: Dict, manifest_entry: Dict, file_storage, used_names: set) -> Dict:
+    """Result for an upload identical to one already processed in this job"""
+    original_name = manifest_entry.get("original_name") or file_storage.filename
+    final_name = branded_filename(original_name, original["output_format"], used_names)
+    result = dict(original)
+    # Same bytes, same key: the stored object is shared and only the download name differs
+    result.update(
+        {
+            "display_name": final_name,
+            "original_name": original_name,
+            "download_url": stored_url(original["storage_key"], final_name, download=True),
+            "duplicate_of": original["display_name"],
+        }
+    )
+    return result
+
+
+def create_metadata(job_id: str, results: list, bundle: Dict, dedup_stats: Optional[Dict] = None) -> Dict:
     created_at = datetime.utcnow()
     metadata = {
         "id": job_id,
@@ -397,11 +759,10 @@ def create_metadata(job_id: str, results: list, bundle: Dict) -> Dict:
         "real_esrgan_status": REAL_ESRGAN_STATE.get("error"),
         "heif_supported": HEIF_SUPPORTED,
     }
+    if dedup_stats is not None:
+        metadata["dedup"] = dedup_stats
 
-    metadata_path = CONVERTED_FOLDER / f"{job_id}{METADATA_SUFFIX}"
-    with open(metadata_path, "w", encoding="utf-8") as handle:
-        json.dump(metadata, handle, indent=2)
-
+    JOB_STORE.save_job(metadata)
     return metadata
 
 
@@ -410,6 +771,32 @@ def inject_globals():
     return {"current_year": datetime.now().year}
 
 
+@app.before_request
+def start_request_profile():
+    if profiling.should_profile(request.headers.get(profiling.PROFILE_HEADER), request.path):
+        g.profile_started = time.perf_counter()
+        g.profiler = profiling.start()
+
+
+@app.after_request
+def finish_request_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        elapsed = time.perf_counter() - g.pop("profile_started")
+        route = request.url_rule.rule if request.url_rule else request.path
+        tags = profiling.describe_upload(request.files, request.form)
+        tags["status"] = response.status_code
+        name = profiling.finish(profiler, PROFILE_FOLDER, route, elapsed, tags)
+        response.headers["X-Profile-Id"] = name
+    return response
+
+
+@app.before_request
+def serve_prebuilt():
+    if SITE is not None and request.method in {"GET", "HEAD"} and not app.config.get("SITE_BUILDING"):
+        return SITE.respond(request.path)
+
+
 @app.route("/")
 def index():
     # Render converter page as the default landing page
@@ -644,19 +1031,11 @@ def api_feedback():
     try:
         data = request.get_json()
         
-        # Create feedback directory if it doesn't exist
-        feedback_dir = ROOT_DIR / "feedback"
-        feedback_dir.mkdir(exist_ok=True)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        feedback_type = data.get('type', 'feedback')
-        filename = f"{feedback_type}_{timestamp}_{uuid.uuid4().hex[:8]}.json"
-        
-        # Save feedback to file
-        feedback_file = feedback_dir / filename
-        with open(feedback_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Buffered append to the feedback event log (flushed in the background)
+        record = dict(data)
+        record.setdefault('type', 'feedback')
+        record['received_at'] = datetime.now().isoformat()
+        FEEDBACK_LOG.append(record)
         
         return jsonify({"success": True, "message": "Thank you for your feedback!"})
     except Exception as e:
@@ -669,35 +1048,70 @@ def api_submit_rating():
     try:
         data = request.get_json()
         
-        # Create ratings directory if it doesn't exist
-        ratings_dir = ROOT_DIR / "feedback" / "ratings"
-        ratings_dir.mkdir(parents=True, exist_ok=True)
-        
         # Add timestamp if not provided
         if 'timestamp' not in data:
             data['timestamp'] = datetime.now().isoformat()
         
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"rating_{timestamp}_{uuid.uuid4().hex[:8]}.json"
-        
-        # Save rating to file (this can be later synced to Google Sheets)
-        rating_file = ratings_dir / filename
-        with open(rating_file, 'w') as f:
-            json.dump(data, f, indent=2)
-        
-        # TODO: Integrate with Google Sheets API
-        # For now, we save to file. You can add Google Sheets integration here
+        # Buffered append to the ratings event log; summaries come from
+        # `python cli.py feedback-summary` (this can be later synced to Google Sheets)
+        RATINGS_LOG.append(data)
         
         return jsonify({"success": True, "message": "Thank you for your rating!"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.errorhandler(chunked_upload.UploadError)
+def handle_upload_error(err):
+    return jsonify({"success": False, "error": str(err), "offset": err.offset}), err.status
+
+
+@app.route("/api/uploads", methods=["POST"])
+def api_create_upload():
+    """Start a chunked, resumable upload"""
+    data = request.get_json(silent=True) or {}
+    size = parse_positive_int(str(data.get("size", "")))
+    filename = data.get("filename", "")
+    if extension_from_name(filename) not in ALLOWED_EXTENSIONS:
+        return jsonify({"success": False, "error": f"Unsupported file type: {extension_from_name(filename)}"}), 400
+    state = chunked_upload.create_session(CHUNKED_FOLDER, filename, size or 0, data.get("sha256"))
+    return jsonify({"success": True, **chunked_upload.public_state(state)}), 201
+
+
+@app.route("/api/uploads/<upload_id>", methods=["GET"])
+def api_upload_status(upload_id: str):
+    """Acknowledged offset of a chunked upload, used to resume"""
+    state = chunked_upload.get_session(CHUNKED_FOLDER, upload_id)
+    return jsonify({"success": True, **chunked_upload.public_state(state)})
+
+
+@app.route("/api/uploads/<upload_id>", methods=["PUT", "PATCH"])
+def api_upload_chunk(upload_id: str):
+    """Append one chunk (raw request body) at the Upload-Offset header"""
+    offset = request.headers.get("Upload-Offset", "")
+    if not offset.isdigit():
+        return jsonify({"success": False, "error": "Upload-Offset header is required."}), 400
+    state = chunked_upload.append_chunk(
+        CHUNKED_FOLDER,
+        upload_id,
+        int(offset),
+        request.stream,
+        request.headers.get("X-Chunk-SHA256"),
+    )
+    return jsonify({"success": True, **chunked_upload.public_state(state)})
+
+
+@app.route("/api/uploads/<upload_id>", methods=["DELETE"])
+def api_abort_upload(upload_id: str):
+    chunked_upload.abort_session(CHUNKED_FOLDER, upload_id)
+    return jsonify({"success": True})
+
+
 @app.route("/api/convert", methods=["POST"])
+@scheduled("convert")
 def api_convert():
     """Simple API endpoint for image conversion"""
-    files = request.files.getlist("files[]")
+    files = uploaded_files("files[]")
     if not files:
         return jsonify({"success": False, "error": "No files uploaded."}), 400
     
@@ -713,112 +1127,280 @@ def api_convert():
     if target_format not in CONVERT_FORMATS:
         return jsonify({"success": False, "error": f"Unsupported format: {target_format}"}), 400
     
-    # Create output directory if it doesn't exist
-    out_dir = ROOT_DIR / "static" / "out"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    
     items = []
     used_names = set()
+    processed: Dict[int, Dict] = {}
     
     try:
-        for file_storage in files:
+        dedup_mode = dedup.parse_mode(request.form.get("dedup"))
+        compression = multipage.parse_compression(request.form.get("compression"))
+    except ValueError as err:
+        return jsonify({"success": False, "error": str(err)}), 400
+
+    # Normalize rotation to 0-359 range
+    rotation = rotation % 360
+
+    def adjust(image: Image.Image) -> Image.Image:
+        # Apply rotation if specified
+        if rotation:
+            # PIL rotates counter-clockwise, so negate for clockwise rotation
+            image = image.rotate(-rotation, expand=True)
+
+        # Apply resizing if dimensions provided
+        if width or height:
+            new_width = width or image.width
+            new_height = height or image.height
+
+            if keep_aspect:
+                aspect = image.width / image.height
+                if new_width / new_height > aspect:
+                    new_width = int(new_height * aspect)
+                else:
+                    new_height = int(new_width / aspect)
+
+            image = image.resize((new_width, new_height), Image.LANCZOS)
+        return image
+
+    # Convert format if needed
+    save_kwargs = {"format": resolve_pil_format(target_format)}
+    if target_format in {"jpg", "jpeg"}:
+        save_kwargs.update({"quality": quality, "optimize": True})
+    elif target_format == "png":
+        save_kwargs.update({"optimize": True})
+    elif target_format == "webp":
+        save_kwargs.update({"quality": quality, "method": 6})
+    elif target_format == "tiff":
+        save_kwargs = multipage.tiff_save_kwargs(compression)
+
+    def prepare_page(image: Image.Image) -> Image.Image:
+        if target_format in {"jpg", "jpeg"}:
+            return image.convert("RGB")
+        if target_format == "tiff":
+            return multipage.tiff_ready(image, compression)
+        return image
+
+    def convert_one(file_storage, original_name: str) -> Tuple[str, str]:
+        """Decode, adjust, encode and store one upload; runs on a pipeline thread"""
+        image = Image.open(file_storage.stream)
+
+        if multipage.is_multipage(image):
+            # Every page goes through the same adjustments, one decoded page at a time
+            output_ext = multipage.container_ext(target_format)
+            output_path = STORAGE.staging(output_ext)
+            pages = (
+                prepare_page(adjust(color_management.to_srgb(page)))
+                for page in multipage.iter_pages(image)
+            )
+            write_pages(pages, output_path, target_format, save_kwargs, compression, Path(original_name).stem)
+        else:
+            image = adjust(color_management.to_srgb(image))
+
+            output_ext = target_format
+            output_path = STORAGE.staging(output_ext)
+
+            # Handle PDF conversion separately
+            if target_format == "pdf":
+                convert_image_to_pdf(image, output_path)
+            else:
+                # Save image
+                prepare_page(image).save(output_path, **save_kwargs)
+
+        key, _ = store_output(output_path, output_ext)
+        return output_ext, key
+
+    def attempt(work):
+        # A failed file becomes an error item in its place instead of ending the pipeline
+        try:
+            return work()
+        except Exception as err:
+            return err
+
+    try:
+        representatives = dedup.group_duplicates(files, dedup_mode)
+
+        # Header-only pass: which uploads get converted, and what each costs in memory
+        jobs = []
+        handled = set()
+        for index, file_storage in enumerate(files):
             if not file_storage.filename:
                 continue
-            
             original_name = secure_filename(file_storage.filename)
-            original_ext = extension_from_name(original_name)
-            
-            # Validate file type
-            if original_ext not in ALLOWED_EXTENSIONS:
-                items.append({
-                    "status": "error",
-                    "error": f"Unsupported file type: {original_ext}",
-                    "url": None
-                })
+            if extension_from_name(original_name) not in ALLOWED_EXTENSIONS:
                 continue
-            
+            if representatives[index] in handled:
+                continue
+            handled.add(index)
             try:
-                # Open image
-                image = Image.open(file_storage.stream)
-                
-                # Apply rotation if specified
-                if rotation and rotation != 0:
-                    # Normalize rotation to 0-359 range
-                    rotation = rotation % 360
-                    if rotation != 0:
-                        # PIL rotates counter-clockwise, so negate for clockwise rotation
-                        image = image.rotate(-rotation, expand=True)
-                
-                # Apply resizing if dimensions provided
-                if width or height:
-                    new_width = width or image.width
-                    new_height = height or image.height
-                    
-                    if keep_aspect:
-                        aspect = image.width / image.height
-                        if new_width / new_height > aspect:
-                            new_width = int(new_height * aspect)
-                        else:
-                            new_height = int(new_width / aspect)
-                    
-                    image = image.resize((new_width, new_height), Image.LANCZOS)
-                
-                # Convert format if needed
-                output = image
+                info = probe_upload(file_storage.stream)
+            except Exception as e:
+                jobs.append((index, 0, lambda e=e: e))
+                continue
+            # Source pixels plus the adjusted copy, 4 bytes each
+            cost = info["width"] * info["height"] * 8
+            jobs.append((index, cost, lambda fs=file_storage, name=original_name: attempt(lambda: convert_one(fs, name))))
+
+        outcomes = pipeline.run_ahead(jobs, CONVERT_MEMORY_BUDGET, CONVERT_WORKERS, "convert")
+        try:
+            for index, file_storage in enumerate(files):
+                if not file_storage.filename:
+                    continue
                 
-                # Generate output filename
-                base_name = Path(original_name).stem or "image"
-                output_name = branded_filename(original_name, target_format, used_names)
-                output_path = out_dir / output_name
+                original_name = secure_filename(file_storage.filename)
+                original_ext = extension_from_name(original_name)
                 
-                # Handle PDF conversion separately
-                if target_format == "pdf":
-                    convert_image_to_pdf(image, output_path)
+                # Validate file type
+                if original_ext not in ALLOWED_EXTENSIONS:
+                    items.append({
+                        "status": "error",
+                        "error": f"Unsupported file type: {original_ext}",
+                        "url": None
+                    })
+                    continue
+
+                # Same bytes as an earlier upload: reuse its output under this file's name
+                original_item = processed.get(representatives[index])
+                if original_item is not None:
+                    if original_item["status"] != "success":
+                        items.append(dict(original_item))
+                        continue
+                    output_name = branded_filename(original_name, extension_from_name(original_item["filename"]), used_names)
+                    items.append({
+                        "status": "success",
+                        "url": stored_url(original_item["storage_key"], output_name),
+                        "filename": output_name,
+                        "storage_key": original_item["storage_key"],
+                        "duplicate_of": original_item["filename"]
+                    })
+                    continue
+
+                # Results arrive in upload order, so names and items stay in request order
+                _, outcome = next(outcomes)
+                if isinstance(outcome, Exception):
+                    items.append({
+                        "status": "error",
+                        "error": str(outcome),
+                        "url": None
+                    })
                 else:
-                    pil_format = resolve_pil_format(target_format)
-                    save_kwargs = {"format": pil_format}
-                    
-                    if target_format in {"jpg", "jpeg"}:
-                        output = image.convert("RGB")
-                        save_kwargs.update({"quality": quality, "optimize": True})
-                    elif target_format == "png":
-                        save_kwargs.update({"optimize": True})
-                    elif target_format == "webp":
-                        save_kwargs.update({"quality": quality, "method": 6})
-                    
-                    # Save image
-                    output.save(output_path, **save_kwargs)
-                
-                # Generate URL
-                file_url = url_for("static", filename=f"out/{output_name}", _external=False)
-                
-                items.append({
-                    "status": "success",
-                    "url": file_url,
-                    "filename": output_name
-                })
-                
-            except Exception as e:
-                items.append({
-                    "status": "error",
-                    "error": str(e),
-                    "url": None
-                })
+                    output_ext, key = outcome
+                    output_name = branded_filename(original_name, output_ext, used_names)
+                    items.append({
+                        "status": "success",
+                        "url": stored_url(key, output_name),
+                        "filename": output_name,
+                        "storage_key": key
+                    })
+                processed[index] = items[-1]
+        finally:
+            outcomes.close()
         
-        return jsonify({"success": True, "items": items})
+        return jsonify({"success": True, "items": items, "dedup": dedup.summarize(representatives, dedup_mode)})
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/probe", methods=["POST"])
+def api_probe():
+    """Format, dimensions, mode, frames, orientation and ICC presence from headers only"""
+    files = uploaded_files("files[]")
+    if not files:
+        return jsonify({"success": False, "error": "No files uploaded."}), 400
+
+    items = []
+    for file_storage in files:
+        info = image_probe.probe_timed(file_storage.stream)
+        info["filename"] = secure_filename(file_storage.filename)
+        items.append(info)
+    return jsonify({"success": True, "items": items})
+
+
+@app.route("/api/palette", methods=["POST"])
+@scheduled("palette")
+def api_palette():
+    """Dominant colours, average colour and histogram for one or more images"""
+    files = uploaded_files("files[]")
+    if not files:
+        return jsonify({"success": False, "error": "No files uploaded."}), 400
+    if len(files) > palette.PALETTE_MAX_BATCH:
+        return jsonify({"success": False, "error": f"Batch limit is {palette.PALETTE_MAX_BATCH} files."}), 400
+
+    try:
+        options = palette.parse_options(request.form)
+    except ValueError as err:
+        return jsonify({"success": False, "error": str(err)}), 400
+
+    items = []
+    for file_storage in files:
+        item = {"filename": secure_filename(file_storage.filename)}
+        try:
+            probe_upload(file_storage.stream)
+            item.update(success=True, **palette.extract_file(file_storage.stream, **options))
+        except ValueError as err:
+            item.update(success=False, error=str(err))
+        except Exception:
+            item.update(success=False, error="Could not read the image.")
+        items.append(item)
+    return jsonify({"success": True, "items": items})
+
+
+@app.route("/api/meme", methods=["POST"])
+@scheduled("meme")
+def api_meme():
+    """Draw top/bottom captions with auto-fit sizing and an outline"""
+    file_storage = uploaded_file("image")
+    if file_storage is None:
+        return jsonify({"success": False, "error": "No image uploaded."}), 400
+
+    target_format = normalise_extension(request.form.get("format", "")) or "png"
+    if target_format not in {"png", "jpg", "jpeg", "webp"}:
+        return jsonify({"success": False, "error": f"Unsupported format: {target_format}"}), 400
+
+    try:
+        options = meme_engine.parse_options(request.form)
+        probe_upload(file_storage.stream)
+        image = color_management.to_srgb(Image.open(file_storage.stream))
+        output, layout = meme_engine.render(image, options)
+
+        save_kwargs = {"format": resolve_pil_format(target_format)}
+        if target_format in {"jpg", "jpeg"}:
+            output = output.convert("RGB")
+            save_kwargs.update({"quality": 90})
+        elif target_format == "webp":
+            save_kwargs.update({"quality": 90})
+
+        base_name = Path(secure_filename(file_storage.filename)).stem or "image"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_name = f"{base_name}_meme_{timestamp}.{target_format}"
+        output_path = STORAGE.staging(target_format)
+        output.save(output_path, **save_kwargs)
+        key, _ = store_output(output_path, target_format)
+    except ValueError as err:
+        return jsonify({"success": False, "error": str(err)}), 400
+    except Exception as err:
+        return jsonify({"success": False, "error": str(err)}), 500
+
+    return jsonify({
+        "success": True,
+        "url": stored_url(key, output_name),
+        "filename": output_name,
+        "storage_key": key,
+        "captions": layout,
+    })
+
+
+@app.route("/api/meme/fonts")
+def api_meme_fonts():
+    """Fonts available to the meme renderer, plus font and measurement cache statistics"""
+    return jsonify({"success": True, "fonts": meme_engine.available_fonts(), "cache": meme_engine.stats()})
+
+
 @app.route("/api/resize", methods=["POST"])
+@scheduled("resize")
 def api_resize():
     """API endpoint for image resizing"""
-    if "image" not in request.files:
-        return jsonify({"success": False, "error": "No image uploaded."}), 400
-    
-    file_storage = request.files["image"]
-    if not file_storage.filename:
+    file_storage = uploaded_file("image")
+    if file_storage is None:
         return jsonify({"success": False, "error": "No image uploaded."}), 400
     
     # Get resize parameters
@@ -833,10 +1415,6 @@ def api_resize():
     if target_format not in CONVERT_FORMATS:
         return jsonify({"success": False, "error": f"Unsupported format: {target_format}"}), 400
     
-    # Create output directory
-    out_dir = ROOT_DIR / "static" / "out"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    
     try:
         original_name = secure_filename(file_storage.filename)
         original_ext = extension_from_name(original_name)
@@ -845,54 +1423,62 @@ def api_resize():
         if original_ext not in ALLOWED_EXTENSIONS:
             return jsonify({"success": False, "error": f"Unsupported file type: {original_ext}"}), 400
         
-        # Open and resize image
-        image = Image.open(file_storage.stream)
-        resized = image.resize((width, height), Image.LANCZOS)
-        
-        # Convert format if needed
-        output = resized
-        pil_format = resolve_pil_format(target_format)
-        save_kwargs = {"format": pil_format}
-        
-        if target_format in {"jpg", "jpeg"}:
-            output = resized.convert("RGB")
-            save_kwargs.update({"quality": 85, "optimize": True})
-        elif target_format == "png":
-            save_kwargs.update({"optimize": True})
-        elif target_format == "webp":
-            save_kwargs.update({"quality": 85, "method": 6})
-        
         # Generate output filename
         base_name = Path(original_name).stem or "image"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_name = f"{base_name}_resized_{width}x{height}_{timestamp}.{target_format}"
-        output_path = out_dir / output_name
-        
-        # Save image
-        output.save(output_path, **save_kwargs)
+        output_path = STORAGE.staging(target_format)
+
+        streamable = target_format in strip_engine.STREAMABLE_OUTPUTS
+        info = probe_upload(file_storage.stream, streamable)
+        source_size = (info["width"], info["height"])
+        image_probe.check_pixels(width, height, strip_engine.STRIP_MAX_PIXELS if streamable else DECODE_MAX_PIXELS)
+        if strip_engine.should_stream(source_size, target_format):
+            # Band-by-band resize keeps memory flat for gigapixel sources
+            strip_engine.stream_resize(file_storage.stream, output_path, (width, height), target_format)
+        else:
+            # Open and resize image
+            image = Image.open(file_storage.stream)
+            resized = image.resize((width, height), Image.LANCZOS)
+
+            # Convert format if needed
+            output = resized
+            pil_format = resolve_pil_format(target_format)
+            save_kwargs = {"format": pil_format}
+
+            if target_format in {"jpg", "jpeg"}:
+                output = resized.convert("RGB")
+                save_kwargs.update({"quality": 85, "optimize": True})
+            elif target_format == "png":
+                save_kwargs.update({"optimize": True})
+            elif target_format == "webp":
+                save_kwargs.update({"quality": 85, "method": 6})
+
+            # Save image
+            output.save(output_path, **save_kwargs)
         
-        # Generate URL
-        file_url = url_for("static", filename=f"out/{output_name}", _external=False)
+        key, _ = store_output(output_path, target_format)
         
         return jsonify({
             "success": True,
-            "file": file_url,
+            "file": stored_url(key, output_name),
             "filename": output_name,
+            "storage_key": key,
             "dimensions": {"width": width, "height": height}
         })
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/crop", methods=["POST"])
+@scheduled("crop")
 def api_crop():
     """API endpoint for image cropping"""
-    if "image" not in request.files:
-        return jsonify({"success": False, "error": "No image uploaded."}), 400
-    
-    file_storage = request.files["image"]
-    if not file_storage.filename:
+    file_storage = uploaded_file("image")
+    if file_storage is None:
         return jsonify({"success": False, "error": "No image uploaded."}), 400
     
     # Get crop parameters
@@ -904,10 +1490,6 @@ def api_crop():
     if x is None or y is None or not width or not height:
         return jsonify({"success": False, "error": "Crop coordinates (x, y, width, height) are required."}), 400
     
-    # Create output directory
-    out_dir = ROOT_DIR / "static" / "out"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    
     try:
         original_name = secure_filename(file_storage.filename)
         original_ext = extension_from_name(original_name)
@@ -916,65 +1498,70 @@ def api_crop():
         if original_ext not in ALLOWED_EXTENSIONS:
             return jsonify({"success": False, "error": f"Unsupported file type: {original_ext}"}), 400
         
-        # Open image
-        image = Image.open(file_storage.stream)
-        
-        # Validate crop bounds
-        if x < 0 or y < 0 or x + width > image.width or y + height > image.height:
+        # Determine output format
+        target_format = original_ext if original_ext in CONVERT_FORMATS else "png"
+
+        # Validate crop bounds from the header alone
+        info = probe_upload(file_storage.stream, target_format in strip_engine.STREAMABLE_OUTPUTS)
+        image_width, image_height = info["width"], info["height"]
+        if x < 0 or y < 0 or x + width > image_width or y + height > image_height:
             return jsonify({
                 "success": False, 
-                "error": f"Crop area out of bounds. Image size: {image.width}x{image.height}"
+                "error": f"Crop area out of bounds. Image size: {image_width}x{image_height}"
             }), 400
-        
-        # Crop image
-        cropped = image.crop((x, y, x + width, y + height))
-        
-        # Determine output format
-        target_format = original_ext if original_ext in CONVERT_FORMATS else "png"
-        pil_format = resolve_pil_format(target_format)
-        save_kwargs = {"format": pil_format}
-        
-        output = cropped
-        if target_format in {"jpg", "jpeg"}:
-            output = cropped.convert("RGB")
-            save_kwargs.update({"quality": 95, "optimize": True})
-        elif target_format == "png":
-            save_kwargs.update({"optimize": True})
-        elif target_format == "webp":
-            save_kwargs.update({"quality": 95, "method": 6})
-        
+
         # Generate output filename
         base_name = Path(original_name).stem or "image"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_name = f"{base_name}_cropped_{width}x{height}_{timestamp}.{target_format}"
-        output_path = out_dir / output_name
-        
-        # Save image
-        output.save(output_path, **save_kwargs)
+        output_path = STORAGE.staging(target_format)
+
+        if strip_engine.should_stream((image_width, image_height), target_format):
+            # Only the bands covering the crop box are decoded
+            strip_engine.stream_crop(file_storage.stream, output_path, (x, y, x + width, y + height), target_format)
+        else:
+            # Open and crop image
+            image = Image.open(file_storage.stream)
+            cropped = image.crop((x, y, x + width, y + height))
+
+            pil_format = resolve_pil_format(target_format)
+            save_kwargs = {"format": pil_format}
+
+            output = cropped
+            if target_format in {"jpg", "jpeg"}:
+                output = cropped.convert("RGB")
+                save_kwargs.update({"quality": 95, "optimize": True})
+            elif target_format == "png":
+                save_kwargs.update({"optimize": True})
+            elif target_format == "webp":
+                save_kwargs.update({"quality": 95, "method": 6})
+
+            # Save image
+            output.save(output_path, **save_kwargs)
         
-        # Generate URL
-        file_url = url_for("static", filename=f"out/{output_name}", _external=False)
+        key, _ = store_output(output_path, target_format)
         
         return jsonify({
             "success": True,
-            "url": file_url,
+            "url": stored_url(key, output_name),
             "filename": output_name,
+            "storage_key": key,
             "dimensions": {"width": width, "height": height},
             "crop": {"x": x, "y": y}
         })
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/compress", methods=["POST"])
+@scheduled("compress")
 def api_compress():
     """API endpoint for image compression"""
-    if "image" not in request.files:
-        return jsonify({"success": False, "error": "No image uploaded."}), 400
-    
-    file_storage = request.files["image"]
-    if not file_storage.filename:
+    file_storage = uploaded_file("image")
+    if file_storage is None:
         return jsonify({"success": False, "error": "No image uploaded."}), 400
     
     # Get compression parameters
@@ -989,10 +1576,6 @@ def api_compress():
     # Clamp quality to reasonable range
     quality = max(1, min(100, quality))
     
-    # Create output directory
-    out_dir = ROOT_DIR / "static" / "out"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    
     try:
         original_name = secure_filename(file_storage.filename)
         original_ext = extension_from_name(original_name)
@@ -1001,6 +1584,7 @@ def api_compress():
         if original_ext not in ALLOWED_EXTENSIONS:
             return jsonify({"success": False, "error": f"Unsupported file type: {original_ext}"}), 400
         
+        probe_upload(file_storage.stream)
         # Open image
         image = Image.open(file_storage.stream)
         
@@ -1030,7 +1614,7 @@ def api_compress():
         base_name = Path(original_name).stem or "image"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_name = f"{base_name}_compressed_{timestamp}.{target_format}"
-        output_path = out_dir / output_name
+        output_path = STORAGE.staging(target_format)
         
         # Save with compression
         from io import BytesIO
@@ -1095,27 +1679,27 @@ def api_compress():
             # Standard compression
             output.save(output_path, **save_kwargs)
         
-        # Get file size
-        file_size = output_path.stat().st_size
-        
-        # Generate URL
-        file_url = url_for("static", filename=f"out/{output_name}", _external=False)
+        key, file_size = store_output(output_path, target_format)
         
         return jsonify({
             "success": True,
-            "url": file_url,
+            "url": stored_url(key, output_name),
             "filename": output_name,
+            "storage_key": key,
             "size": file_size,
             "quality": quality
         })
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/batch-process", methods=["POST"])
+@scheduled("batch")
 def batch_process():
-    files = request.files.getlist("files")
+    files = uploaded_files("files")
     if not files:
         return jsonify({"success": False, "error": "No files uploaded."}), 400
 
@@ -1154,19 +1738,36 @@ def batch_process():
 
     results = []
     try:
-        for index, file_storage in enumerate(files):
-            entry = manifest[index] if index < len(manifest) else {}
-            result = handle_file(
-                file_storage=file_storage,
-                manifest_entry=entry,
-                operation=operation,
-                options=options,
-                enhance=enhance,
-                job_id=job_id,
-                index=index,
-                used_names=used_names,
-            )
-            results.append(result)
+        dedup_mode = dedup.parse_mode(request.form.get("dedup"))
+        # Identical bytes only share a result when the manifest says they are the same kind of input
+        dedup_keys = [
+            (normalise_extension(entry.get("original_extension", "")), bool(entry.get("converted_from_heic", False)))
+            for entry in manifest
+        ]
+        representatives = dedup.group_duplicates(files, dedup_mode, dedup_keys)
+        jobs = heic_decode_jobs(files, manifest, representatives, operation, options, enhance)
+        heic_indexes = {job[0] for job in jobs}
+        decoded_images = heic_engine.decode_ahead(jobs)
+        try:
+            for index, file_storage in enumerate(files):
+                entry = manifest[index] if index < len(manifest) else {}
+                if representatives[index] != index:
+                    results.append(duplicate_result(results[representatives[index]], entry, file_storage, used_names))
+                    continue
+                result = handle_file(
+                    file_storage=file_storage,
+                    manifest_entry=entry,
+                    operation=operation,
+                    options=options,
+                    enhance=enhance,
+                    job_id=job_id,
+                    index=index,
+                    used_names=used_names,
+                    decoded=next(decoded_images)[1] if index in heic_indexes else None,
+                )
+                results.append(result)
+        finally:
+            decoded_images.close()
     except ValueError as err:
         return jsonify({"success": False, "error": str(err)}), 400
     except Exception as err:  # pragma: no cover - runtime guard
@@ -1177,16 +1778,18 @@ def batch_process():
 
     if len(results) > 1:
         zip_name = f"{job_id}_bundle.zip"
-        zip_path = CONVERTED_FOLDER / zip_name
+        zip_path = STORAGE.staging("zip")
         with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
             for item in results:
-                archive.write(CONVERTED_FOLDER / item["display_name"], arcname=item["display_name"])
+                STORAGE.copy_into(item["storage_key"], archive, item["display_name"])
+        zip_key, _ = store_output(zip_path, "zip")
         bundle = {
             "type": "zip",
             "filename": zip_name,
+            "storage_key": zip_key,
             "label": "images (.zip)",
             "button_text": "Download all images",
-            "download_url": url_for("download_file", filename=zip_name, download="true"),
+            "download_url": stored_url(zip_key, zip_name, download=True),
         }
     else:
         single = results[0]
@@ -1198,11 +1801,114 @@ def batch_process():
             "download_url": single["download_url"],
         }
 
-    metadata = create_metadata(job_id, results, bundle)
-    redirect_url = url_for("download_page", job_id=job_id)
+    metadata = create_metadata(job_id, results, bundle, dedup.summarize(representatives, dedup_mode))
+    redirect_url = url_for("api_job", job_id=job_id)
     return jsonify({"success": True, "redirect_url": redirect_url, "job": metadata})
 
 
+@app.route("/api/batch-zip", methods=["POST"])
+@scheduled("batch")
+def batch_zip():
+    """Batch job from one ZIP upload; members are streamed in and outputs streamed into the bundle"""
+    file_storage = uploaded_file("archive")
+    if not file_storage:
+        return jsonify({"success": False, "error": "No archive uploaded."}), 400
+
+    operation = request.form.get("operation", "convert")
+    try:
+        options = json.loads(request.form.get("options", "{}"))
+    except json.JSONDecodeError:
+        return jsonify({"success": False, "error": "Invalid options payload."}), 400
+    enhance = request.form.get("enhance", "false").lower() == "true"
+
+    try:
+        dedup_mode = dedup.parse_mode(request.form.get("dedup"))
+        # Perceptual grouping needs every member decoded up front; archives only share identical bytes
+        if dedup_mode == "perceptual":
+            dedup_mode = "exact"
+        archive = zip_input.open_archive(file_storage.stream)
+        scanned = zip_input.scan(archive, ALLOWED_EXTENSIONS)
+    except ValueError as err:
+        return jsonify({"success": False, "error": str(err)}), 400
+
+    job_id = uuid.uuid4().hex
+    used_names: set = set()
+    results: list = []
+    representatives: list = []
+    skipped = scanned["skipped"]
+    # (CRC, size, extension) from the central directory -> processed results; only these get hashed
+    seen: Dict[tuple, list] = {}
+    digests: Dict[int, str] = {}
+    zip_name = f"{job_id}_bundle.zip"
+    zip_path = STORAGE.staging("zip")
+
+    with archive, zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as bundle_archive:
+        for index, member in enumerate(zip_input.iter_members(archive, scanned["accepted"])):
+            entry = {"original_name": member.filename}
+            key = member.dedup_key + (normalise_extension(extension_from_name(member.filename)),)
+            try:
+                original = None
+                if dedup_mode != "off":
+                    for candidate in seen.get(key, []):
+                        if member.digest() == digests[candidate]:
+                            original = candidate
+                            break
+                if original is not None:
+                    result = duplicate_result(results[original], entry, member, used_names)
+                    representatives.append(original)
+                else:
+                    result = handle_file(member, entry, operation, options, enhance, job_id, index, used_names)
+                    digests[len(results)] = member.sha256
+                    seen.setdefault(key, []).append(len(results))
+                    representatives.append(len(results))
+            except ValueError as err:
+                skipped.append({"name": member.info.filename, "reason": str(err)})
+                continue
+            except Exception:
+                skipped.append({"name": member.info.filename, "reason": "could not be processed"})
+                continue
+            results.append(result)
+            STORAGE.copy_into(result["storage_key"], bundle_archive, result["display_name"])
+
+    if not results:
+        zip_path.unlink(missing_ok=True)
+        return (
+            jsonify({"success": False, "error": "No images in the archive could be processed.", "skipped": skipped}),
+            400,
+        )
+
+    zip_key, _ = store_output(zip_path, "zip")
+    bundle = {
+        "type": "zip",
+        "filename": zip_name,
+        "storage_key": zip_key,
+        "label": "images (.zip)",
+        "button_text": "Download all images",
+        "download_url": stored_url(zip_key, zip_name, download=True),
+    }
+    metadata = create_metadata(job_id, results, bundle, dedup.summarize(representatives, dedup_mode))
+    redirect_url = url_for("api_job", job_id=job_id)
+    return jsonify({"success": True, "redirect_url": redirect_url, "job": metadata, "skipped": skipped})
+
+
+@app.route("/api/jobs/<job_id>")
+def api_job(job_id: str):
+    """Look up a processed job's metadata by id"""
+    metadata = JOB_STORE.get_job(job_id)
+    if metadata is None:
+        return jsonify({"success": False, "error": "Job not found."}), 404
+    return jsonify({"success": True, "job": metadata})
+
+
+@app.route("/files/<key>/<path:name>")
+def stored_file(key: str, name: str):
+    """A stored output by content key, offered under the friendly ``name``"""
+    if not storage.valid_key(key):
+        abort(404)
+    as_attachment = request.args.get("download", "false").lower() == "true"
+    return STORAGE.response(key, secure_filename(name) or key, as_attachment=as_attachment)
+
+
 @app.route("/download/<path:filename>")
 def download_file(filename: str):
     safe_name = secure_filename(filename)
@@ -1210,62 +1916,145 @@ def download_file(filename: str):
     if not file_path.exists():
         abort(404)
     as_attachment = request.args.get("download", "false").lower() == "true"
-    return send_from_directory(CONVERTED_FOLDER, safe_name, as_attachment=as_attachment)
+    return delivery.serve(CONVERTED_FOLDER, safe_name, as_attachment=as_attachment)
+
+
+@app.route("/static/out/<path:filename>")
+def static_output(filename: str):
+    """Generated files under static/out, served like /download instead of as plain static files"""
+    as_attachment = request.args.get("download", "false").lower() == "true"
+    return delivery.serve(ROOT_DIR / "static" / "out", filename, as_attachment=as_attachment)
 
 
 @app.route("/api/remove-bg", methods=["POST"])
+@scheduled("remove_bg")
 def remove_background():
-    """
-    Simple background removal API endpoint.
-    Note: This is a placeholder. For production, integrate rembg or similar library.
-    """
-    if "file" not in request.files:
+    """Background removal with the local ONNX model, or the near-white heuristic without one"""
+    file = uploaded_file("file")
+    if file is None:
         return jsonify({"error": "No file provided"}), 400
     
-    file = request.files["file"]
-    if not file or file.filename == "":
-        return jsonify({"error": "Invalid file"}), 400
-    
     try:
         from io import BytesIO
         from flask import send_file
         
+        probe_upload(file.stream)
         # Read the image
         img = Image.open(file.stream).convert("RGBA")
-        
-        # Simple placeholder: just return the image with transparent background
-        # In production, you would use rembg or similar:
-        # from rembg import remove
-        # img_no_bg = remove(img)
-        
-        # For now, create a simple alpha mask based on white background detection
-        data = img.getdata()
-        new_data = []
-        
-        for item in data:
-            # Change all white (also shades of whites) pixels to transparent
-            if item[0] > 200 and item[1] > 200 and item[2] > 200:
-                new_data.append((255, 255, 255, 0))
-            else:
-                new_data.append(item)
-        
-        img.putdata(new_data)
+        img, engine = bg_engine.remove(img)
         
         # Save to memory
         output = BytesIO()
         img.save(output, format="PNG")
         output.seek(0)
         
-        return send_file(
+        response = send_file(
             output,
             mimetype="image/png",
             as_attachment=False,
             download_name="removed_bg.png"
         )
+        response.headers["X-ImageForge-Bg-Engine"] = engine
+        return response
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/qr", methods=["POST"])
+def api_qr():
+    """Render one QR code, or a CSV/JSON list of payloads as a streamed ZIP bundle"""
+    if not qr_engine.QR_SUPPORTED:
+        return jsonify({"success": False, "error": "Server-side QR generation requires qrcode[pil]."}), 501
+
+    if request.is_json:
+        body = request.get_json(silent=True) or {}
+        options = body.get("options") or body
+    else:
+        body = None
+        if request.form.get("payload"):
+            body = {"payloads": [{"payload": request.form["payload"], "filename": request.form.get("filename")}]}
+        options = request.form
+
+    try:
+        spec = qr_engine.parse_render_options(options)
+        entries = qr_engine.parse_payloads(request.files.get("file"), body)
+    except ValueError as err:
+        return jsonify({"success": False, "error": str(err)}), 400
+
+    names = qr_engine.bundle_names(entries, spec["format"], f"{BRAND_NAME}_qr")
+    mimetype = qr_engine.QR_MIMETYPES[spec["format"]]
+
+    if len(entries) == 1 and request.args.get("bundle", "false").lower() != "true":
+        data = qr_engine.render_cached(entries[0][0], spec)
+        return Response(
+            data,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{names[0]}"'},
+        )
+
+    blobs = qr_engine.render_many([payload for payload, _ in entries], spec)
+    zip_name = f"{BRAND_NAME}_qr_{uuid.uuid4().hex[:8]}.zip"
+    return Response(
+        qr_engine.stream_zip(names, blobs),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{zip_name}"',
+            "X-QR-Count": str(len(entries)),
+        },
+    )
+
+
+@app.route("/api/qr/stats")
+def api_qr_stats():
+    """Render cache statistics for the QR engine"""
+    return jsonify({"success": True, "cache": qr_engine.RENDER_CACHE.stats(), "workers": qr_engine.QR_WORKERS})
+
+
+@app.route("/admin/profiles")
+def admin_profiles():
+    """List captured request profiles (requires the profiling secret)"""
+    if not profiling.verify_admin_token(request.headers.get("X-Admin-Token")):
+        abort(404)
+    return jsonify({"success": True, "profiles": profiling.list_profiles(PROFILE_FOLDER)})
+
+
+@app.route("/admin/lanes")
+def admin_lanes():
+    """Queue depth, concurrency and wait times per scheduler lane (requires the profiling secret)"""
+    if not profiling.verify_admin_token(request.headers.get("X-Admin-Token")):
+        abort(404)
+    return jsonify({"success": True, **LANES.metrics()})
+
+
+@app.route("/admin/color-cache")
+def admin_color_cache():
+    """Size and hit rate of the cached ICC transforms (requires the profiling secret)"""
+    if not profiling.verify_admin_token(request.headers.get("X-Admin-Token")):
+        abort(404)
+    return jsonify({"success": True, **color_management.stats()})
+
+
+@app.route("/admin/bg-engine")
+def admin_bg_engine():
+    """Background model sessions and batching statistics (requires the profiling secret)"""
+    if not profiling.verify_admin_token(request.headers.get("X-Admin-Token")):
+        abort(404)
+    return jsonify({"success": True, **bg_engine.stats()})
+
+
+@app.route("/admin/profiles/<name>")
+def admin_profile_download(name: str):
+    """Download one captured .pstats file"""
+    if not profiling.verify_admin_token(request.headers.get("X-Admin-Token")):
+        abort(404)
+    safe_name = secure_filename(name)
+    if not (PROFILE_FOLDER / f"{safe_name}.pstats").exists():
+        abort(404)
+    return send_from_directory(PROFILE_FOLDER, f"{safe_name}.pstats", as_attachment=True)
+
+
 if __name__ == "__main__":  # pragma: no cover
     app.run(debug=True, port=5004)
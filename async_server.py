@@ -0,0 +1,365 @@
+"""Asyncio front-end for the Flask app.
+
+The event loop handles all socket I/O: it reads request headers, spools
+upload bodies to disk at whatever speed the client sends, and writes
+responses. File downloads go through ``loop.sendfile``. Only a fully received
+request reaches a worker, where Flask decodes, transforms and encodes it. The
+workers are a bounded thread pool; Pillow releases the GIL in its codecs and
+resamplers, and ``--processes`` forks more copies sharing one socket. Once
+``max_pending`` requests are waiting for a worker, new ones get an immediate
+503 with ``Retry-After``, so queues stay bounded.
+
+    python async_server.py --port 5004 --workers 4 --processes 2
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+HEADER_LIMIT = 64 * 1024
+HEADER_TIMEOUT = float(os.environ.get("ASYNC_HEADER_TIMEOUT", "15"))
+# Max seconds without receiving any body bytes; slow but steady uploads are fine
+BODY_IDLE_TIMEOUT = float(os.environ.get("ASYNC_BODY_IDLE_TIMEOUT", "30"))
+KEEPALIVE_TIMEOUT = float(os.environ.get("ASYNC_KEEPALIVE_TIMEOUT", "10"))
+SPOOL_IN_MEMORY = 1024 * 1024
+READ_BLOCK = 64 * 1024
+
+REASONS = {400: "Bad Request", 408: "Request Timeout", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class FileWrapper:
+    """``wsgi.file_wrapper``: lets the loop send files with ``loop.sendfile`` instead of a worker."""
+
+    def __init__(self, file, block_size: int = 8192):
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        while True:
+            block = self.file.read(self.block_size)
+            if not block:
+                return
+            yield block
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ClientError(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+class AsyncWSGIServer:
+    def __init__(self, app, workers: int = 4, max_pending: Optional[int] = None, max_body: Optional[int] = None, multiprocess: bool = False):
+        self.app = app
+        self.workers = workers
+        self.max_pending = max_pending if max_pending is not None else workers * 4
+        self.max_body = max_body if max_body is not None else app.config.get("MAX_CONTENT_LENGTH")
+        self.multiprocess = multiprocess
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsgi")
+        self.pending = 0
+        self.stats = {"connections": 0, "requests": 0, "rejected": 0}
+
+    # -- request parsing -------------------------------------------------------
+
+    async def _read_head(self, reader: asyncio.StreamReader, timeout: float) -> Optional[bytes]:
+        try:
+            return await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial.strip():
+                raise ClientError(400)
+            return None
+        except asyncio.LimitOverrunError:
+            raise ClientError(400)
+
+    async def _read_exactly(self, reader: asyncio.StreamReader, count: int, spool) -> None:
+        while count:
+            block = await asyncio.wait_for(reader.read(min(READ_BLOCK, count)), BODY_IDLE_TIMEOUT)
+            if not block:
+                raise ClientError(400)
+            spool.write(block)
+            count -= len(block)
+
+    async def _read_chunked(self, reader: asyncio.StreamReader, spool) -> int:
+        total = 0
+        while True:
+            line = await asyncio.wait_for(reader.readuntil(b"\r\n"), BODY_IDLE_TIMEOUT)
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise ClientError(400)
+            if size == 0:
+                # Skip trailers
+                while (await asyncio.wait_for(reader.readuntil(b"\r\n"), BODY_IDLE_TIMEOUT)) != b"\r\n":
+                    pass
+                return total
+            total += size
+            if self.max_body and total > self.max_body:
+                raise ClientError(413)
+            await self._read_exactly(reader, size, spool)
+            await asyncio.wait_for(reader.readexactly(2), BODY_IDLE_TIMEOUT)
+
+    def _environ(self, head: bytes, writer: asyncio.StreamWriter) -> Tuple[Dict, Dict[str, str]]:
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise ClientError(400)
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise ClientError(400)
+            key = name.strip().lower()
+            value = value.strip()
+            headers[key] = f"{headers[key]},{value}" if key in headers else value
+
+        path, _, query = target.partition("?")
+        server_name, server_port = writer.get_extra_info("sockname")[:2]
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method.upper(),
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(path, "latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": str(server_name),
+            "SERVER_PORT": str(server_port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": str(peer[0]),
+            "REMOTE_PORT": str(peer[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": self.multiprocess,
+            "wsgi.run_once": False,
+            "wsgi.file_wrapper": FileWrapper,
+            "wsgi.input_terminated": True,
+        }
+        for key, value in headers.items():
+            if key == "content-type":
+                environ["CONTENT_TYPE"] = value
+            elif key == "content-length":
+                environ["CONTENT_LENGTH"] = value
+            else:
+                environ["HTTP_" + key.upper().replace("-", "_")] = value
+        return environ, headers
+
+    async def _read_body(self, reader, writer, environ: Dict, headers: Dict[str, str]):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_IN_MEMORY)
+        try:
+            chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+            length = 0
+            if not chunked and headers.get("content-length"):
+                try:
+                    length = int(headers["content-length"])
+                except ValueError:
+                    raise ClientError(400)
+                if length < 0:
+                    raise ClientError(400)
+                if self.max_body and length > self.max_body:
+                    raise ClientError(413)
+            if (chunked or length) and headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            if chunked:
+                length = await self._read_chunked(reader, spool)
+                environ["CONTENT_LENGTH"] = str(length)
+            elif length:
+                await self._read_exactly(reader, length, spool)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        environ["wsgi.input"] = spool
+        return spool
+
+    # -- app dispatch ----------------------------------------------------------
+
+    def _call_app(self, environ: Dict):
+        """Runs in a worker: the whole Flask request, materialising any non-file body."""
+        captured: Dict = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            captured["status"] = status
+            captured["headers"] = response_headers
+            return lambda data: captured.setdefault("early", []).append(data)
+
+        result = self.app(environ, start_response)
+        if isinstance(result, FileWrapper):
+            return captured["status"], captured["headers"], result
+        try:
+            chunks = captured.get("early", []) + [chunk for chunk in result if chunk]
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return captured["status"], captured["headers"], chunks
+
+    async def _dispatch(self, environ: Dict):
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self.pool, self._call_app, environ)
+        finally:
+            self.pending -= 1
+
+    # -- responses -------------------------------------------------------------
+
+    async def _send_error(self, writer: asyncio.StreamWriter, status: int, retry_after: Optional[int] = None) -> None:
+        body = f"{status} {REASONS.get(status, '')}\n".encode()
+        extra = f"Retry-After: {retry_after}\r\n" if retry_after else ""
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n{extra}Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _send_response(self, writer, environ: Dict, status: str, headers: List, body, keep_alive: bool) -> bool:
+        names = {name.lower() for name, _ in headers}
+        is_file = isinstance(body, FileWrapper)
+        head_only = environ["REQUEST_METHOD"] == "HEAD" or status[:3] in {"204", "304"}
+        if "content-length" not in names:
+            if is_file:
+                keep_alive = False
+            else:
+                headers.append(("Content-Length", str(sum(len(chunk) for chunk in body))))
+        headers.append(("Connection", "keep-alive" if keep_alive else "close"))
+        lines = [f"HTTP/1.1 {status}"] + [f"{name}: {value}" for name, value in headers]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        try:
+            if head_only:
+                pass
+            elif is_file:
+                await writer.drain()
+                try:
+                    await asyncio.get_running_loop().sendfile(writer.transport, body.file)
+                except (AttributeError, OSError, asyncio.SendfileNotAvailableError):
+                    for block in body:
+                        writer.write(block)
+                        await writer.drain()
+            else:
+                for chunk in body:
+                    writer.write(chunk)
+            await writer.drain()
+        finally:
+            if is_file:
+                body.close()
+        return keep_alive
+
+    # -- connection loop -------------------------------------------------------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        timeout = HEADER_TIMEOUT
+        try:
+            while True:
+                head = await self._read_head(reader, timeout)
+                if head is None:
+                    return
+                environ, headers = self._environ(head, writer)
+                spool = await self._read_body(reader, writer, environ, headers)
+                try:
+                    if self.pending >= self.max_pending:
+                        self.stats["rejected"] += 1
+                        await self._send_error(writer, 503, retry_after=1)
+                        return
+                    self.stats["requests"] += 1
+                    status, response_headers, body = await self._dispatch(environ)
+                finally:
+                    spool.close()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if environ["SERVER_PROTOCOL"] == "HTTP/1.1" else connection == "keep-alive"
+                if not await self._send_response(writer, environ, status, list(response_headers), body, keep_alive):
+                    return
+                timeout = KEEPALIVE_TIMEOUT
+        except ClientError as err:
+            try:
+                await self._send_error(writer, err.status)
+            except ConnectionError:
+                pass
+        except asyncio.TimeoutError:
+            if timeout == HEADER_TIMEOUT:
+                try:
+                    await self._send_error(writer, 408)
+                except ConnectionError:
+                    pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, sock: socket.socket) -> None:
+        server = await asyncio.start_server(self.handle, sock=sock, limit=HEADER_LIMIT, backlog=2048)
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, lambda: stop.done() or stop.set_result(None))
+        async with server:
+            await stop
+        self.pool.shutdown(wait=True)
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.setblocking(False)
+    return sock
+
+
+def run(app, host: str, port: int, workers: int, processes: int, max_pending: Optional[int]) -> None:
+    sock = bind(host, port)
+    children = []
+    for _ in range(max(0, processes - 1)):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+
+    server = AsyncWSGIServer(app, workers=workers, max_pending=max_pending, multiprocess=processes > 1)
+    try:
+        asyncio.run(server.serve(sock))
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve ImageForge from an asyncio front-end.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5004")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ASYNC_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("ASYNC_PROCESSES", "1")))
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=int(os.environ["ASYNC_MAX_PENDING"]) if os.environ.get("ASYNC_MAX_PENDING") else None,
+        help="requests allowed to wait for a worker before answering 503 (default: 4 x workers)",
+    )
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    print(f"Serving on http://{args.host}:{args.port} ({args.processes} x {args.workers} workers)")
+    run(app, args.host, args.port, args.workers, args.processes, args.max_pending)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Slow-client load test: async front-end vs. a fixed pool of sync workers.
+
+``--slow`` clients each trickle a multipart upload (``--slow-rate`` bytes per
+second) while ``--fast`` clients loop small ``/api/resize`` requests for
+``--duration`` seconds. With sync workers, every slow upload holds a worker
+for the whole transfer, so fast requests queue behind it. The async server
+receives uploads on the event loop and only hands complete requests to its
+workers.
+
+    python benchmarks/async_load.py                       # both servers
+    python benchmarks/async_load.py --servers async --slow 2000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BOUNDARY = "ImageForgeLoadTest"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_sync(port: int, workers: int) -> None:
+    """Baseline: like gunicorn sync workers, each worker owns one connection at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from werkzeug.serving import BaseWSGIServer
+
+    sys.path.insert(0, str(ROOT_DIR))
+    from app import app
+
+    class PooledServer(BaseWSGIServer):
+        pool = ThreadPoolExecutor(max_workers=workers)
+        request_queue_size = 2048
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledServer("127.0.0.1", port, app).serve_forever()
+
+
+def _multipart(image: bytes) -> bytes:
+    parts = [
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="image"; filename="load.png"\r\n'
+        "Content-Type: image/png\r\n\r\n".encode() + image + b"\r\n",
+    ]
+    for name, value in (("width", "32"), ("height", "32"), ("format", "jpg")):
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def _request_head(length: int) -> bytes:
+    return (
+        f"POST /api/resize HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: multipart/form-data; boundary={BOUNDARY}\r\n"
+        f"Content-Length: {length}\r\nConnection: close\r\n\r\n"
+    ).encode()
+
+
+async def _exchange(port: int, head: bytes, body: bytes, rate: int = 0, timeout: float = 60.0) -> int:
+    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+    try:
+        writer.write(head)
+        if rate:
+            step = max(1, rate // 10)
+            for offset in range(0, len(body), step):
+                writer.write(body[offset:offset + step])
+                await writer.drain()
+                await asyncio.sleep(0.1)
+        else:
+            writer.write(body)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1]) if status_line else 0
+    finally:
+        writer.close()
+
+
+async def _load(port: int, args) -> Dict:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((256, 256), 64).convert("RGB").save(buffer, "PNG")
+    small = _multipart(buffer.getvalue())
+    buffer = io.BytesIO()
+    Image.effect_noise((512, 512), 64).convert("RGB").save(buffer, "PNG")
+    large = _multipart(buffer.getvalue())
+
+    deadline = time.perf_counter() + args.duration
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def slow_client() -> None:
+        while time.perf_counter() < deadline:
+            try:
+                await _exchange(port, _request_head(len(large)), large, rate=args.slow_rate, timeout=args.duration * 2)
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(0.5)
+
+    async def fast_client() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await _exchange(port, _request_head(len(small)), small, timeout=args.duration)
+            except (OSError, asyncio.TimeoutError):
+                status = 0
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            elif status == 503:
+                await asyncio.sleep(0.05)
+
+    slow_tasks = [asyncio.create_task(slow_client()) for _ in range(args.slow)]
+    await asyncio.sleep(1.0)  # let the slow uploads occupy connections first
+    await asyncio.gather(*(fast_client() for _ in range(args.fast)))
+    for task in slow_tasks:
+        task.cancel()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        "fast_ok": len(latencies),
+        "throughput_rps": round(len(latencies) / args.duration, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+        "statuses": {str(key): value for key, value in sorted(statuses.items())},
+    }
+
+
+def _start(kind: str, port: int, workers: int) -> subprocess.Popen:
+    if kind == "async":
+        command = [sys.executable, str(ROOT_DIR / "async_server.py"), "--port", str(port), "--workers", str(workers)]
+    else:
+        command = [sys.executable, __file__, "--serve-sync", str(port), "--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve-sync", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--servers", default="sync,async")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--slow", type=int, default=200, help="concurrent slow uploads")
+    parser.add_argument("--slow-rate", type=int, default=20_000, help="bytes per second per slow upload")
+    parser.add_argument("--fast", type=int, default=8, help="concurrent fast clients")
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args(argv)
+
+    if args.serve_sync:
+        serve_sync(args.serve_sync, args.workers)
+        return 0
+
+    report = {}
+    for kind in [item.strip() for item in args.servers.split(",") if item.strip()]:
+        port = _free_port()
+        process = _start(kind, port, args.workers)
+        try:
+            report[kind] = asyncio.run(_load(port, args))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        print(f"{kind:>5}: {json.dumps(report[kind])}")
+    for output in (ROOT_DIR / "static" / "out").glob("load_resized_*"):
+        output.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""Replay a mixed traffic scenario against a local ImageForge instance.
+
+Scenarios live in ``benchmarks/scenarios/*.json`` so capacity runs can be
+repeated. A scenario names payload profiles (synthetic images or captured
+files), a weighted mix of routes, a target request rate and a duration.
+Requests are issued open-loop: each one is scheduled at its arrival time, and
+latency is counted from that time, so queueing inside the app shows up in the
+percentiles instead of lowering the offered rate.
+
+By default requests go through Flask's test client in this process (no
+sockets at all). ``--url http://127.0.0.1:5004`` targets a running server.
+
+    python benchmarks/loadgen.py benchmarks/scenarios/mixed.json
+    python benchmarks/loadgen.py benchmarks/scenarios/smoke.json --rate 5 --duration 10 --json report.json
+"""
+
+import argparse
+import http.client
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Upload field used by each route
+ROUTE_FIELDS = {
+    "/api/convert": "files[]",
+    "/api/compress": "image",
+    "/api/resize": "image",
+    "/api/crop": "image",
+    "/api/batch-process": "files",
+    "/api/remove-bg": "file",
+}
+
+Payload = Tuple[str, bytes]
+
+
+def synthetic_image(spec: Dict, rng: random.Random) -> Payload:
+    """A deterministic test image: gradient background plus random shapes."""
+    from PIL import Image, ImageDraw
+
+    width, height = int(spec["width"]), int(spec["height"])
+    fmt = spec.get("format", "png").lower()
+    image = Image.merge(
+        "RGB",
+        (
+            Image.linear_gradient("L").resize((width, height)),
+            Image.linear_gradient("L").rotate(90).resize((width, height)),
+            Image.new("L", (width, height), rng.randrange(256)),
+        ),
+    )
+    draw = ImageDraw.Draw(image)
+    for _ in range(int(spec.get("shapes", 24))):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(1, max(2, width // 3)), y0 + rng.randrange(1, max(2, height // 3))
+        draw.ellipse((x0, y0, x1, y1), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+
+    buffer = io.BytesIO()
+    pil_format = {"jpg": "JPEG", "jpeg": "JPEG", "tif": "TIFF"}.get(fmt, fmt.upper())
+    if pil_format == "JPEG":
+        image.save(buffer, pil_format, quality=int(spec.get("quality", 90)))
+    else:
+        image.save(buffer, pil_format)
+    return f"synthetic_{width}x{height}.{fmt}", buffer.getvalue()
+
+
+def build_payloads(scenario: Dict, base_dir: Path, seed: int) -> Dict[str, List[Payload]]:
+    rng = random.Random(seed)
+    payloads: Dict[str, List[Payload]] = {}
+    for name, spec in scenario["payloads"].items():
+        if "synthetic" in spec:
+            variants = int(spec.get("variants", 1))
+            payloads[name] = [synthetic_image(spec["synthetic"], rng) for _ in range(variants)]
+        elif "files" in spec:
+            paths = sorted(base_dir.glob(spec["files"]))
+            payloads[name] = [(path.name, path.read_bytes()) for path in paths if path.is_file()]
+        else:
+            raise ValueError(f"Payload {name} needs 'synthetic' or 'files'")
+        if not payloads[name]:
+            raise ValueError(f"Payload {name} matched no files")
+    return payloads
+
+
+def load_scenario(path: Path) -> Dict:
+    with open(path, encoding="utf-8") as handle:
+        scenario = json.load(handle)
+    for entry in scenario["mix"]:
+        if entry["route"] not in ROUTE_FIELDS:
+            raise ValueError(f"Unsupported route in mix: {entry['route']}")
+        if entry["payload"] not in scenario["payloads"]:
+            raise ValueError(f"Unknown payload profile: {entry['payload']}")
+    return scenario
+
+
+def build_request(entry: Dict, payloads: Dict[str, List[Payload]], rng: random.Random) -> Tuple[Dict, List[Tuple[str, Payload]]]:
+    """Form fields and (field, file) pairs for one request of ``entry``."""
+    field = ROUTE_FIELDS[entry["route"]]
+    count = int(entry.get("files", 1))
+    files = [(field, rng.choice(payloads[entry["payload"]])) for _ in range(count)]
+    form = {key: value if isinstance(value, str) else json.dumps(value) for key, value in entry.get("form", {}).items()}
+    if entry["route"] == "/api/batch-process" and "manifest" not in form:
+        manifest = []
+        for _, (filename, _) in files:
+            manifest.append({"original_name": filename, "original_extension": filename.rsplit(".", 1)[-1]})
+        form["manifest"] = json.dumps(manifest)
+    return form, files
+
+
+def encode_multipart(form: Dict, files: List[Tuple[str, Payload]]) -> Tuple[str, bytes]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for key, value in form.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+    for field, (filename, data) in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return f"multipart/form-data; boundary={boundary}", b"".join(parts)
+
+
+class InProcessTarget:
+    """Calls the app through the Flask test client; one client per thread."""
+
+    def __init__(self):
+        sys.path.insert(0, str(ROOT_DIR))
+        from app import app
+
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, route: str, form: Dict, files: List[Tuple[str, Payload]]) -> int:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        content_type, body = encode_multipart(form, files)
+        response = client.post(route, data=body, content_type=content_type)
+        response.close()
+        return response.status_code
+
+
+class HttpTarget:
+    """A running local server; one keep-alive connection per thread."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self._local = threading.local()
+
+    def send(self, route: str, form: Dict, files: List[Tuple[str, Payload]]) -> int:
+        content_type, body = encode_multipart(form, files)
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                connection.request("POST", self.prefix + route, body=body, headers={"Content-Type": content_type})
+                response = connection.getresponse()
+                response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    connection.close()
+                    self._local.connection = None
+                return response.status
+            except (ConnectionError, http.client.HTTPException):
+                # Server closed the kept-alive connection; reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        return 0
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[Tuple[float, int]]] = {}
+
+    def add(self, route: str, latency: float, status: int) -> None:
+        with self._lock:
+            self.samples.setdefault(route, []).append((latency, status))
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return round(values[index] * 1000, 1)
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict:
+    routes = {}
+    everything: List[Tuple[float, int]] = []
+    for route, samples in sorted(recorder.samples.items()):
+        routes[route] = _route_summary(samples, elapsed)
+        everything.extend(samples)
+    return {"elapsed_s": round(elapsed, 2), "overall": _route_summary(everything, elapsed), "routes": routes}
+
+
+def _route_summary(samples: List[Tuple[float, int]], elapsed: float) -> Dict:
+    latencies = sorted(latency for latency, _ in samples)
+    statuses: Dict[str, int] = {}
+    errors = 0
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if not 200 <= status < 400:
+            errors += 1
+    return {
+        "requests": len(samples),
+        "throughput_rps": round((len(samples) - errors) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p90_ms": _percentile(latencies, 0.90),
+        "p99_ms": _percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def run(scenario: Dict, payloads: Dict[str, List[Payload]], target, rate: float, duration: float, concurrency: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    mix = scenario["mix"]
+    weights = [float(entry.get("weight", 1)) for entry in mix]
+    poisson = scenario.get("arrival", "poisson") == "poisson"
+    recorder = Recorder()
+
+    def fire(entry: Dict, form: Dict, files: List, scheduled: float) -> None:
+        try:
+            status = target.send(entry["route"], form, files)
+        except Exception:
+            status = 0
+        recorder.add(entry["route"], time.perf_counter() - scheduled, status)
+
+    started = time.perf_counter()
+    next_at = started
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while next_at < started + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            entry = rng.choices(mix, weights)[0]
+            form, files = build_request(entry, payloads, rng)
+            pool.submit(fire, entry, form, files, next_at)
+            next_at += rng.expovariate(rate) if poisson else 1.0 / rate
+    return summarize(recorder, time.perf_counter() - started)
+
+
+def _snapshot_outputs() -> set:
+    """Keys of every object in the app's output storage"""
+    from app import STORAGE
+
+    return {key for key, _ in STORAGE.objects()}
+
+
+def print_report(name: str, report: Dict) -> None:
+    offered = report["offered"]
+    print(
+        f"Scenario: {name} - {offered['rate']} req/s for {offered['duration']} s, "
+        f"{offered['concurrency']} in flight (finished in {report['elapsed_s']} s)"
+    )
+    header = f"{'route':<20} {'reqs':>6} {'ok/s':>8} {'err%':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["routes"].items()) + [("overall", report["overall"])]
+    for route, stats in rows:
+        print(
+            f"{route:<20} {stats['requests']:>6} {stats['throughput_rps']:>8} {stats['error_rate'] * 100:>6.1f}%"
+            + "".join(f" {stats[key] if stats[key] is not None else '-':>8}" for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms"))
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", type=Path)
+    parser.add_argument("--url", help="base URL of a running local server (default: in-process test client)")
+    parser.add_argument("--rate", type=float, help="override the scenario's requests per second")
+    parser.add_argument("--duration", type=float, help="override the scenario's duration in seconds")
+    parser.add_argument("--concurrency", type=int, help="override the scenario's max in-flight requests")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    parser.add_argument("--keep-outputs", action="store_true", help="keep the outputs the run added to output storage")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    seed = args.seed if args.seed is not None else int(scenario.get("seed", 1))
+    payloads = build_payloads(scenario, args.scenario.parent, seed)
+    target = HttpTarget(args.url) if args.url else InProcessTarget()
+
+    offered = {
+        "rate": args.rate or float(scenario.get("rate", 5)),
+        "duration": args.duration or float(scenario.get("duration", 30)),
+        "concurrency": args.concurrency or int(scenario.get("concurrency", 8)),
+    }
+    cleanup = not args.keep_outputs and not args.url
+    before = _snapshot_outputs() if cleanup else set()
+    try:
+        report = run(scenario, payloads, target, seed=seed, **offered)
+    finally:
+        if cleanup:
+            from app import STORAGE
+
+            for key in _snapshot_outputs() - before:
+                STORAGE.delete(key)
+
+    report["scenario"] = scenario.get("name", args.scenario.stem)
+    report["offered"] = offered
+    print_report(report["scenario"], report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
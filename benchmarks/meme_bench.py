@@ -0,0 +1,85 @@
+"""Caption throughput: cached fonts + measured binary search vs. the naive loop.
+
+The naive renderer does what a first implementation usually does. It loads
+the font on every request, then steps the size down from the maximum, laying
+out the full caption with ``textbbox`` at each step until it fits. The
+engine keeps fonts, line widths and rendered lines cached and
+binary-searches the size. Both draw the same captions onto the same
+1080x1080 image.
+
+    python benchmarks/meme_bench.py --requests 300
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import textwrap
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+import meme_engine  # noqa: E402
+
+CAPTIONS = [
+    ("ONE DOES NOT SIMPLY", "DEPLOY ON A FRIDAY"),
+    ("WHEN THE BUILD PASSES", "ON THE FIRST TRY AND NOBODY IS AROUND TO SEE IT"),
+    ("ME EXPLAINING", "WHY THE CACHE HIT RATE MATTERS"),
+    ("", "IT WORKS ON MY MACHINE"),
+    ("TOP TEXT", "BOTTOM TEXT"),
+]
+
+
+def naive(image: Image.Image, top: str, bottom: str) -> Image.Image:
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    box_width, box_height = image.width * 0.92, image.height * 0.3
+    for position, text in (("top", top), ("bottom", bottom)):
+        if not text:
+            continue
+        for size in range(200, 9, -2):
+            font = ImageFont.load_default(size=size)
+            stroke = round(size * 0.06)
+            wrapped = "\n".join(textwrap.wrap(text, width=max(1, int(box_width / (size * 0.6)))))
+            left, top_edge, right, bottom_edge = draw.multiline_textbbox((0, 0), wrapped, font=font, stroke_width=stroke)
+            if right - left <= box_width and bottom_edge - top_edge <= box_height:
+                break
+        y = 20 if position == "top" else image.height - 20 - (bottom_edge - top_edge)
+        draw.multiline_text((image.width / 2, y), wrapped, font=font, anchor="ma", align="center", stroke_width=stroke, stroke_fill="black")
+    return image
+
+
+def engine(image: Image.Image, top: str, bottom: str) -> Image.Image:
+    options = meme_engine.parse_options({"top_text": top, "bottom_text": bottom})
+    return meme_engine.render(image.copy(), options)[0]
+
+
+def run(renderer, image: Image.Image, requests: int) -> Dict:
+    started = time.perf_counter()
+    for top, bottom in itertools.islice(itertools.cycle(CAPTIONS), requests):
+        renderer(image, top, bottom)
+    elapsed = time.perf_counter() - started
+    return {"requests": requests, "seconds": round(elapsed, 2), "captions_per_s": round(requests / elapsed, 1)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    image = Image.radial_gradient("L").resize((1080, 1080)).convert("RGB")
+    report = {"naive": run(naive, image, args.requests)}
+    report["engine_cold"] = run(engine, image, len(CAPTIONS))
+    report["engine_warm"] = run(engine, image, args.requests)
+    report["engine_cache"] = meme_engine.stats()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Peak-memory regression harness for the image processing paths.
+
+Every case runs in a fresh interpreter so peaks do not bleed between cases.
+Two numbers are recorded per case:
+
+* traced - peak of ``tracemalloc`` (Python-level allocations such as BytesIO
+  buffers and the pixel list built by ``remove_background``)
+* rss    - growth of the process high-water mark (includes Pillow's C pixel
+  buffers, which tracemalloc cannot see)
+
+Both are reported as bytes per megapixel of input so sizes are comparable.
+
+    python benchmarks/memory_harness.py                      # compare to baselines
+    python benchmarks/memory_harness.py --update-baseline    # accept current numbers
+    python benchmarks/memory_harness.py --sizes 1,4,12 --ops handle_file:resize
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "memory_baselines.json"
+DEFAULT_SIZES = "1,4"
+DEFAULT_FORMATS = "png,jpg,webp"
+DEFAULT_THRESHOLD = 0.15
+# Below this absolute growth a relative change is noise (allocator slack)
+NOISE_FLOOR_BYTES = 4 * 1024 * 1024
+
+
+def _read_status(field: str) -> int:
+    with open("/proc/self/status", encoding="ascii") as handle:
+        for line in handle:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _reset_peak_rss() -> int:
+    """Reset the kernel high-water mark where possible and return the current RSS."""
+    if os.path.exists("/proc/self/clear_refs"):
+        try:
+            with open("/proc/self/clear_refs", "w", encoding="ascii") as handle:
+                handle.write("5")
+            return _read_status("VmRSS")
+        except OSError:
+            pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _peak_rss() -> int:
+    if os.path.exists("/proc/self/status"):
+        return _read_status("VmHWM")
+    import resource
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def synthetic_image(megapixels: float, fmt: str) -> bytes:
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # Noise plus gradients compresses like a photo rather than a flat fill
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.merge("RGB", (noise, gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    save_format = {"jpg": "JPEG"}.get(fmt, fmt.upper())
+    image.save(buffer, format=save_format)
+    return buffer.getvalue()
+
+
+def _handle_file_case(operation: str, options: Dict) -> Callable:
+    def run(app_module, payload: bytes, fmt: str) -> None:
+        from werkzeug.datastructures import FileStorage
+
+        storage = FileStorage(stream=io.BytesIO(payload), filename=f"sample.{fmt}")
+        with app_module.app.test_request_context():
+            result = app_module.handle_file(storage, {}, operation, options, False, "memharness", 0, set())
+        app_module.STORAGE.delete(result["storage_key"])
+
+    return run
+
+
+def _pdf_case(app_module, payload: bytes, fmt: str) -> None:
+    from PIL import Image
+
+    target = app_module.CONVERTED_FOLDER / "memharness.pdf"
+    image = Image.open(io.BytesIO(payload))
+    if image.mode not in {"RGB", "RGBA", "L", "LA"}:
+        image = image.convert("RGBA")
+    app_module.convert_image_to_pdf(image, target)
+    target.unlink()
+
+
+def _route_case(route: str, field: str, form: Callable[[bytes], Dict]) -> Callable:
+    def run(app_module, payload: bytes, fmt: str) -> None:
+        client = app_module.app.test_client()
+        data = dict(form(payload))
+        data[field] = (io.BytesIO(payload), f"sample.{fmt}")
+        response = client.post(route, data=data, content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} returned {response.status_code}: {response.data[:200]!r}")
+        body = response.get_json(silent=True) or {}
+        if body.get("storage_key"):
+            app_module.STORAGE.delete(body["storage_key"])
+
+    return run
+
+
+CASES: Dict[str, Callable] = {
+    "handle_file:convert": _handle_file_case("convert", {"format": "jpg"}),
+    "handle_file:resize": _handle_file_case("resize", {"resize_mode": "percentage", "percentage": "50"}),
+    "handle_file:compress": _handle_file_case("compress", {"format": "jpg", "quality": "70"}),
+    "handle_file:crop": _handle_file_case("crop", {"x": "10", "y": "10", "width": "400", "height": "300"}),
+    "convert_image_to_pdf": _pdf_case,
+    "api_compress:target_size": _route_case(
+        "/api/compress", "image", lambda payload: {"format": "jpg", "max_size": str(max(1, len(payload) // 10))}
+    ),
+    "remove_background": _route_case("/api/remove-bg", "file", lambda payload: {}),
+}
+
+
+def run_case(operation: str, fmt: str, megapixels: float) -> Dict:
+    """Measure one case in the current (fresh) process."""
+    sys.path.insert(0, str(ROOT_DIR))
+    import app as app_module  # noqa: E402 - imported after sys.path setup
+
+    payload = synthetic_image(megapixels, fmt)
+    case = CASES[operation]
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    rss_before = _reset_peak_rss()
+    case(app_module, payload, fmt)
+    rss_peak = _peak_rss()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "operation": operation,
+        "format": fmt,
+        "megapixels": megapixels,
+        "input_bytes": len(payload),
+        "traced_peak": traced_peak,
+        "rss_peak": max(0, rss_peak - rss_before),
+    }
+
+
+def measure(operation: str, fmt: str, megapixels: float) -> Dict:
+    command = [sys.executable, __file__, "--run-case", operation, fmt, str(megapixels)]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=str(ROOT_DIR))
+    if completed.returncode != 0:
+        return {"operation": operation, "format": fmt, "megapixels": megapixels, "error": completed.stderr.strip()[-400:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def case_key(result: Dict) -> str:
+    return f"{result['operation']}/{result['format']}/{result['megapixels']:g}MP"
+
+
+def per_megapixel(result: Dict, field: str) -> int:
+    return int(result[field] / result["megapixels"])
+
+
+def compare(results: List[Dict], baselines: Dict, threshold: float) -> List[str]:
+    failures = []
+    for result in results:
+        if "error" in result:
+            failures.append(f"{case_key(result)}: {result['error']}")
+            continue
+        baseline = baselines.get(case_key(result))
+        if not baseline:
+            continue
+        for field in ("traced_peak", "rss_peak"):
+            allowed = baseline[field] * (1 + threshold)
+            if result[field] > allowed and result[field] - baseline[field] > NOISE_FLOOR_BYTES:
+                failures.append(
+                    f"{case_key(result)}: {field} {result[field] / 1048576:.1f} MiB exceeds baseline "
+                    f"{baseline[field] / 1048576:.1f} MiB by more than {threshold:.0%}"
+                )
+    return failures
+
+
+def print_table(results: List[Dict], baselines: Dict) -> None:
+    header = f"{'case':<42}{'traced/MP':>14}{'rss/MP':>14}{'rss peak':>12}{'vs base':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        if "error" in result:
+            print(f"{case_key(result):<42}  error: {result['error'].splitlines()[-1] if result['error'] else '?'}")
+            continue
+        baseline = baselines.get(case_key(result))
+        delta = f"{(result['rss_peak'] / baseline['rss_peak'] - 1):+.0%}" if baseline and baseline["rss_peak"] else "new"
+        print(
+            f"{case_key(result):<42}"
+            f"{per_megapixel(result, 'traced_peak') / 1048576:>11.2f} MiB"
+            f"{per_megapixel(result, 'rss_peak') / 1048576:>11.2f} MiB"
+            f"{result['rss_peak'] / 1048576:>8.1f} MiB"
+            f"{delta:>10}"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-case", nargs=3, metavar=("OPERATION", "FORMAT", "MEGAPIXELS"), help=argparse.SUPPRESS)
+    parser.add_argument("--ops", default=",".join(CASES), help="Comma separated operations")
+    parser.add_argument("--formats", default=DEFAULT_FORMATS)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated megapixel sizes")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative growth")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        operation, fmt, megapixels = args.run_case
+        print(json.dumps(run_case(operation, fmt, float(megapixels))))
+        return 0
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+    results = []
+    for operation in args.ops.split(","):
+        if operation not in CASES:
+            parser.error(f"Unknown operation {operation}; choose from {', '.join(CASES)}")
+        for fmt in args.formats.split(","):
+            for size in args.sizes.split(","):
+                results.append(measure(operation, fmt, float(size)))
+
+    print_table(results, baselines)
+
+    if args.update_baseline:
+        for result in results:
+            if "error" not in result:
+                baselines[case_key(result)] = {field: result[field] for field in ("traced_peak", "rss_peak")}
+        baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaselines written to {baseline_path}")
+        return 0
+
+    failures = compare(results, baselines, args.threshold)
+    if failures:
+        print("\nMemory regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
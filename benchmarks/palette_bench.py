@@ -0,0 +1,89 @@
+"""Palette extraction on large photos: full decode vs. draft + sampled k-means.
+
+Generates ``--count`` synthetic photos of ``--megapixels`` each (gradients
+plus noise, saved as JPEG and PNG) and times three strategies per image:
+
+* ``full_mediancut``: decode at full size and quantise every pixel (the naive approach);
+* ``median_cut``: ``palette.extract`` with Pillow's median cut on the sample;
+* ``kmeans``: ``palette.extract`` with the vectorised k-means (the default).
+
+    python benchmarks/palette_bench.py --megapixels 24 --count 3
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from PIL import Image  # noqa: E402
+
+import palette  # noqa: E402
+
+
+def synthetic_photo(megapixels: float, seed: int) -> Image.Image:
+    width = int((megapixels * 1_000_000 * 1.5) ** 0.5)
+    height = int(width / 1.5)
+    small = (max(8, width // 16), max(8, height // 16))
+    red = Image.linear_gradient("L").resize(small).rotate(seed * 37 % 360, expand=False)
+    green = Image.radial_gradient("L").resize(small)
+    blue = Image.effect_noise(small, 40 + seed * 10)
+    base = Image.merge("RGB", (red, green, blue)).resize((width, height), Image.BICUBIC)
+    noise = Image.effect_noise((width, height), 12).convert("RGB")
+    return Image.blend(base, noise, 0.15)
+
+
+def full_mediancut(path: Path, count: int) -> Dict:
+    with Image.open(path) as image:
+        quantised = image.convert("RGB").quantize(colors=count, method=Image.Quantize.MEDIANCUT)
+        return {"colors": quantised.getpalette()[: count * 3]}
+
+
+def time_strategy(function, paths: List[Path], repeat: int) -> Dict:
+    timings = []
+    for path in paths:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(path)
+            timings.append((time.perf_counter() - started) * 1000)
+    return {"mean_ms": round(statistics.mean(timings), 1), "max_ms": round(max(timings), 1)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--count", type=int, default=3, help="photos per format")
+    parser.add_argument("--colors", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt in ("jpeg", "png"):
+            paths = []
+            for seed in range(args.count):
+                path = Path(folder) / f"photo_{seed}.{fmt}"
+                save_kwargs = {"quality": 90} if fmt == "jpeg" else {}
+                synthetic_photo(args.megapixels, seed).save(path, **save_kwargs)
+                paths.append(path)
+            report[fmt] = {
+                "full_mediancut": time_strategy(lambda path: full_mediancut(path, args.colors), paths, args.repeat),
+                "median_cut": time_strategy(
+                    lambda path: palette.extract_file(path, count=args.colors, method="median_cut", budget_ms=10_000), paths, args.repeat
+                ),
+                "kmeans": time_strategy(
+                    lambda path: palette.extract_file(path, count=args.colors, method="kmeans", budget_ms=10_000), paths, args.repeat
+                ),
+            }
+            print(f"{fmt:>5} {args.megapixels:g} MP: {json.dumps(report[fmt])}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
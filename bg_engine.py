@@ -0,0 +1,201 @@
+"""Background removal with a local U²-Net style ONNX model, CPU only.
+
+* The model (the ``u2net.onnx`` / ``u2netp.onnx`` files rembg uses) is read
+  from ``BG_MODEL_PATH``, and nothing is downloaded. It is loaded once per
+  process, on first use, into ``BG_SESSIONS`` inference sessions.
+* Inference runs on a ``BG_INPUT_SIZE`` square copy of the image. The
+  predicted mask is scaled up and refined against the full-resolution
+  image with a guided filter, so edges follow the photo rather than the
+  low-resolution grid. Images larger than ``BG_REFINE_MAX_SIDE`` are refined
+  at that size, and the refined mask is then scaled up.
+* Concurrent requests are batched. Each session has a thread that takes up
+  to ``BG_BATCH_SIZE`` queued images, waiting at most ``BG_BATCH_WAIT_MS``
+  for more, and runs them as one batch. Models exported with a fixed batch
+  size of 1 take them one at a time.
+* Without onnxruntime or the model file, ``remove`` falls back to the
+  near-white threshold heuristic.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Tuple
+
+from PIL import Image, ImageChops
+
+# Optional onnxruntime (and numpy) for model inference
+try:
+    import numpy as np
+    import onnxruntime as ort
+
+    ONNX_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    np = None
+    ort = None
+    ONNX_SUPPORTED = False
+
+BG_MODEL_PATH = Path(os.environ.get("BG_MODEL_PATH") or Path(__file__).resolve().parent / "models" / "u2net.onnx")
+BG_SESSIONS = max(1, int(os.environ.get("BG_SESSIONS", "1")))
+BG_THREADS = max(1, int(os.environ.get("BG_THREADS", str(max(1, (os.cpu_count() or 1) // BG_SESSIONS)))))
+BG_INPUT_SIZE = int(os.environ.get("BG_INPUT_SIZE", "320"))
+BG_BATCH_SIZE = max(1, int(os.environ.get("BG_BATCH_SIZE", "4")))
+BG_BATCH_WAIT = int(os.environ.get("BG_BATCH_WAIT_MS", "10")) / 1000
+BG_REFINE_MAX_SIDE = int(os.environ.get("BG_REFINE_MAX_SIDE", "2048"))
+# Guided filter regularisation: larger keeps the coarse mask, smaller follows image edges more closely
+REFINE_EPSILON = 1e-3
+# The heuristic treats pixels brighter than this in every channel as background
+WHITE_THRESHOLD = 200
+# ImageNet normalisation, as the U²-Net models were trained with
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+_requests: "queue.Queue[Tuple[object, Future]]" = queue.Queue()
+_lock = threading.Lock()
+_state: Dict = {"sessions": 0, "error": None}
+_stats = {"images": 0, "batches": 0, "largest_batch": 0}
+
+
+def model_available() -> bool:
+    return ONNX_SUPPORTED and BG_MODEL_PATH.is_file()
+
+
+def _ensure_sessions() -> bool:
+    """Load the model into the session pool once; ``False`` if it cannot be loaded."""
+    with _lock:
+        if _state["sessions"] or _state["error"]:
+            return bool(_state["sessions"])
+        try:
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = BG_THREADS
+            options.inter_op_num_threads = 1
+            sessions = [
+                ort.InferenceSession(str(BG_MODEL_PATH), sess_options=options, providers=["CPUExecutionProvider"])
+                for _ in range(BG_SESSIONS)
+            ]
+        except Exception as exc:
+            _state["error"] = f"Background model could not be loaded: {exc}"
+            return False
+        for index, session in enumerate(sessions):
+            threading.Thread(target=_serve, args=(session,), name=f"bg-session-{index}", daemon=True).start()
+        _state["sessions"] = len(sessions)
+        return True
+
+
+def _serve(session) -> None:
+    """Run queued images through ``session`` in batches, for the life of the process."""
+    model_input = session.get_inputs()[0]
+    fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+    limit = min(BG_BATCH_SIZE, fixed_batch) if fixed_batch else BG_BATCH_SIZE
+    while True:
+        batch = [_requests.get()]
+        deadline = time.monotonic() + BG_BATCH_WAIT
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            predictions = session.run(None, {model_input.name: np.stack([tensor for tensor, _ in batch])})[0]
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            continue
+        with _lock:
+            _stats["images"] += len(batch)
+            _stats["batches"] += 1
+            _stats["largest_batch"] = max(_stats["largest_batch"], len(batch))
+        for (_, future), prediction in zip(batch, predictions):
+            future.set_result(prediction[0])
+
+
+def _tensor(image: Image.Image):
+    small = image.convert("RGB").resize((BG_INPUT_SIZE, BG_INPUT_SIZE), Image.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.float32)
+    pixels /= max(float(pixels.max()), 1e-6)
+    pixels = (pixels - np.array(MEAN, dtype=np.float32)) / np.array(STD, dtype=np.float32)
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+
+def _box_axis(values, radius: int, axis: int):
+    # Running sums give every window mean in O(1); windows are clipped at the borders
+    length = values.shape[axis]
+    sums = np.cumsum(values, axis=axis, dtype=np.float32)
+    sums = np.concatenate([np.zeros_like(np.take(sums, [0], axis=axis)), sums], axis=axis)
+    positions = np.arange(length)
+    upper = np.minimum(positions + radius + 1, length)
+    lower = np.maximum(positions - radius, 0)
+    shape = [1, 1]
+    shape[axis] = length
+    window = (upper - lower).reshape(shape)
+    return (np.take(sums, upper, axis=axis) - np.take(sums, lower, axis=axis)) / window.astype(np.float32)
+
+
+def _box(values, radius: int):
+    return _box_axis(_box_axis(values, radius, 0), radius, 1)
+
+
+def _refine(prediction, image: Image.Image) -> Image.Image:
+    """Scale the low-resolution prediction to ``image`` and snap it to the image's edges."""
+    low, high = float(prediction.min()), float(prediction.max())
+    prediction = (prediction - low) / max(high - low, 1e-6)
+    coarse = Image.fromarray((prediction * 255).astype(np.uint8), "L")
+
+    scale = min(1.0, BG_REFINE_MAX_SIDE / max(image.size))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    guide = np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.float32) / 255
+    mask = np.asarray(coarse.resize(size, Image.BILINEAR), dtype=np.float32) / 255
+
+    # Guided filter (He et al.): locally the output is a linear function of the guide image
+    radius = max(2, round(max(size) / BG_INPUT_SIZE))
+    mean_guide = _box(guide, radius)
+    mean_mask = _box(mask, radius)
+    variance = _box(guide * guide, radius) - mean_guide * mean_guide
+    covariance = _box(guide * mask, radius) - mean_guide * mean_mask
+    slope = covariance / (variance + REFINE_EPSILON)
+    offset = mean_mask - slope * mean_guide
+    refined = _box(slope, radius) * guide + _box(offset, radius)
+
+    alpha = Image.fromarray((np.clip(refined, 0, 1) * 255).astype(np.uint8), "L")
+    return alpha if alpha.size == image.size else alpha.resize(image.size, Image.BILINEAR)
+
+
+def remove_white(image: Image.Image) -> Image.Image:
+    """Make near-white pixels transparent."""
+    rgba = image.convert("RGBA")
+    red, green, blue, _ = rgba.split()
+    bright = [band.point(lambda value: 255 if value > WHITE_THRESHOLD else 0) for band in (red, green, blue)]
+    white = ImageChops.multiply(ImageChops.multiply(bright[0], bright[1]), bright[2])
+    rgba.paste((255, 255, 255, 0), mask=white)
+    return rgba
+
+
+def remove(image: Image.Image) -> Tuple[Image.Image, str]:
+    """``image`` with its background transparent, and the engine used (``model`` or ``heuristic``)."""
+    if not model_available() or not _ensure_sessions():
+        return remove_white(image), "heuristic"
+    future: Future = Future()
+    _requests.put((_tensor(image), future))
+    alpha = _refine(future.result(), image)
+    rgba = image.convert("RGBA")
+    rgba.putalpha(ImageChops.multiply(rgba.getchannel("A"), alpha))
+    return rgba, "model"
+
+
+def stats() -> Dict:
+    with _lock:
+        return {
+            "model": str(BG_MODEL_PATH),
+            "available": model_available(),
+            "sessions": _state["sessions"],
+            "error": _state["error"],
+            "input_size": BG_INPUT_SIZE,
+            "batch_size": BG_BATCH_SIZE,
+            **_stats,
+            "average_batch": round(_stats["images"] / _stats["batches"], 2) if _stats["batches"] else None,
+        }
@@ -0,0 +1,275 @@
+"""Chunked, resumable uploads streamed straight to disk.
+
+Protocol (all under ``/api/uploads``):
+
+1. ``POST`` with JSON ``{"filename", "size", "sha256"?}`` creates a session.
+2. ``PUT /<upload_id>`` with the raw chunk as the body and an ``Upload-Offset``
+   header appends a chunk. An optional ``X-Chunk-SHA256`` header is checked
+   against the bytes that were written.
+3. ``GET /<upload_id>`` reports the acknowledged offset so an interrupted
+   client can resume from there.
+
+When ``offset == size`` the whole-file hash is checked and the upload can be
+passed to any ``/api/*`` endpoint as ``upload_id`` (``upload_ids`` for lists).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from werkzeug.utils import secure_filename
+
+COPY_BLOCK = 64 * 1024
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_CHUNKED_UPLOAD_MB", "512")) * 1024 * 1024
+SESSION_TTL = 24 * 3600
+
+# upload id -> (offset, sha256 state); only trusted while the offset still matches
+_HASHERS: Dict[str, tuple] = {}
+_HASHERS_LOCK = threading.Lock()
+_SESSION_LOCKS: Dict[str, threading.Lock] = {}
+
+
+class UploadError(ValueError):
+    """Raised for protocol errors; ``status`` is the HTTP status to return."""
+
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class AssembledUpload:
+    """Completed upload that quacks like a ``FileStorage`` for ``handle_file`` and the routes.
+
+    ``save`` renames instead of copying, and ``stream`` reads from disk, so a
+    500 MB TIFF never has to sit in memory.
+    """
+
+    def __init__(self, path: Path, filename: str):
+        self.path = path
+        self.filename = filename
+        self._stream = None
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            self._stream = open(self.path, "rb")
+        return self._stream
+
+    def read(self, *args):
+        return self.stream.read(*args)
+
+    def save(self, destination) -> None:
+        self.close()
+        os.replace(self.path, destination)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def discard(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def _valid_id(upload_id: str) -> str:
+    if not upload_id or len(upload_id) != 32 or any(char not in "0123456789abcdef" for char in upload_id):
+        raise UploadError("Unknown upload.", 404)
+    return upload_id
+
+
+def _paths(folder: Path, upload_id: str):
+    upload_id = _valid_id(upload_id)
+    return folder / f"{upload_id}.part", folder / f"{upload_id}.json"
+
+
+def _session_lock(upload_id: str) -> threading.Lock:
+    with _HASHERS_LOCK:
+        return _SESSION_LOCKS.setdefault(upload_id, threading.Lock())
+
+
+def _load(folder: Path, upload_id: str) -> Dict:
+    _, state_path = _paths(folder, upload_id)
+    try:
+        with open(state_path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        raise UploadError("Unknown upload.", 404)
+
+
+def _store(folder: Path, state: Dict) -> None:
+    _, state_path = _paths(folder, state["id"])
+    temp_path = state_path.with_suffix(".tmp")
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(temp_path, state_path)
+
+
+def _running_hash(folder: Path, state: Dict):
+    """Hash of the acknowledged bytes; rebuilt from disk after a restart or in another worker."""
+    with _HASHERS_LOCK:
+        cached = _HASHERS.get(state["id"])
+    if cached is not None and cached[0] == state["offset"]:
+        return cached[1]
+    hasher = hashlib.sha256()
+    part_path, _ = _paths(folder, state["id"])
+    with open(part_path, "rb") as handle:
+        remaining = state["offset"]
+        while remaining:
+            block = handle.read(min(COPY_BLOCK, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    with _HASHERS_LOCK:
+        _HASHERS[state["id"]] = (state["offset"], hasher)
+    return hasher
+
+
+def part_path(folder: Path, upload_id: str) -> Path:
+    """Location of the bytes received so far, e.g. for reading the image header."""
+    return _paths(folder, upload_id)[0]
+
+
+def public_state(state: Dict) -> Dict:
+    return {
+        "upload_id": state["id"],
+        "filename": state["filename"],
+        "size": state["size"],
+        "offset": state["offset"],
+        "complete": state["offset"] == state["size"],
+        "chunk_size": DEFAULT_CHUNK_SIZE,
+    }
+
+
+def create_session(folder: Path, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+    purge_stale(folder)
+    name = secure_filename(filename or "")
+    if not name:
+        raise UploadError("A filename is required.")
+    if size <= 0:
+        raise UploadError("Upload size must be positive.")
+    if size > MAX_UPLOAD_SIZE:
+        raise UploadError(f"Upload exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)} MB limit.", 413)
+
+    folder.mkdir(parents=True, exist_ok=True)
+    state = {
+        "id": uuid.uuid4().hex,
+        "filename": name,
+        "size": size,
+        "offset": 0,
+        "sha256": (sha256 or "").lower() or None,
+        "created_at": time.time(),
+    }
+    part_path, _ = _paths(folder, state["id"])
+    part_path.touch()
+    _store(folder, state)
+    return state
+
+
+def get_session(folder: Path, upload_id: str) -> Dict:
+    return _load(folder, upload_id)
+
+
+def append_chunk(folder: Path, upload_id: str, offset: int, stream, chunk_sha256: Optional[str] = None) -> Dict:
+    """Stream one chunk from ``stream`` to disk at ``offset`` in constant memory.
+
+    Clients send chunks for one upload sequentially; the offset check rejects
+    anything that does not continue from the acknowledged position.
+    """
+    with _session_lock(upload_id):
+        state = _load(folder, upload_id)
+        if offset != state["offset"]:
+            raise UploadError("Offset mismatch; resume from the acknowledged offset.", 409, state["offset"])
+        if state["offset"] >= state["size"]:
+            raise UploadError("Upload already complete.", 409, state["offset"])
+
+        part_path, _ = _paths(folder, upload_id)
+        running = _running_hash(folder, state).copy()
+        chunk_hash = hashlib.sha256()
+        written = 0
+        with open(part_path, "r+b") as handle:
+            handle.seek(offset)
+            while True:
+                block = stream.read(COPY_BLOCK)
+                if not block:
+                    break
+                written += len(block)
+                if offset + written > state["size"]:
+                    handle.truncate(offset)
+                    raise UploadError("Chunk runs past the declared upload size.", 400, state["offset"])
+                handle.write(block)
+                chunk_hash.update(block)
+                running.update(block)
+            if chunk_sha256 and chunk_hash.hexdigest() != chunk_sha256.lower():
+                # Drop the bad chunk so the client can retry from the same offset
+                handle.truncate(offset)
+                raise UploadError("Chunk checksum mismatch.", 422, state["offset"])
+
+        state["offset"] = offset + written
+        if state["offset"] == state["size"] and state["sha256"] and running.hexdigest() != state["sha256"]:
+            with open(part_path, "r+b") as handle:
+                handle.truncate(0)
+            state["offset"] = 0
+            _store(folder, state)
+            with _HASHERS_LOCK:
+                _HASHERS.pop(upload_id, None)
+            raise UploadError("File checksum mismatch; upload restarted.", 422, 0)
+
+        _store(folder, state)
+        with _HASHERS_LOCK:
+            _HASHERS[upload_id] = (state["offset"], running)
+        return state
+
+
+def take_completed(folder: Path, upload_id: str) -> AssembledUpload:
+    """Claim a completed upload for processing; uploads are single use."""
+    with _session_lock(upload_id):
+        state = _load(folder, upload_id)
+        if state["offset"] != state["size"]:
+            raise UploadError("Upload is not complete.", 409, state["offset"])
+        part_path, state_path = _paths(folder, upload_id)
+        claimed = part_path.with_suffix(".claimed")
+        try:
+            os.replace(part_path, claimed)
+        except FileNotFoundError:
+            # Another worker process claimed it between our load and the rename
+            raise UploadError("Upload was already used.", 409)
+        state_path.unlink(missing_ok=True)
+        with _HASHERS_LOCK:
+            _HASHERS.pop(upload_id, None)
+            _SESSION_LOCKS.pop(upload_id, None)
+    return AssembledUpload(claimed, state["filename"])
+
+
+def abort_session(folder: Path, upload_id: str) -> None:
+    part_path, state_path = _paths(folder, upload_id)
+    part_path.unlink(missing_ok=True)
+    state_path.unlink(missing_ok=True)
+    with _HASHERS_LOCK:
+        _HASHERS.pop(upload_id, None)
+        _SESSION_LOCKS.pop(upload_id, None)
+
+
+def purge_stale(folder: Path, ttl: int = SESSION_TTL) -> int:
+    if not folder.exists():
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for path in folder.iterdir():
+        if path.suffix in {".part", ".json", ".claimed", ".tmp"} and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    # Forget in-memory state of sessions that are gone, whoever removed them
+    with _HASHERS_LOCK:
+        for table in (_HASHERS, _SESSION_LOCKS):
+            for upload_id in [upload_id for upload_id in table if not (folder / f"{upload_id}.json").exists()]:
+                del table[upload_id]
+    return removed
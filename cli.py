@@ -0,0 +1,379 @@
+"""Headless command-line entry point reusing the app's processing core.
+
+Examples:
+    python cli.py convert ./assets --out ./converted --format webp --workers 8
+    python cli.py resize "photos/**/*.jpg" --out ./thumbs --width 640 --height 640
+    python cli.py palette ./photos --count 5 --budget-ms 100 > palettes.jsonl
+    python cli.py build-site
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from app import (
+    ALLOWED_EXTENSIONS,
+    convert_image_to_pdf,
+    enhance_image_if_requested,
+    extension_from_name,
+    normalise_extension,
+    prepare_operation,
+    resolve_pil_format,
+)
+
+OPERATIONS = ("convert", "resize", "compress", "crop")
+TEMP_SUFFIX = ".partial"
+
+
+def glob_root(pattern: str) -> Path:
+    """Return the non-wildcard prefix of a glob pattern."""
+    prefix = []
+    for part in Path(pattern).parts:
+        if any(char in part for char in "*?["):
+            break
+        prefix.append(part)
+    return Path(*prefix) if prefix else Path(".")
+
+
+def iter_sources(sources: List[str], recursive: bool) -> Iterator[Tuple[Path, Path]]:
+    """Yield (file, root) pairs lazily; root is used to mirror the tree under --out."""
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            walker = path.rglob("*") if recursive else path.glob("*")
+            for candidate in walker:
+                if candidate.is_file() and extension_from_name(candidate.name) in ALLOWED_EXTENSIONS:
+                    yield candidate, path
+        elif path.is_file():
+            yield path, path.parent
+        else:
+            for match in glob.iglob(source, recursive=True):
+                candidate = Path(match)
+                if candidate.is_file() and extension_from_name(candidate.name) in ALLOWED_EXTENSIONS:
+                    yield candidate, glob_root(source)
+
+
+def expected_output_ext(operation: str, options: Dict, source_ext: str) -> str:
+    # Mirrors the extension each process_* function settles on
+    if operation in {"resize", "crop"}:
+        return "png"
+    if operation == "compress":
+        return normalise_extension(options.get("format") or source_ext or "jpg")
+    return normalise_extension(options.get("format", "png"))
+
+
+def output_path_for(source: Path, root: Path, out_dir: Path, output_ext: str) -> Path:
+    # Both sides resolved, so a relative source under an absolute root keeps its subdirectories
+    try:
+        relative = source.resolve().relative_to(root.resolve())
+    except ValueError:
+        relative = Path(source.name)
+    return (out_dir / relative).with_suffix(f".{output_ext}")
+
+
+def is_up_to_date(source: Path, target: Path) -> bool:
+    try:
+        return target.stat().st_mtime >= source.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def process_one(source: str, target: str, operation: str, options: Dict, enhance: bool) -> Dict:
+    """Run one file through prepare_operation; executed inside pool workers."""
+    started = time.perf_counter()
+    source_path = Path(source)
+    target_path = Path(target)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write next to the target and rename, so an interrupted run never leaves
+    # a truncated file that would later look up to date
+    temp_path = target_path.with_name(target_path.name + TEMP_SUFFIX)
+
+    try:
+        with Image.open(source_path) as opened:
+            image = opened
+            pixels = image.width * image.height
+            if image.mode not in {"RGB", "RGBA", "L", "LA"}:
+                image = image.convert("RGBA")
+
+            processed, output_ext, extra = prepare_operation(
+                image, operation, options, extension_from_name(source_path.name)
+            )
+            processed, _ = enhance_image_if_requested(processed, enhance)
+
+            if output_ext == "pdf":
+                convert_image_to_pdf(processed, temp_path)
+            else:
+                save_kwargs = dict(extra.get("save_kwargs", {}))
+                save_kwargs.setdefault("format", resolve_pil_format(output_ext))
+                processed.save(temp_path, **save_kwargs)
+        os.replace(temp_path, target_path)
+    except Exception as exc:
+        if temp_path.exists():
+            temp_path.unlink()
+        return {"source": source, "status": "error", "error": str(exc)}
+
+    return {
+        "source": source,
+        "status": "done",
+        "bytes_in": source_path.stat().st_size,
+        "bytes_out": target_path.stat().st_size,
+        "pixels": pixels,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def build_options(args: argparse.Namespace) -> Dict:
+    options: Dict = {}
+    for field in ("format", "quality", "width", "height", "percentage", "x", "y"):
+        value = getattr(args, field, None)
+        if value is not None:
+            options[field] = str(value)
+    if args.operation == "resize":
+        options["resize_mode"] = "percentage" if args.percentage else "pixels"
+        options["maintain_aspect"] = "false" if args.stretch else "true"
+    return options
+
+
+def run(args: argparse.Namespace) -> int:
+    options = build_options(args)
+    out_dir = Path(args.out).resolve()
+    workers = max(1, args.workers)
+    # Keep a bounded window of submitted jobs so huge trees stream instead of
+    # queueing every path up front
+    window = workers * 4
+
+    totals = {"done": 0, "skipped": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0, "pixels": 0}
+    started = time.perf_counter()
+    # Output path -> the source that claimed it (a.jpg and a.png both become a.webp)
+    claimed: Dict[Path, Path] = {}
+
+    def record(result: Dict) -> None:
+        if result["status"] == "done":
+            totals["done"] += 1
+            totals["bytes_in"] += result["bytes_in"]
+            totals["bytes_out"] += result["bytes_out"]
+            totals["pixels"] += result["pixels"]
+            if args.verbose:
+                print(f"ok    {result['source']} ({result['seconds']:.2f}s)")
+        else:
+            totals["failed"] += 1
+            print(f"error {result['source']}: {result['error']}", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for source, root in iter_sources(args.sources, not args.no_recursive):
+            output_ext = expected_output_ext(args.operation, options, extension_from_name(source.name))
+            target = output_path_for(source, root, out_dir, output_ext)
+            owner = claimed.setdefault(target, source.resolve())
+            if owner != source.resolve():
+                record({"source": str(source), "status": "error", "error": f"{target} is already written from {owner}"})
+                continue
+            if not args.force and is_up_to_date(source, target):
+                totals["skipped"] += 1
+                continue
+
+            in_flight.add(
+                pool.submit(process_one, str(source), str(target), args.operation, options, args.enhance)
+            )
+            if len(in_flight) >= window:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+
+        for future in in_flight:
+            record(future.result())
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"{totals['done']} processed, {totals['skipped']} up to date, {totals['failed']} failed "
+        f"in {elapsed:.1f}s with {workers} workers"
+    )
+    print(
+        f"{totals['done'] / elapsed:.2f} files/s, {totals['pixels'] / 1e6 / elapsed:.1f} MP/s, "
+        f"{totals['bytes_in'] / 1048576:.1f} MB in -> {totals['bytes_out'] / 1048576:.1f} MB out"
+    )
+    return 1 if totals["failed"] else 0
+
+
+def palette_one(source: str, options: Dict) -> Dict:
+    """Palette for one file as a JSON-ready dict; executed inside pool workers."""
+    from palette import extract_file
+
+    try:
+        return {"source": source, "status": "done", **extract_file(source, **options)}
+    except Exception as exc:
+        return {"source": source, "status": "error", "error": str(exc)}
+
+
+def palette_run(args: argparse.Namespace) -> int:
+    import json
+
+    from palette import parse_options
+
+    options = parse_options({"count": args.count, "method": args.method, "bins": args.bins, "budget_ms": args.budget_ms})
+    workers = max(1, args.workers)
+    window = workers * 4
+    totals = {"done": 0, "failed": 0, "over_budget": 0}
+    started = time.perf_counter()
+
+    def record(result: Dict) -> None:
+        if result["status"] == "done":
+            totals["done"] += 1
+            totals["over_budget"] += result["budget_exceeded"]
+        else:
+            totals["failed"] += 1
+        print(json.dumps(result), flush=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for source, _ in iter_sources(args.sources, not args.no_recursive):
+            in_flight.add(pool.submit(palette_one, str(source), options))
+            if len(in_flight) >= window:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+        for future in in_flight:
+            record(future.result())
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"{totals['done']} palettes, {totals['failed']} failed, {totals['over_budget']} over the "
+        f"{options['budget_ms']} ms budget in {elapsed:.1f}s ({totals['done'] / elapsed:.1f} files/s)",
+        file=sys.stderr,
+    )
+    return 1 if totals["failed"] else 0
+
+
+def migrate_jobs(args: argparse.Namespace) -> int:
+    from app import CONVERTED_FOLDER, JOB_STORE, METADATA_SUFFIX
+
+    imported = JOB_STORE.migrate_json(CONVERTED_FOLDER, METADATA_SUFFIX, remove=args.remove)
+    print(f"Imported {imported} job metadata files into {JOB_STORE.path}")
+    return 0
+
+
+def expire_jobs(args: argparse.Namespace) -> int:
+    from app import CONVERTED_FOLDER, JOB_STORE, STORAGE
+
+    cutoff = time.time() - args.hours * 3600
+    expired = JOB_STORE.expired(cutoff)
+    removed_files = 0
+    for job in expired:
+        for name in job["files"]:
+            path = CONVERTED_FOLDER / name
+            if path.exists():
+                path.unlink()
+                removed_files += 1
+    JOB_STORE.delete_jobs(job["id"] for job in expired)
+    # Stored outputs go once they are old and no remaining job points at them
+    removed_objects = STORAGE.sweep(cutoff, JOB_STORE.storage_keys())
+    print(
+        f"Expired {len(expired)} jobs older than {args.hours:g}h "
+        f"({removed_files} files, {removed_objects} stored objects removed)"
+    )
+    return 0
+
+
+def feedback_summary(args: argparse.Namespace) -> int:
+    import json
+
+    from app import FEEDBACK_FOLDER, FEEDBACK_LOG, RATINGS_FOLDER, RATINGS_LOG
+    from event_log import import_legacy_files, summarize_ratings
+
+    if args.import_legacy:
+        ratings = import_legacy_files(RATINGS_FOLDER, RATINGS_LOG, "rating_*.json", remove=args.remove)
+        feedback = import_legacy_files(FEEDBACK_FOLDER, FEEDBACK_LOG, "*.json", remove=args.remove)
+        print(f"Imported {ratings} legacy ratings and {feedback} legacy feedback files")
+    print(json.dumps(summarize_ratings(RATINGS_FOLDER), indent=2))
+    return 0
+
+
+def build_site(args: argparse.Namespace) -> int:
+    from app import DIST_FOLDER, app
+    from site_build import BROTLI_SUPPORTED, build
+
+    started = time.perf_counter()
+    manifest = build(app, Path(args.out) if args.out else DIST_FOLDER)
+    page_bytes = sum(page["size"] for page in manifest["pages"].values())
+    print(
+        f"Pre-rendered {len(manifest['pages'])} pages ({page_bytes / 1024:.0f} KiB) and "
+        f"{len(manifest['assets'])} bundles in {time.perf_counter() - started:.1f}s; "
+        f"variants: gzip{', br' if BROTLI_SUPPORTED else ''}"
+    )
+    for path in manifest["skipped"]:
+        print(f"Skipped {path} (not a 200 HTML page)", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch image processing without the web server.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for operation in OPERATIONS:
+        sub = subparsers.add_parser(operation, help=f"{operation} images in bulk")
+        sub.set_defaults(operation=operation, handler=run)
+        sub.add_argument("sources", nargs="+", help="Files, directories or glob patterns")
+        sub.add_argument("--out", required=True, help="Output directory (source tree is mirrored)")
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        sub.add_argument("--force", action="store_true", help="Re-process outputs that are up to date")
+        sub.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+        sub.add_argument("--enhance", action="store_true", help="Apply the 2x enhancement step")
+        sub.add_argument("--verbose", action="store_true")
+        if operation in {"convert", "compress"}:
+            sub.add_argument("--format", default="png" if operation == "convert" else None)
+        if operation == "compress":
+            sub.add_argument("--quality", type=int)
+        if operation in {"resize", "crop"}:
+            sub.add_argument("--width", type=int)
+            sub.add_argument("--height", type=int)
+        if operation == "resize":
+            sub.add_argument("--percentage", type=int)
+            sub.add_argument("--stretch", action="store_true", help="Ignore the aspect ratio")
+        if operation == "crop":
+            sub.add_argument("--x", type=int, default=0)
+            sub.add_argument("--y", type=int, default=0)
+
+    colours = subparsers.add_parser("palette", help="Extract colour palettes as JSON lines on stdout")
+    colours.add_argument("sources", nargs="+", help="Files, directories or glob patterns")
+    colours.add_argument("--count", type=int, default=6)
+    colours.add_argument("--method", choices=("kmeans", "median_cut"))
+    colours.add_argument("--bins", type=int, default=16)
+    colours.add_argument("--budget-ms", type=int, help="Per-image time budget (default PALETTE_BUDGET_MS)")
+    colours.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    colours.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    colours.set_defaults(handler=palette_run)
+
+    migrate = subparsers.add_parser("migrate-jobs", help="Import legacy per-job JSON metadata into the job store")
+    migrate.add_argument("--remove", action="store_true", help="Delete the JSON files after importing")
+    migrate.set_defaults(handler=migrate_jobs)
+
+    expire = subparsers.add_parser("expire-jobs", help="Delete jobs and their outputs older than --hours")
+    expire.add_argument("--hours", type=float, default=24)
+    expire.set_defaults(handler=expire_jobs)
+
+    summary = subparsers.add_parser("feedback-summary", help="Aggregate ratings from the feedback event log")
+    summary.add_argument("--import-legacy", action="store_true", help="Append old per-submission JSON files first")
+    summary.add_argument("--remove", action="store_true", help="Delete legacy files after importing")
+    summary.set_defaults(handler=feedback_summary)
+
+    site = subparsers.add_parser("build-site", help="Pre-render pages and bundle CSS/JS for PRERENDERED_SITE")
+    site.add_argument("--out", help="Output directory (default static/dist)")
+    site.set_defaults(handler=build_site)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
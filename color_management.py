@@ -0,0 +1,119 @@
+"""Convert images with embedded ICC profiles to sRGB.
+
+Phone photos are often tagged Display P3 or Adobe RGB. A plain
+``convert("RGB")`` keeps their numbers but drops the profile, so colours
+come out washed out or oversaturated. Building a LittleCMS transform costs far
+more than applying one, and most uploads share a handful of profiles.
+Transforms are therefore kept in an LRU keyed by (profile hash, input mode,
+output mode). Profiles that already describe sRGB map to ``None`` and are
+left alone.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from PIL import ImageCms
+
+    ImageCms.core  # raises when Pillow was built without LittleCMS
+    CMS_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    ImageCms = None
+    CMS_SUPPORTED = False
+
+COLOR_TRANSFORM_CACHE = int(os.environ.get("COLOR_TRANSFORM_CACHE", "32"))
+COLOR_MANAGEMENT = os.environ.get("COLOR_MANAGEMENT", "true").lower() == "true"
+
+# Input mode -> mode the sRGB result is produced in
+OUTPUT_MODES = {"RGB": "RGB", "RGBA": "RGBA", "CMYK": "RGB"}
+
+_lock = threading.Lock()
+_transforms: "OrderedDict[Tuple[str, str, str], object]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "errors": 0}
+_srgb = None
+
+
+def _srgb_profile():
+    global _srgb
+    if _srgb is None:
+        _srgb = ImageCms.createProfile("sRGB")
+    return _srgb
+
+
+def _build(icc: bytes, in_mode: str, out_mode: str):
+    profile = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+    description = (ImageCms.getProfileDescription(profile) or "").strip().lower()
+    if description.startswith("srgb") and in_mode == out_mode:
+        return None
+    return ImageCms.buildTransform(
+        profile, _srgb_profile(), in_mode, out_mode, renderingIntent=ImageCms.Intent.PERCEPTUAL
+    )
+
+
+def transform_for(icc: Optional[bytes], in_mode: str, out_mode: Optional[str] = None):
+    """Cached transform from ``icc`` to sRGB, or ``None`` when there is nothing to do."""
+    if not (CMS_SUPPORTED and COLOR_MANAGEMENT and icc) or in_mode not in OUTPUT_MODES:
+        return None
+    out_mode = out_mode or OUTPUT_MODES[in_mode]
+    key = (hashlib.sha1(icc).hexdigest(), in_mode, out_mode)
+    with _lock:
+        if key in _transforms:
+            _transforms.move_to_end(key)
+            _stats["hits"] += 1
+            return _transforms[key]
+        _stats["misses"] += 1
+    try:
+        transform = _build(icc, in_mode, out_mode)
+    except Exception:
+        # A broken profile is not worth failing the upload over; keep the pixels as they are
+        with _lock:
+            _stats["errors"] += 1
+        transform = None
+    with _lock:
+        _transforms[key] = transform
+        while len(_transforms) > COLOR_TRANSFORM_CACHE:
+            _transforms.popitem(last=False)
+    return transform
+
+
+def to_srgb(image: Image.Image) -> Image.Image:
+    """Return ``image`` in sRGB, converted in place when the mode stays the same.
+
+    The ICC profile is removed from ``image.info`` afterwards, so savers do
+    not tag the converted pixels with the old profile and repeated calls are
+    free.
+    """
+    icc = image.info.get("icc_profile")
+    if not (icc and CMS_SUPPORTED and COLOR_MANAGEMENT):
+        return image
+    mode = image.mode
+    if mode == "P":
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        mode = image.mode
+    transform = transform_for(icc, mode)
+    if transform is not None:
+        if OUTPUT_MODES[mode] == mode:
+            ImageCms.applyTransform(image, transform, inPlace=True)
+        else:
+            image = ImageCms.applyTransform(image, transform)
+    if transform is not None or mode in OUTPUT_MODES:
+        image.info.pop("icc_profile", None)
+    return image
+
+
+def stats() -> Dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "enabled": CMS_SUPPORTED and COLOR_MANAGEMENT,
+            "cached": len(_transforms),
+            "capacity": COLOR_TRANSFORM_CACHE,
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+        }
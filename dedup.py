@@ -0,0 +1,112 @@
+"""Duplicate detection inside a single request.
+
+Uploads are grouped by a SHA-256 of their bytes, so re-selected files and
+renamed copies are processed once. With ``perceptual`` mode, inputs that hash
+differently but have the same dimensions and a near-identical 64-bit
+difference hash (dHash) are grouped too. This catches re-encoded or
+metadata-stripped copies.
+"""
+
+import hashlib
+import os
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from PIL import Image
+
+DEDUP_MODES = {"off", "exact", "perceptual"}
+DEFAULT_DEDUP_MODE = os.environ.get("DEDUP_MODE", "exact")
+# Max differing dHash bits for two same-sized inputs to count as the same picture
+PERCEPTUAL_DISTANCE = int(os.environ.get("DEDUP_PHASH_DISTANCE", "2"))
+HASH_BLOCK = 64 * 1024
+
+
+def parse_mode(value: Optional[str]) -> str:
+    mode = (value or DEFAULT_DEDUP_MODE).strip().lower()
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unsupported dedup mode: {mode}")
+    return mode
+
+
+def content_digest(file_storage) -> str:
+    """SHA-256 of an upload's bytes; the stream is rewound afterwards."""
+    stream = file_storage.stream
+    stream.seek(0)
+    hasher = hashlib.sha256()
+    while True:
+        block = stream.read(HASH_BLOCK)
+        if not block:
+            break
+        hasher.update(block)
+    stream.seek(0)
+    return hasher.hexdigest()
+
+
+def difference_hash(file_storage) -> Optional[Tuple[Tuple[int, int], int]]:
+    """``(size, dhash)`` for an upload, or ``None`` when it cannot be decoded."""
+    stream = file_storage.stream
+    stream.seek(0)
+    try:
+        with Image.open(stream) as image:
+            size = image.size
+            # JPEG can decode at 1/8 scale, which is plenty for a 9x8 thumbnail
+            image.draft("L", (64, 64))
+            pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    except Exception:
+        return None
+    finally:
+        stream.seek(0)
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            left = pixels[row * 9 + column]
+            bits = (bits << 1) | (left > pixels[row * 9 + column + 1])
+    return size, bits
+
+
+def group_duplicates(files: List, mode: str = "exact", keys: Optional[List[Hashable]] = None) -> List[int]:
+    """Map every upload to the index of the first upload it duplicates (itself when unique).
+
+    ``keys`` adds per-file context that must also match, e.g. a manifest
+    entry that changes how the file is processed.
+    """
+    if mode == "off":
+        return list(range(len(files)))
+
+    representatives: List[int] = []
+    by_digest: Dict[Hashable, int] = {}
+    fingerprints: List[Tuple[int, Hashable, Tuple[int, int], int]] = []
+    for index, file_storage in enumerate(files):
+        extra = keys[index] if keys is not None else None
+        digest_key = (content_digest(file_storage), extra)
+        if digest_key in by_digest:
+            representatives.append(by_digest[digest_key])
+            continue
+
+        match = index
+        if mode == "perceptual":
+            fingerprint = difference_hash(file_storage)
+            if fingerprint is not None:
+                size, bits = fingerprint
+                for other, other_extra, other_size, other_bits in fingerprints:
+                    if other_extra == extra and other_size == size and bin(bits ^ other_bits).count("1") <= PERCEPTUAL_DISTANCE:
+                        match = other
+                        break
+                if match == index:
+                    fingerprints.append((index, extra, size, bits))
+
+        by_digest[digest_key] = match
+        representatives.append(match)
+    return representatives
+
+
+def summarize(representatives: List[int], mode: str) -> Dict:
+    """Dedup figures for job metadata; ``ratio`` is the share of inputs that were skipped."""
+    inputs = len(representatives)
+    unique = len(set(representatives))
+    return {
+        "mode": mode,
+        "inputs": inputs,
+        "unique": unique,
+        "duplicates": inputs - unique,
+        "ratio": round((inputs - unique) / inputs, 3) if inputs else 0.0,
+    }
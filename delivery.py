@@ -0,0 +1,112 @@
+"""HTTP delivery for generated files.
+
+* Strong ETags from a SHA-256 of the file content, cached per (inode, size,
+  mtime) so a file is hashed once, not on every request.
+* ``If-None-Match`` / ``If-Modified-Since`` answered with 304.
+* Single ``Range`` requests (206) for large ZIPs and PDFs. A request for
+  several ranges gets the whole file (200), which RFC 9110 allows; werkzeug
+  would otherwise refuse it with 416.
+* ``Cache-Control: immutable`` for names that embed a job id and can never be
+  reused. Other names are revalidated against the ETag.
+* Optional offload to the front proxy: ``SENDFILE_MODE=x-accel`` (nginx) or
+  ``x-sendfile`` (Apache/lighttpd), so workers do not stream the bytes.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from flask import abort, current_app, request
+from werkzeug.http import parse_range_header
+from werkzeug.utils import send_file
+
+SENDFILE_MODE = os.environ.get("SENDFILE_MODE", "off").strip().lower()
+X_ACCEL_PREFIX = "/" + os.environ.get("X_ACCEL_PREFIX", "/_protected").strip("/")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ETAG_CACHE_SIZE = 4096
+HASH_BLOCK = 1024 * 1024
+
+# Job ids and other uuid4 hex strings make a name single-use
+_UNIQUE_NAME = re.compile(r"[0-9a-f]{32}")
+
+_ETAGS: "OrderedDict[tuple, str]" = OrderedDict()
+_ETAGS_LOCK = threading.Lock()
+
+
+def content_etag(path: Path) -> str:
+    stat = path.stat()
+    key = (str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _ETAGS_LOCK:
+        cached = _ETAGS.get(key)
+        if cached is not None:
+            _ETAGS.move_to_end(key)
+            return cached
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while True:
+            block = handle.read(HASH_BLOCK)
+            if not block:
+                break
+            hasher.update(block)
+    etag = hasher.hexdigest()[:32]
+
+    with _ETAGS_LOCK:
+        _ETAGS[key] = etag
+        while len(_ETAGS) > ETAG_CACHE_SIZE:
+            _ETAGS.popitem(last=False)
+    return etag
+
+
+def is_immutable(name: str) -> bool:
+    return bool(_UNIQUE_NAME.search(name))
+
+
+def _offload_uri(path: Path, root: Path) -> str:
+    relative = path.relative_to(root).as_posix()
+    return f"{X_ACCEL_PREFIX}/{root.name}/{relative}"
+
+
+def serve(root: Path, relative: str, as_attachment: bool = False, download_name: Optional[str] = None):
+    """Send ``root / relative`` with ETag, caching, Range and optional proxy offload."""
+    root = root.resolve()
+    path = (root / relative).resolve()
+    if root not in path.parents or not path.is_file():
+        abort(404)
+
+    etag = content_etag(path)
+    max_age = IMMUTABLE_MAX_AGE if is_immutable(path.name) else None
+    offload = SENDFILE_MODE in {"x-accel", "x-sendfile"}
+
+    environ = request.environ
+    requested = parse_range_header(request.headers.get("Range"))
+    if requested is not None and len(requested.ranges) > 1:
+        environ = {name: value for name, value in environ.items() if name != "HTTP_RANGE"}
+
+    response = send_file(
+        path,
+        environ,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=etag,
+        max_age=max_age,
+        conditional=not offload,
+        use_x_sendfile=offload,
+        response_class=current_app.response_class,
+    )
+    if max_age:
+        response.cache_control.immutable = True
+
+    if offload:
+        # The proxy serves Range requests itself; only 304s are answered here
+        response = response.make_conditional(request, accept_ranges=False)
+        if response.status_code == 304:
+            response.headers.pop("X-Sendfile", None)
+        elif SENDFILE_MODE == "x-accel":
+            response.headers.pop("X-Sendfile", None)
+            response.headers["X-Accel-Redirect"] = _offload_uri(path, root)
+    return response
@@ -0,0 +1,263 @@
+"""Buffered, append-only event log for feedback and ratings.
+
+Records are kept in memory and appended as newline-delimited JSON to a
+per-process segment. Flushes happen periodically or once the buffer grows past
+``flush_bytes``, not once per request. Segments are rotated by size and
+gzip-compressed in the background. Segments left behind by processes that
+have exited (a worker restart, a crash before compression finished) are
+rotated by the next ``EventLog`` to start. ``summarize_ratings`` folds the segments
+into a cached summary, so a rating is read again only when its segment is new.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+ACTIVE_SUFFIX = ".jsonl"
+ROTATED_SUFFIX = ".jsonl.gz"
+SUMMARY_NAME = "summary.json"
+
+
+class EventLog:
+    """Thread-safe buffered writer for one stream of events (one segment per process)."""
+
+    def __init__(
+        self,
+        folder: Path,
+        name: str,
+        flush_interval: float = 2.0,
+        flush_bytes: int = 64 * 1024,
+        rotate_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.folder = Path(folder)
+        self.name = name
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        # Active segments are "<name>.<pid>.jsonl"; rotated, not yet compressed ones "<name>-<time>-<pid>-<id>.jsonl"
+        self._segment_owner = re.compile(
+            rf"^{re.escape(name)}(?:\.(\d+)|-\d{{14}}-(\d+)-[0-9a-f]{{6}}){re.escape(ACTIVE_SUFFIX)}$"
+        )
+        atexit.register(self.flush)
+        self.recover_segments()
+
+    @property
+    def active_path(self) -> Path:
+        # Separate segments per process keep gunicorn workers from interleaving writes
+        return self.folder / f"{self.name}.{os.getpid()}{ACTIVE_SUFFIX}"
+
+    def append(self, record: Dict) -> None:
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered += len(line)
+            should_flush = self._buffered >= self.flush_bytes
+        self._ensure_flusher()
+        if should_flush:
+            self.flush()
+
+    def _ensure_flusher(self) -> None:
+        # Restart after fork: threads do not survive into the child process
+        if self._flusher is not None and self._pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, name=f"{self.name}-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._buffer:
+                return
+            data = b"".join(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+        with self._write_lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            path = self.active_path
+            with open(path, "ab") as handle:
+                handle.write(data)
+                size = handle.tell()
+            if size >= self.rotate_bytes:
+                self._rotate(path)
+
+    def recover_segments(self) -> int:
+        """Rotate plain segments whose writing process has exited; returns how many were taken over."""
+        recovered = 0
+        for path in sorted(self.folder.glob(f"{self.name}*{ACTIVE_SUFFIX}")):
+            match = self._segment_owner.match(path.name)
+            if not match:
+                continue
+            owner = int(match.group(1) or match.group(2))
+            if owner == os.getpid() or _process_alive(owner):
+                continue
+            try:
+                # The rename claims the segment, so two workers starting together cannot both take it
+                self._rotate(path)
+            except FileNotFoundError:
+                continue
+            recovered += 1
+        return recovered
+
+    def _rotate(self, path: Path) -> None:
+        stamp = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        rotated = path.with_name(f"{self.name}-{stamp}{ACTIVE_SUFFIX}")
+        os.replace(path, rotated)
+        threading.Thread(target=compress_segment, args=(rotated,), daemon=True).start()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+
+def _compressed_path(path: Path) -> Path:
+    return path.with_name(path.name[: -len(ACTIVE_SUFFIX)] + ROTATED_SUFFIX)
+
+
+def compress_segment(path: Path) -> Path:
+    """Gzip a rotated segment and remove the plain copy; returns the .gz path."""
+    target = _compressed_path(path)
+    temp = target.with_name(target.name + ".tmp")
+    with open(path, "rb") as source, gzip.open(temp, "wb") as compressed:
+        shutil.copyfileobj(source, compressed)
+    os.replace(temp, target)
+    path.unlink(missing_ok=True)
+    return target
+
+
+def iter_records(path: Path) -> Iterator[Dict]:
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn final line; skip it rather than fail
+                continue
+
+
+def import_legacy_files(folder: Path, log: EventLog, pattern: str = "*.json", remove: bool = False) -> int:
+    """Append per-submission JSON files (the old layout) to ``log``."""
+    imported = 0
+    sources = []
+    for path in sorted(Path(folder).glob(pattern)):
+        if path.name == SUMMARY_NAME:
+            continue
+        try:
+            with open(path, encoding="utf-8") as handle:
+                record = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            continue
+        log.append(record)
+        sources.append(path)
+        imported += 1
+    log.flush()
+    if remove:
+        for path in sources:
+            path.unlink(missing_ok=True)
+    return imported
+
+
+def _empty_summary() -> Dict:
+    return {"count": 0, "total": 0, "distribution": {}, "pages": {}, "segments": []}
+
+
+def _fold(summary: Dict, record: Dict) -> None:
+    try:
+        rating = int(record.get("rating"))
+    except (TypeError, ValueError):
+        return
+    page = str(record.get("page") or "unknown")
+    summary["count"] += 1
+    summary["total"] += rating
+    summary["distribution"][str(rating)] = summary["distribution"].get(str(rating), 0) + 1
+    page_stats = summary["pages"].setdefault(page, {"count": 0, "total": 0})
+    page_stats["count"] += 1
+    page_stats["total"] += rating
+
+
+def summarize_ratings(folder: Path) -> Dict:
+    """Aggregate ratings incrementally.
+
+    Compressed segments are immutable, so their totals are cached in
+    ``summary.json`` and only new segments are read. Active segments are
+    always read but never cached.
+    """
+    folder = Path(folder)
+    summary_path = folder / SUMMARY_NAME
+    cached = _empty_summary()
+    if summary_path.exists():
+        try:
+            cached = json.loads(summary_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            cached = _empty_summary()
+
+    # Listed before the compressed segments, so one compressed in between is still found as .gz
+    plain_segments = sorted(folder.glob(f"*{ACTIVE_SUFFIX}"))
+    seen = set(cached["segments"])
+    for segment in sorted(folder.glob(f"*{ROTATED_SUFFIX}")):
+        if segment.name in seen:
+            continue
+        for record in iter_records(segment):
+            _fold(cached, record)
+        cached["segments"].append(segment.name)
+
+    if folder.exists():
+        temp = summary_path.with_name(SUMMARY_NAME + ".tmp")
+        temp.write_text(json.dumps(cached, indent=2), encoding="utf-8")
+        os.replace(temp, summary_path)
+
+    live = json.loads(json.dumps(cached))
+    for segment in plain_segments:
+        # While a segment is compressed, the plain copy and its .gz both exist; count the .gz only
+        if _compressed_path(segment).exists():
+            continue
+        try:
+            for record in iter_records(segment):
+                _fold(live, record)
+        except FileNotFoundError:
+            # Rotated or compressed after it was listed
+            continue
+
+    pages = {
+        page: {"count": stats["count"], "average": round(stats["total"] / stats["count"], 3)}
+        for page, stats in sorted(live["pages"].items())
+        if stats["count"]
+    }
+    return {
+        "count": live["count"],
+        "average": round(live["total"] / live["count"], 3) if live["count"] else None,
+        "distribution": dict(sorted(live["distribution"].items())),
+        "pages": pages,
+    }
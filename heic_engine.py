@@ -0,0 +1,121 @@
+"""HEIC/HEIF decoding on top of pillow_heif.
+
+* Only the primary image is decoded. Depth maps and auxiliary images (alpha
+  mattes, HDR gain maps) are never even loaded.
+* The number of libheif decoder threads is set by ``HEIC_DECODE_THREADS``.
+  By default the CPUs are split across the ``HEIC_WORKERS`` parallel decodes,
+  so a batch does not start workers x CPUs threads.
+* When the requested output fits inside the JPEG preview that cameras embed
+  in the EXIF block, that preview is used and no HEVC data is decoded.
+  pillow_heif reports the HEIF ``thmb`` thumbnail items (``info["thumbnails"]``)
+  but has no API to decode them, so the EXIF preview is the only embedded
+  image that can be reached.
+* ``decode_ahead`` decodes a batch on a thread pool, in order. The estimated
+  decoded size of the images in flight stays under ``HEIC_MEMORY_BUDGET_MB``.
+  libheif releases the GIL while it decodes.
+"""
+
+import io
+import os
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from PIL import ExifTags, Image
+
+import image_probe
+import pipeline
+
+HEIC_WORKERS = max(1, int(os.environ.get("HEIC_WORKERS", str(min(4, os.cpu_count() or 1)))))
+HEIC_DECODE_THREADS = max(1, int(os.environ.get("HEIC_DECODE_THREADS", str(max(1, (os.cpu_count() or 1) // HEIC_WORKERS)))))
+HEIC_MEMORY_BUDGET = int(os.environ.get("HEIC_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+# A preview whose aspect ratio differs more than this from the primary image belongs to something else
+PREVIEW_ASPECT_TOLERANCE = 0.02
+
+# Optional HEIC decoding
+try:
+    from pillow_heif import options as heif_options
+    from pillow_heif import register_heif_opener  # type: ignore
+
+    register_heif_opener(thumbnails=True, decode_threads=HEIC_DECODE_THREADS)
+    # Set directly: older pillow_heif releases do not know every option and only warn about it
+    for option in ("DEPTH_IMAGES", "AUX_IMAGES"):
+        if hasattr(heif_options, option):
+            setattr(heif_options, option, False)
+    HEIF_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    heif_options = None
+    HEIF_SUPPORTED = False
+
+_EXIF_ORIENTATION = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def decoded_bytes(width: int, height: int) -> int:
+    """Peak memory of one decode: libheif's interleaved planes plus Pillow's 4-byte pixels."""
+    return width * height * 8
+
+
+def _exif_preview(exif_data: Optional[bytes], orientation: Optional[int]) -> Optional[Image.Image]:
+    if not exif_data:
+        return None
+    start = min((offset for offset in (exif_data.find(b"II*\x00"), exif_data.find(b"MM\x00*")) if offset >= 0), default=-1)
+    if start < 0:
+        return None
+    tiff = exif_data[start:]
+    exif = Image.Exif()
+    try:
+        exif.load(tiff)
+        ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+        offset, length = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not offset or not length or offset + length > len(tiff):
+            return None
+        preview = Image.open(io.BytesIO(tiff[offset:offset + length]))
+        preview.load()
+    except Exception:
+        # A damaged preview only costs the fast path
+        return None
+    # libheif applies the container's rotation to the primary image; the preview is stored unrotated
+    if orientation in _EXIF_ORIENTATION:
+        preview = preview.transpose(_EXIF_ORIENTATION[orientation])
+    return preview
+
+
+def open_primary(source, target: Optional[Callable[[Tuple[int, int]], Tuple[int, int]]] = None) -> Tuple[Image.Image, Dict]:
+    """Decode the primary image of a HEIC file, or its EXIF preview when it covers ``target(size)``.
+
+    Returns the loaded image and ``{"original_size", "source"}``, where source is
+    ``"primary"`` or ``"exif_preview"``.
+    """
+    if not HEIF_SUPPORTED:
+        raise ValueError("HEIC support requires pillow-heif. Install pillow-heif or enable HEIC conversion in the browser.")
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as err:
+        raise image_probe.ProbeError(str(err))
+    size = image.size
+
+    if target is not None:
+        needed = target(size)
+        preview = _exif_preview(image.info.get("exif"), image.info.get("original_orientation"))
+        if (
+            preview is not None
+            and preview.width >= needed[0]
+            and preview.height >= needed[1]
+            and abs(preview.width / preview.height - size[0] / size[1]) <= PREVIEW_ASPECT_TOLERANCE * size[0] / size[1]
+        ):
+            image.close()
+            return preview, {"original_size": size, "source": "exif_preview"}
+
+    image.load()
+    return image, {"original_size": size, "source": "primary"}
+
+
+def decode_ahead(jobs: Iterable[Tuple[object, int, Callable[[], object]]], budget: int = HEIC_MEMORY_BUDGET, workers: int = HEIC_WORKERS) -> Iterator[Tuple[object, object]]:
+    """Run ``(key, cost, decode)`` jobs ahead of the consumer; see ``pipeline.run_ahead``."""
+    return pipeline.run_ahead(jobs, budget, workers, "heic")
@@ -0,0 +1,96 @@
+"""Header-only image inspection.
+
+``probe`` opens the container and reads what its headers declare: format,
+dimensions, mode, frame count, EXIF orientation and whether an ICC profile is
+embedded. No pixel data is decoded, so a probe costs microseconds even for
+gigapixel inputs. That makes it suitable for rejecting uploads before the
+expensive part of a request starts.
+"""
+
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+from PIL import Image
+
+import strip_engine
+
+Source = Union[str, Path, BinaryIO]
+EXIF_ORIENTATION = 0x0112
+
+
+class ProbeError(ValueError):
+    """The upload is not an image Pillow can read."""
+
+
+def _open(fp: BinaryIO) -> Image.Image:
+    try:
+        return strip_engine.open_unchecked(fp)
+    except Exception:
+        fp.seek(0)
+    try:
+        return Image.open(fp)
+    except Image.DecompressionBombError as err:
+        raise ProbeError(str(err))
+    except Exception:
+        raise ProbeError("Not a readable image.")
+
+
+def _orientation(image: Image.Image) -> Optional[int]:
+    # getexif() on a PNG without an early eXIf chunk decodes the whole image, so only parse header bytes
+    raw = image.info.get("exif")
+    if raw:
+        exif = Image.Exif()
+        try:
+            exif.load(raw)
+        except Exception:
+            return None
+        return exif.get(EXIF_ORIENTATION)
+    tags = getattr(image, "tag_v2", None)
+    if tags is not None:
+        return tags.get(EXIF_ORIENTATION)
+    return None
+
+
+def probe(source: Source) -> Dict:
+    fp, owned = strip_engine.as_file(source)
+    try:
+        image = _open(fp)
+        # Walks frame headers only (GIF skips image blocks, TIFF follows IFD offsets)
+        frames = getattr(image, "n_frames", 1)
+        width, height = image.size
+        return {
+            "format": (image.format or "").lower(),
+            "width": width,
+            "height": height,
+            "megapixels": round(width * height / 1_000_000, 2),
+            "mode": image.mode,
+            "frames": frames,
+            "animated": frames > 1,
+            "orientation": _orientation(image),
+            "has_icc_profile": bool(image.info.get("icc_profile")),
+        }
+    finally:
+        if owned:
+            fp.close()
+        else:
+            fp.seek(0)
+
+
+def probe_timed(source: Source) -> Dict:
+    """``probe`` plus how long it took, in microseconds; unreadable input is reported, not raised."""
+    started = time.perf_counter()
+    try:
+        info = {"success": True, **probe(source)}
+    except ProbeError as err:
+        info = {"success": False, "error": str(err)}
+    info["elapsed_us"] = round((time.perf_counter() - started) * 1_000_000, 1)
+    return info
+
+
+def check_pixels(width: int, height: int, max_pixels: int) -> None:
+    if width * height > max_pixels:
+        raise ValueError(
+            f"Image is {width}x{height} ({width * height / 1_000_000:.1f} MP); "
+            f"the limit is {max_pixels // 1_000_000} MP."
+        )
@@ -0,0 +1,231 @@
+"""Embedded SQLite store for job, per-file and bundle metadata.
+
+Replaces the one-JSON-file-per-job layout: lookups by job id and expiry by
+creation time are index scans instead of directory walks. The database runs in
+WAL mode so readers never block the request that is writing a new job.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    bundle_type TEXT,
+    bundle_filename TEXT,
+    bundle TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    display_name TEXT NOT NULL,
+    original_name TEXT,
+    input_format TEXT,
+    output_format TEXT,
+    size_bytes INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS job_files_display_name ON job_files (display_name);
+"""
+
+# Top-level metadata keys that have their own columns; anything else is kept in "extra"
+_JOB_COLUMNS = {"id", "created_at", "created_at_human", "files", "bundle"}
+
+
+def _parse_created_at(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        return datetime.fromisoformat(value.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    return datetime.now(timezone.utc).timestamp()
+
+
+def _format_created_at(timestamp: float) -> Dict:
+    created_at = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+    return {
+        "created_at": created_at.isoformat() + "Z",
+        "created_at_human": created_at.strftime("%d %b %Y • %H:%M UTC"),
+    }
+
+
+class JobStore:
+    """Thread-safe access to the job database; one connection per thread."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only fsyncs at checkpoints; a crash may lose the
+            # last commits but never corrupts the database
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def save_job(self, metadata: Dict) -> None:
+        self.save_jobs([metadata])
+
+    def save_jobs(self, jobs: Iterable[Dict]) -> int:
+        """Insert or replace many jobs in a single transaction."""
+        job_rows = []
+        file_rows = []
+        for metadata in jobs:
+            files = metadata.get("files") or []
+            bundle = metadata.get("bundle") or {}
+            job_rows.append(
+                (
+                    metadata["id"],
+                    _parse_created_at(metadata.get("created_at")),
+                    bundle.get("type"),
+                    bundle.get("filename"),
+                    json.dumps(bundle),
+                    len(files),
+                    sum(int(item.get("size_bytes") or 0) for item in files),
+                    json.dumps({key: value for key, value in metadata.items() if key not in _JOB_COLUMNS}),
+                )
+            )
+            for position, item in enumerate(files):
+                file_rows.append(
+                    (
+                        metadata["id"],
+                        position,
+                        item.get("display_name", ""),
+                        item.get("original_name"),
+                        item.get("input_format"),
+                        item.get("output_format"),
+                        item.get("size_bytes"),
+                        json.dumps(item),
+                    )
+                )
+
+        connection = self._connection()
+        with connection:
+            connection.executemany("DELETE FROM job_files WHERE job_id = ?", [(row[0],) for row in job_rows])
+            connection.executemany("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", job_rows)
+            connection.executemany("INSERT INTO job_files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", file_rows)
+        return len(job_rows)
+
+    def _hydrate(self, row: sqlite3.Row, files: List[Dict]) -> Dict:
+        metadata = {"id": row["id"]}
+        metadata.update(_format_created_at(row["created_at"]))
+        metadata["files"] = files
+        metadata["bundle"] = json.loads(row["bundle"])
+        metadata.update(json.loads(row["extra"]))
+        return metadata
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        connection = self._connection()
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        files = [
+            json.loads(item["data"])
+            for item in connection.execute(
+                "SELECT data FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+            )
+        ]
+        return self._hydrate(row, files)
+
+    def list_jobs(self, limit: int = 50, before: Optional[float] = None) -> List[Dict]:
+        """Newest first summaries, paginated by creation timestamp."""
+        query = "SELECT id, created_at, bundle_type, bundle_filename, file_count, total_bytes FROM jobs"
+        params: list = []
+        if before is not None:
+            query += " WHERE created_at < ?"
+            params.append(before)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        summaries = []
+        for row in self._connection().execute(query, params):
+            summary = dict(row)
+            summary.update(_format_created_at(row["created_at"]))
+            summaries.append(summary)
+        return summaries
+
+    def expired(self, older_than: float) -> List[Dict]:
+        """Jobs created before ``older_than`` with the file names they own."""
+        connection = self._connection()
+        jobs = []
+        for row in connection.execute(
+            "SELECT id, bundle_type, bundle_filename FROM jobs WHERE created_at < ? ORDER BY created_at",
+            (older_than,),
+        ):
+            names = [
+                item["display_name"]
+                for item in connection.execute("SELECT display_name FROM job_files WHERE job_id = ?", (row["id"],))
+            ]
+            if row["bundle_type"] == "zip" and row["bundle_filename"]:
+                names.append(row["bundle_filename"])
+            jobs.append({"id": row["id"], "files": names})
+        return jobs
+
+    def storage_keys(self) -> Set[str]:
+        """Storage keys still referenced by a file or bundle of any job."""
+        connection = self._connection()
+        rows = connection.execute(
+            "SELECT json_extract(data, '$.storage_key') FROM job_files"
+            " UNION SELECT json_extract(bundle, '$.storage_key') FROM jobs"
+        )
+        return {row[0] for row in rows if row[0]}
+
+    def delete_jobs(self, job_ids: Iterable[str]) -> int:
+        ids = [(job_id,) for job_id in job_ids]
+        connection = self._connection()
+        with connection:
+            connection.executemany("DELETE FROM jobs WHERE id = ?", ids)
+        return len(ids)
+
+    def migrate_json(self, folder: Path, suffix: str = ".json", remove: bool = False, batch_size: int = 500) -> int:
+        """Import legacy per-job ``<job_id>.json`` metadata files in batches."""
+        imported = 0
+        batch: List[Dict] = []
+        sources: List[Path] = []
+        for path in sorted(Path(folder).glob(f"*{suffix}")):
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    metadata = json.load(handle)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if not isinstance(metadata, dict) or "id" not in metadata or "files" not in metadata:
+                continue
+            batch.append(metadata)
+            sources.append(path)
+            if len(batch) >= batch_size:
+                imported += self.save_jobs(batch)
+                batch = []
+        if batch:
+            imported += self.save_jobs(batch)
+        if remove:
+            for path in sources:
+                path.unlink(missing_ok=True)
+        return imported
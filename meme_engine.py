@@ -0,0 +1,295 @@
+"""Caption rendering for the Meme Generator.
+
+Captions can span several lines, are sized to fit automatically and drawn
+with an outline. Three caches keep heavy caption traffic cheap:
+
+* loaded ``ImageFont`` objects live in a process-wide LRU keyed by
+  (font, size), so a popular font is read from disk once, not once per
+  request;
+* line widths are memoised per (font, size, text). Auto-fit binary-searches
+  the font size using those widths and the font's line metrics only;
+  nothing is rasterised until the final size is known;
+* each rendered line (outline and fill masks) is kept in a small LRU, so a
+  repeated caption is pasted, not rasterised again.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps
+from werkzeug.utils import secure_filename
+
+FONT_DIR = Path(os.environ.get("MEME_FONT_DIR", str(Path(__file__).resolve().parent / "fonts")))
+DEFAULT_FONT = os.environ.get("MEME_DEFAULT_FONT", "default")
+FONT_CACHE_SIZE = int(os.environ.get("MEME_FONT_CACHE", "64"))
+MEASURE_CACHE_SIZE = int(os.environ.get("MEME_MEASURE_CACHE", "65536"))
+RASTER_CACHE_SIZE = int(os.environ.get("MEME_RASTER_CACHE", "256"))
+MIN_FONT_SIZE = 10
+MAX_FONT_SIZE = 400
+MAX_CAPTION_CHARS = 500
+# Share of the image height each caption box may use, and the side margin
+CAPTION_HEIGHT_SHARE = 0.3
+MARGIN_SHARE = 0.04
+LINE_SPACING = 1.1
+
+
+class FontCache:
+    """Thread-safe LRU of loaded fonts keyed by (font name, size)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._fonts: "OrderedDict[Tuple[str, int], ImageFont.FreeTypeFont]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, size: int) -> ImageFont.FreeTypeFont:
+        key = (name, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+        font = _load_font(name, size)
+        with self._lock:
+            self._fonts[key] = font
+            while len(self._fonts) > self.maxsize:
+                self._fonts.popitem(last=False)
+        return font
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._fonts),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def available_fonts() -> List[str]:
+    names = {DEFAULT_FONT, "default"}
+    if FONT_DIR.is_dir():
+        names.update(path.stem for path in FONT_DIR.iterdir() if path.suffix.lower() in {".ttf", ".otf"})
+    return sorted(names)
+
+
+def _font_path(name: str) -> Optional[Path]:
+    for suffix in (".ttf", ".otf"):
+        candidate = FONT_DIR / f"{name}{suffix}"
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _load_font(name: str, size: int) -> ImageFont.FreeTypeFont:
+    if name == "default":
+        # Pillow's bundled scalable font, so the engine works without any font files installed
+        return ImageFont.load_default(size=size)
+    path = _font_path(name)
+    if path is None:
+        raise ValueError(f"Unknown font: {name}")
+    return ImageFont.truetype(str(path), size)
+
+
+FONTS = FontCache(FONT_CACHE_SIZE)
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def line_width(name: str, size: int, text: str) -> float:
+    return FONTS.get(name, size).getlength(text)
+
+
+@lru_cache(maxsize=1024)
+def line_height(name: str, size: int) -> int:
+    ascent, descent = FONTS.get(name, size).getmetrics()
+    return ascent + descent
+
+
+@lru_cache(maxsize=RASTER_CACHE_SIZE)
+def line_masks(name: str, size: int, stroke: int, text: str) -> Tuple[Tuple[int, int], Optional[Image.Image], Image.Image]:
+    """Outline and fill masks for one line, anchored at its top centre; returns (offset, outline, fill)."""
+    font = FONTS.get(name, size)
+    left, top, right, bottom = font.getbbox(text, stroke_width=stroke, anchor="ma")
+    size_px = (max(1, right - left), max(1, bottom - top))
+    origin = (-left, -top)
+    outline = None
+    if stroke:
+        outline = Image.new("L", size_px)
+        ImageDraw.Draw(outline).text(origin, text, font=font, fill=255, stroke_width=stroke, stroke_fill=255, anchor="ma")
+    fill = Image.new("L", size_px)
+    ImageDraw.Draw(fill).text(origin, text, font=font, fill=255, anchor="ma")
+    return (left, top), outline, fill
+
+
+def wrap(text: str, name: str, size: int, max_width: float) -> List[str]:
+    """Greedy word wrap on measured widths; explicit newlines are kept, long words are split."""
+    lines: List[str] = []
+    for paragraph in text.splitlines() or [""]:
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}" if current else word
+            if line_width(name, size, candidate) <= max_width:
+                current = candidate
+                continue
+            if current:
+                lines.append(current)
+            pieces = _split_word(word, FONTS.get(name, size), max_width)
+            lines.extend(pieces[:-1])
+            current = pieces[-1]
+        lines.append(current)
+    return lines
+
+
+def _split_word(word: str, font: ImageFont.FreeTypeFont, max_width: float) -> List[str]:
+    """Cut ``word`` into pieces no wider than ``max_width`` (a piece is at least one character).
+
+    Each cut gallops from the previous piece's length and then binary-searches,
+    so only prefixes up to about twice a line's length are measured. They are
+    measured on the font directly: throwaway prefixes would only crowd out
+    the ``line_width`` cache.
+    """
+    pieces: List[str] = []
+    step = 1
+    while len(word) > 1:
+        # word[:low] is the longest prefix known to fit (or one character); word[:high] does not fit
+        low, high = 1, min(len(word), 2 * step)
+        while font.getlength(word[:high]) <= max_width:
+            if high == len(word):
+                pieces.append(word)
+                return pieces
+            low, high = high, min(len(word), 2 * high)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if font.getlength(word[:middle]) <= max_width:
+                low = middle
+            else:
+                high = middle
+        pieces.append(word[:low])
+        word = word[low:]
+        step = low
+    pieces.append(word)
+    return pieces
+
+
+def _block_size(lines: List[str], name: str, size: int, stroke: int) -> Tuple[float, float]:
+    width = max(line_width(name, size, line) for line in lines) + 2 * stroke
+    height = line_height(name, size) * (LINE_SPACING * (len(lines) - 1) + 1) + 2 * stroke
+    return width, height
+
+
+def stroke_for(size: int, ratio: float) -> int:
+    return max(0, round(size * ratio))
+
+
+def fit(text: str, name: str, box: Tuple[int, int], stroke_ratio: float, max_size: int = MAX_FONT_SIZE) -> Tuple[int, List[str]]:
+    """Largest font size whose wrapped text fits ``box``, found by binary search over measurements."""
+    box_width, box_height = box
+    low, high = MIN_FONT_SIZE, max(MIN_FONT_SIZE, min(max_size, MAX_FONT_SIZE, box_height))
+    best = (MIN_FONT_SIZE, wrap(text, name, MIN_FONT_SIZE, box_width))
+    while low <= high:
+        size = (low + high) // 2
+        stroke = stroke_for(size, stroke_ratio)
+        lines = wrap(text, name, size, box_width - 2 * stroke)
+        width, height = _block_size(lines, name, size, stroke)
+        if width <= box_width and height <= box_height:
+            best = (size, lines)
+            low = size + 1
+        else:
+            high = size - 1
+    return best
+
+
+def parse_options(form) -> Dict:
+    captions = {
+        "top": (form.get("top_text") or "").strip(),
+        "bottom": (form.get("bottom_text") or "").strip(),
+    }
+    if not any(captions.values()):
+        raise ValueError("Provide top_text and/or bottom_text.")
+    if any(len(text) > MAX_CAPTION_CHARS for text in captions.values()):
+        raise ValueError(f"Captions are limited to {MAX_CAPTION_CHARS} characters.")
+    if (form.get("uppercase") or "true").lower() == "true":
+        captions = {position: text.upper() for position, text in captions.items()}
+
+    font = secure_filename(form.get("font") or DEFAULT_FONT) or DEFAULT_FONT
+    if font != "default" and _font_path(font) is None:
+        raise ValueError(f"Unknown font: {font}")
+    try:
+        fill = ImageColor.getrgb(form.get("text_color") or "#ffffff")
+        stroke_fill = ImageColor.getrgb(form.get("stroke_color") or "#000000")
+    except ValueError:
+        raise ValueError("Colours must be CSS colour values, e.g. #ffffff.")
+    try:
+        font_size = int(form.get("font_size") or 0)
+        stroke_ratio = float(form.get("stroke_ratio") or 0.06)
+    except ValueError:
+        raise ValueError("font_size must be an integer and stroke_ratio a number.")
+    if font_size and not MIN_FONT_SIZE <= font_size <= MAX_FONT_SIZE:
+        raise ValueError(f"font_size must be between {MIN_FONT_SIZE} and {MAX_FONT_SIZE}.")
+    if not 0 <= stroke_ratio <= 0.25:
+        raise ValueError("stroke_ratio must be between 0 and 0.25.")
+    return {
+        "captions": captions,
+        "font": font,
+        "fill": fill,
+        "stroke_fill": stroke_fill,
+        "font_size": font_size or None,
+        "stroke_ratio": stroke_ratio,
+    }
+
+
+def render(image: Image.Image, options: Dict) -> Tuple[Image.Image, List[Dict]]:
+    """Draw the top/bottom captions onto ``image`` (in place when possible); returns it with the layout used."""
+    ImageOps.exif_transpose(image, in_place=True)
+    mode = "RGBA" if "A" in image.getbands() else "RGB"
+    if image.mode != mode:
+        image = image.convert(mode)
+    margin = max(4, round(image.width * MARGIN_SHARE))
+    box = (image.width - 2 * margin, max(MIN_FONT_SIZE, round(image.height * CAPTION_HEIGHT_SHARE)))
+    name = options["font"]
+
+    layout = []
+    for position, text in options["captions"].items():
+        if not text:
+            continue
+        if options["font_size"]:
+            size = options["font_size"]
+            lines = wrap(text, name, size, box[0] - 2 * stroke_for(size, options["stroke_ratio"]))
+        else:
+            size, lines = fit(text, name, box, options["stroke_ratio"])
+        stroke = stroke_for(size, options["stroke_ratio"])
+        step = line_height(name, size) * LINE_SPACING
+        _, block_height = _block_size(lines, name, size, stroke)
+        top = margin + stroke if position == "top" else image.height - margin - block_height + stroke
+        for index, line in enumerate(lines):
+            (left, offset_top), outline, fill = line_masks(name, size, stroke, line)
+            origin = (round(image.width / 2 + left), round(top + index * step + offset_top))
+            if outline is not None:
+                image.paste(options["stroke_fill"], origin, outline)
+            image.paste(options["fill"], origin, fill)
+        layout.append({"position": position, "font_size": size, "lines": lines})
+    return image, layout
+
+
+def stats() -> Dict:
+    result = {"fonts": FONTS.stats()}
+    for label, cached in (("measurements", line_width), ("rasters", line_masks)):
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        result[label] = {
+            "entries": info.currsize,
+            "max_entries": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+    return result
@@ -0,0 +1,90 @@
+"""Multi-page TIFF input and output, one decoded page at a time.
+
+Pillow exposes the pages of a multi-page TIFF (scans, fax batches) as frames
+of a single image. ``iter_pages`` seeks to each frame in turn and yields the
+same object each time. Only the current page is decoded, and a page's
+pixels are released when the next one is loaded. Writers consume pages
+from an iterator and finish each page before the next is pulled:
+
+* ``write_tiff`` appends one IFD per page through ``AppendingTiffWriter``;
+* ``write_zip`` encodes each page separately into a ZIP member.
+
+Multi-page PDF output is handled by ``app.convert_image_to_pdf``, which
+accepts the same page iterator.
+"""
+
+import io
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from PIL import Image, TiffImagePlugin
+
+TIFF_COMPRESSIONS = {"none": "raw", "lzw": "tiff_lzw", "deflate": "tiff_adobe_deflate", "jpeg": "jpeg"}
+DEFAULT_TIFF_COMPRESSION = os.environ.get("TIFF_COMPRESSION", "lzw")
+MAX_PAGES = int(os.environ.get("TIFF_MAX_PAGES", "500"))
+
+
+def parse_compression(value: Optional[str]) -> Optional[str]:
+    name = (value or DEFAULT_TIFF_COMPRESSION).strip().lower()
+    if name not in TIFF_COMPRESSIONS:
+        raise ValueError(f"Unsupported TIFF compression: {name}. Use one of: {', '.join(TIFF_COMPRESSIONS)}")
+    return TIFF_COMPRESSIONS[name]
+
+
+def tiff_save_kwargs(compression: Optional[str]) -> Dict:
+    # Always explicit: otherwise Pillow reuses the compression the source page was read with
+    kwargs: Dict = {"format": "TIFF", "compression": compression or "raw"}
+    if compression == "jpeg":
+        kwargs["quality"] = 90
+    return kwargs
+
+
+def is_multipage(image: Image.Image) -> bool:
+    return image.format == "TIFF" and getattr(image, "n_frames", 1) > 1
+
+
+def iter_pages(image: Image.Image) -> Iterator[Image.Image]:
+    """Yield every page of ``image``; each yielded page is only valid until the next one is requested."""
+    pages = getattr(image, "n_frames", 1)
+    if pages > MAX_PAGES:
+        raise ValueError(f"Document has {pages} pages; the limit is {MAX_PAGES}.")
+    for index in range(pages):
+        image.seek(index)
+        image.load()
+        yield image
+
+
+def tiff_ready(page: Image.Image, compression: Optional[str]) -> Image.Image:
+    # JPEG-in-TIFF only takes 8-bit greyscale or RGB; bilevel fax pages and alpha have to go
+    if compression == "jpeg" and page.mode not in {"L", "RGB"}:
+        return page.convert("L" if page.mode in {"1", "L", "LA", "I;16"} else "RGB")
+    return page
+
+
+def container_ext(output_ext: str) -> str:
+    """Extension of the single file a multi-page document becomes for ``output_ext``."""
+    return output_ext if output_ext in {"pdf", "tiff"} else "zip"
+
+
+def write_tiff(pages: Iterable[Image.Image], output_path: Path, compression: Optional[str]) -> int:
+    count = 0
+    with TiffImagePlugin.AppendingTiffWriter(str(output_path), new=True) as writer:
+        for page in pages:
+            page = tiff_ready(page, compression)
+            page.save(writer, **tiff_save_kwargs(compression))
+            writer.newFrame()
+            count += 1
+    return count
+
+
+def write_zip(pages: Iterable[Image.Image], output_path: Path, stem: str, output_ext: str, save_kwargs: Dict) -> int:
+    count = 0
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as archive:
+        for count, page in enumerate(pages, start=1):
+            buffer = io.BytesIO()
+            page.save(buffer, **save_kwargs)
+            # Pages are already compressed images; deflating them again only costs CPU
+            archive.writestr(f"{stem}_page{count:03d}.{output_ext}", buffer.getvalue())
+    return count
@@ -0,0 +1,217 @@
+"""Dominant colours, average colour and histogram for the Color Picker.
+
+A palette does not need every pixel. Each image is reduced to about
+``PALETTE_SAMPLE_PIXELS`` before any clustering. JPEGs use draft mode, so
+the decoder itself scales by up to 1/8 and a 24 MP photo never decodes at
+full size. The remaining scaling is done by a reducing resize.
+
+Clustering is a vectorised k-means over a 5-bit-per-channel colour
+histogram, so its cost follows the number of distinct colours (at most
+32768), not the pixel count. Initial centres are chosen with weighted
+k-means++ from a fixed seed, so results are repeatable. Without numpy, the
+sample is quantised with Pillow's median cut.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageStat
+
+import color_management
+
+# Optional numpy for the k-means path
+try:
+    import numpy as np
+
+    NUMPY_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    np = None
+    NUMPY_SUPPORTED = False
+
+PALETTE_METHODS = {"kmeans", "median_cut"}
+PALETTE_SAMPLE_PIXELS = int(os.environ.get("PALETTE_SAMPLE_PIXELS", "65536"))
+PALETTE_MAX_COLORS = int(os.environ.get("PALETTE_MAX_COLORS", "16"))
+PALETTE_BUDGET_MS = int(os.environ.get("PALETTE_BUDGET_MS", "250"))
+PALETTE_MAX_BATCH = int(os.environ.get("PALETTE_MAX_BATCH", "50"))
+KMEANS_MAX_ITERATIONS = 30
+# Stop once no centre moves by more than this (in 0-255 units)
+KMEANS_TOLERANCE = 0.5
+HISTOGRAM_BITS = 5
+
+
+def parse_options(options) -> Dict:
+    try:
+        count = int(options.get("count") or 6)
+        bins = int(options.get("bins") or 16)
+        budget_ms = int(options.get("budget_ms") or PALETTE_BUDGET_MS)
+    except (TypeError, ValueError):
+        raise ValueError("count, bins and budget_ms must be integers.")
+    if not 1 <= count <= PALETTE_MAX_COLORS:
+        raise ValueError(f"count must be between 1 and {PALETTE_MAX_COLORS}.")
+    if bins not in {8, 16, 32, 64, 128, 256}:
+        raise ValueError("bins must be a power of two between 8 and 256.")
+    method = (options.get("method") or ("kmeans" if NUMPY_SUPPORTED else "median_cut")).lower()
+    if method not in PALETTE_METHODS:
+        raise ValueError(f"Unsupported palette method: {method}")
+    if method == "kmeans" and not NUMPY_SUPPORTED:
+        method = "median_cut"
+    return {"count": count, "bins": bins, "method": method, "budget_ms": max(1, budget_ms)}
+
+
+def sample(image: Image.Image, max_pixels: int = PALETTE_SAMPLE_PIXELS) -> Tuple[Image.Image, Optional[Image.Image]]:
+    """Downsampled sRGB copy plus a mask of its opaque pixels (``None`` when fully opaque)."""
+    width, height = image.size
+    scale = min(1.0, (max_pixels / max(1, width * height)) ** 0.5)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if image.format == "JPEG" and scale < 1.0:
+        # The decoder scales by 1/2, 1/4 or 1/8 and never goes below the requested size
+        image.draft("RGB", target)
+    if image.mode == "P":
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    if image.size != target:
+        image = image.resize(target, Image.BOX, reducing_gap=2.0)
+    image = color_management.to_srgb(image)
+
+    mask = None
+    if image.mode in {"RGBA", "LA", "PA"} or "transparency" in image.info:
+        alpha = image.convert("RGBA").getchannel("A")
+        if alpha.getextrema()[0] < 128:
+            mask = alpha.point(lambda value: 255 if value >= 128 else 0)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image, mask
+
+
+def _hex(rgb) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*rgb)
+
+
+def _colour(rgb, proportion: Optional[float] = None) -> Dict:
+    rgb = [int(round(channel)) for channel in rgb]
+    entry = {"hex": _hex(rgb), "rgb": rgb}
+    if proportion is not None:
+        entry["proportion"] = round(proportion, 4)
+    return entry
+
+
+def _weighted_colours(image: Image.Image, mask: Optional[Image.Image]):
+    """Distinct 5-bit colours (as bin means) and how many sample pixels fall in each."""
+    pixels = np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+    if mask is not None:
+        pixels = pixels[np.asarray(mask).reshape(-1) > 0]
+    shift = 8 - HISTOGRAM_BITS
+    quantised = pixels >> shift
+    quantised = quantised.astype(np.int32)
+    codes = (quantised[:, 0] << (2 * HISTOGRAM_BITS)) | (quantised[:, 1] << HISTOGRAM_BITS) | quantised[:, 2]
+    size = 1 << (3 * HISTOGRAM_BITS)
+    counts = np.bincount(codes, minlength=size)
+    present = np.nonzero(counts)[0]
+    # Each bin is represented by the mean of its pixels, not its centre, so flat colours come back exact
+    colours = np.stack(
+        [np.bincount(codes, weights=pixels[:, channel], minlength=size)[present] for channel in range(3)], axis=1
+    ) / counts[present][:, None]
+    return colours.astype(np.float32), counts[present].astype(np.float32)
+
+
+def _kmeans(colours, weights, count: int, deadline: float) -> Tuple[list, int, bool]:
+    """Weighted k-means; returns (centres, weights per centre), iterations and whether time ran out."""
+    count = min(count, len(colours))
+    rng = np.random.default_rng(0)
+    # Weighted k-means++ seeding
+    centres = [colours[int(np.argmax(weights))]]
+    nearest = ((colours - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, count):
+        scores = nearest * weights
+        total = scores.sum()
+        if total <= 0:
+            break
+        choice = int(rng.choice(len(colours), p=scores / total))
+        centres.append(colours[choice])
+        nearest = np.minimum(nearest, ((colours - colours[choice]) ** 2).sum(axis=1))
+    centres = np.array(centres, dtype=np.float32)
+
+    squared = (colours ** 2).sum(axis=1)[:, None]
+    iterations = 0
+    exceeded = False
+    while iterations < KMEANS_MAX_ITERATIONS:
+        if time.perf_counter() >= deadline:
+            exceeded = True
+            break
+        iterations += 1
+        distances = squared - 2 * colours @ centres.T + (centres ** 2).sum(axis=1)[None, :]
+        labels = distances.argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centres))
+        moved = centres.copy()
+        for channel in range(3):
+            sums = np.bincount(labels, weights=weights * colours[:, channel], minlength=len(centres))
+            nonempty = totals > 0
+            moved[nonempty, channel] = sums[nonempty] / totals[nonempty]
+        shift = float(np.abs(moved - centres).max())
+        centres = moved
+        if shift <= KMEANS_TOLERANCE:
+            break
+
+    distances = squared - 2 * colours @ centres.T + (centres ** 2).sum(axis=1)[None, :]
+    totals = np.bincount(distances.argmin(axis=1), weights=weights, minlength=len(centres))
+    return list(zip(centres.tolist(), totals.tolist())), iterations, exceeded
+
+
+def _median_cut(image: Image.Image, mask: Optional[Image.Image], count: int) -> list:
+    quantised = image.quantize(colors=count, method=Image.Quantize.MEDIANCUT)
+    palette = quantised.getpalette() or []
+    histogram = quantised.histogram(mask=mask)
+    return [(palette[index * 3:index * 3 + 3], pixels) for index, pixels in enumerate(histogram[:count]) if pixels]
+
+
+def _histogram(image: Image.Image, mask: Optional[Image.Image], bins: int) -> Dict:
+    values = image.histogram(mask=mask)
+    width = 256 // bins
+    total = max(1, sum(values[:256]))
+    result: Dict = {"bins": bins}
+    for offset, channel in enumerate("rgb"):
+        counts = values[offset * 256:(offset + 1) * 256]
+        result[channel] = [round(sum(counts[start:start + width]) / total, 4) for start in range(0, 256, width)]
+    return result
+
+
+def extract(image: Image.Image, count: int = 6, method: Optional[str] = None, bins: int = 16, budget_ms: int = PALETTE_BUDGET_MS) -> Dict:
+    """Palette for one opened image; k-means stops early once ``budget_ms`` is spent."""
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000
+    method = method or ("kmeans" if NUMPY_SUPPORTED else "median_cut")
+    source_size = image.size
+    reduced, mask = sample(image)
+    if mask is not None and mask.getextrema()[1] == 0:
+        raise ValueError("Image has no opaque pixels.")
+
+    iterations = 0
+    exceeded = False
+    if method == "kmeans" and NUMPY_SUPPORTED and time.perf_counter() < deadline:
+        colours, weights = _weighted_colours(reduced, mask)
+        clusters, iterations, exceeded = _kmeans(colours, weights, count, deadline)
+    else:
+        # Median cut is a single C pass; it is also the fallback when decoding ate the budget
+        exceeded = method == "kmeans" and NUMPY_SUPPORTED
+        method = "median_cut"
+        clusters = _median_cut(reduced, mask, count)
+
+    total = sum(weight for _, weight in clusters) or 1
+    clusters.sort(key=lambda cluster: cluster[1], reverse=True)
+    colours: List[Dict] = [_colour(rgb, weight / total) for rgb, weight in clusters if weight > 0]
+    return {
+        "colors": colours,
+        "average": _colour(ImageStat.Stat(reduced, mask).mean),
+        "histogram": _histogram(reduced, mask, bins),
+        "method": method,
+        "iterations": iterations,
+        "source_size": list(source_size),
+        "sample_size": list(reduced.size),
+        "budget_exceeded": exceeded or time.perf_counter() > deadline,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def extract_file(source, **options) -> Dict:
+    with Image.open(source) as image:
+        return extract(image, **options)
@@ -0,0 +1,45 @@
+"""Bounded, order-preserving thread pipelines for per-file image work.
+
+Pillow releases the GIL while it decodes, resamples and encodes, and
+libheif does the same while it decodes. Per-file work run on a thread pool
+therefore overlaps across cores: file N+1 decodes while file N is still
+being encoded. ``run_ahead`` yields results in job order, so responses keep
+the order of the uploads. It also caps the estimated memory of the images
+in flight.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple
+
+
+def run_ahead(
+    jobs: Iterable[Tuple[object, int, Callable[[], object]]],
+    budget: int,
+    workers: int,
+    name: str = "pipeline",
+) -> Iterator[Tuple[object, object]]:
+    """Run ``(key, cost, work)`` jobs on a thread pool and yield ``(key, result)`` in job order.
+
+    A job is started only while the costs of the jobs started but not yet
+    consumed fit in ``budget``. The oldest job always runs, even when it alone
+    is larger. A job's cost is released when the consumer asks for the next
+    result, so the memory of the item being consumed counts too.
+    """
+    queue = iter(jobs)
+    upcoming = next(queue, None)
+    pending: deque = deque()
+    in_flight = 0
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+    try:
+        while upcoming is not None or pending:
+            while upcoming is not None and (not pending or in_flight + upcoming[1] <= budget):
+                key, cost, work = upcoming
+                pending.append((key, cost, pool.submit(work)))
+                in_flight += cost
+                upcoming = next(queue, None)
+            key, cost, future = pending.popleft()
+            yield key, future.result()
+            in_flight -= cost
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,120 @@
+"""Opt-in per-request profiling for production hot-path analysis.
+
+A request is profiled when it carries a valid signed ``X-ImageForge-Profile``
+header or falls inside ``PROFILE_SAMPLE_RATE``. Each sampled request writes a
+``.pstats`` file plus a ``.json`` sidecar tagging it with the route, input
+format, pixel count and form options.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+PROFILE_HEADER = "X-ImageForge-Profile"
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+PROFILE_TOKEN_TTL = 300  # seconds a signed header stays valid
+
+
+def sign_profile_request(path: str, secret: str = PROFILE_SECRET, timestamp: Optional[int] = None) -> str:
+    """Build a header value for ``path``: ``<unix-ts>.<hmac-sha256>``."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{digest}"
+
+
+def verify_signature(value: str, path: str) -> bool:
+    if not PROFILE_SECRET or not value or "." not in value:
+        return False
+    timestamp, _ = value.split(".", 1)
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    if age > PROFILE_TOKEN_TTL:
+        return False
+    return hmac.compare_digest(value, sign_profile_request(path, PROFILE_SECRET, int(timestamp)))
+
+
+def verify_admin_token(value: Optional[str]) -> bool:
+    return bool(PROFILE_SECRET) and hmac.compare_digest(value or "", PROFILE_SECRET)
+
+
+def should_profile(header_value: Optional[str], path: str) -> bool:
+    # Cheap checks first: with no header and a zero rate this is two comparisons
+    if header_value:
+        return verify_signature(header_value, path)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start() -> cProfile.Profile:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def describe_upload(files, form) -> Dict:
+    """Tag a profile with the first upload's format and pixel count (header read only)."""
+    tags: Dict = {"input_format": None, "pixels": None, "files": 0}
+    storages = [storage for key in files for storage in files.getlist(key) if storage.filename]
+    tags["files"] = len(storages)
+    if storages:
+        first = storages[0]
+        tags["input_format"] = first.filename.rsplit(".", 1)[-1].lower() if "." in first.filename else None
+        try:
+            first.stream.seek(0)
+            with Image.open(first.stream) as probe:
+                tags["input_format"] = (probe.format or tags["input_format"] or "").lower()
+                tags["pixels"] = probe.width * probe.height
+        except Exception:
+            pass
+    tags["options"] = {key: value for key, value in form.items() if len(value) < 512}
+    return tags
+
+
+def finish(profiler: cProfile.Profile, folder: Path, route: str, elapsed: float, tags: Dict) -> str:
+    """Stop the profiler and write ``<name>.pstats`` and ``<name>.json``; returns the name."""
+    profiler.disable()
+    folder.mkdir(parents=True, exist_ok=True)
+    slug = route.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "index"
+    name = f"{time.strftime('%Y%m%d_%H%M%S')}_{slug}_{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(str(folder / f"{name}.pstats"))
+    meta = {"name": name, "route": route, "elapsed_ms": round(elapsed * 1000, 2), "captured_at": time.time()}
+    meta.update(tags)
+    with open(folder / f"{name}.json", "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+    prune(folder)
+    return name
+
+
+def prune(folder: Path) -> None:
+    captures = sorted(folder.glob("*.pstats"), key=lambda path: path.stat().st_mtime)
+    for stale in captures[:-PROFILE_MAX_FILES] if PROFILE_MAX_FILES > 0 else []:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".json").unlink(missing_ok=True)
+
+
+def list_profiles(folder: Path) -> List[Dict]:
+    if not folder.exists():
+        return []
+    profiles = []
+    for sidecar in sorted(folder.glob("*.json"), reverse=True):
+        try:
+            with open(sidecar, encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            continue
+        stats_path = sidecar.with_suffix(".pstats")
+        meta["size_bytes"] = stats_path.stat().st_size if stats_path.exists() else 0
+        profiles.append(meta)
+    return profiles
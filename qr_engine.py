@@ -0,0 +1,351 @@
+"""Server-side QR rendering for single codes and large print batches."""
+
+import csv
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageColor
+from werkzeug.utils import secure_filename
+
+# Optional qrcode encoder (qrcode[pil] in requirements.txt)
+try:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+    QR_SUPPORTED = True
+    ERROR_LEVELS = {
+        "L": ERROR_CORRECT_L,
+        "M": ERROR_CORRECT_M,
+        "Q": ERROR_CORRECT_Q,
+        "H": ERROR_CORRECT_H,
+    }
+except Exception:
+    QR_SUPPORTED = False
+    ERROR_LEVELS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+QR_FORMATS = {"png", "svg", "pdf"}
+QR_MIMETYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+QR_MIN_SIZE = 64
+QR_MAX_SIZE = 4096
+QR_MAX_BATCH = int(os.environ.get("QR_MAX_BATCH", "10000"))
+QR_CACHE_SIZE = int(os.environ.get("QR_CACHE_SIZE", "4096"))
+QR_WORKERS = int(os.environ.get("QR_WORKERS", str(os.cpu_count() or 2)))
+# Below this many cache misses the pool start-up costs more than it saves
+QR_POOL_THRESHOLD = 64
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered QR bytes keyed by the full render spec."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Tuple, data: bytes) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+RENDER_CACHE = RenderCache(QR_CACHE_SIZE)
+
+
+def parse_render_options(options: Dict) -> Dict:
+    """Validate user supplied options and return a normalised render spec."""
+    fmt = str(options.get("format", "png")).lower().lstrip(".")
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Unsupported QR format: {fmt}")
+
+    error = str(options.get("error_level", "M")).upper()
+    if error not in ERROR_LEVELS:
+        raise ValueError(f"Unsupported error correction level: {error}")
+
+    try:
+        size = int(options.get("size", 512))
+        border = int(options.get("border", 4))
+    except (TypeError, ValueError):
+        raise ValueError("Size and border must be integers.")
+    size = max(QR_MIN_SIZE, min(size, QR_MAX_SIZE))
+    border = max(0, min(border, 16))
+
+    colours = {}
+    for field, default in (("fg_color", "#000000"), ("bg_color", "#ffffff")):
+        value = str(options.get(field) or default)
+        try:
+            colours[field] = "#%02x%02x%02x" % ImageColor.getrgb(value)[:3]
+        except ValueError:
+            raise ValueError(f"Invalid colour for {field}: {value}")
+
+    return {
+        "format": fmt,
+        "error_level": error,
+        "size": size,
+        "border": border,
+        "fg_color": colours["fg_color"],
+        "bg_color": colours["bg_color"],
+    }
+
+
+def cache_key(payload: str, spec: Dict) -> Tuple:
+    return (
+        payload,
+        spec["error_level"],
+        spec["size"],
+        spec["border"],
+        spec["fg_color"],
+        spec["bg_color"],
+        spec["format"],
+    )
+
+
+def build_matrix(payload: str, error_level: str, border: int) -> List[List[bool]]:
+    if not QR_SUPPORTED:
+        raise ValueError("Server-side QR generation requires qrcode. Install qrcode[pil].")
+    qr = qrcode.QRCode(error_correction=ERROR_LEVELS[error_level], border=border, box_size=1)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _matrix_to_image(matrix: List[List[bool]], spec: Dict) -> Image.Image:
+    modules = len(matrix)
+    bitmap = Image.new("1", (modules, modules), 0)
+    bitmap.putdata([1 if cell else 0 for row in matrix for cell in row])
+    # Nearest keeps module edges crisp; the palette maps 0/1 to bg/fg in one pass
+    scaled = bitmap.resize((spec["size"], spec["size"]), Image.NEAREST).convert("P")
+    fg = ImageColor.getrgb(spec["fg_color"])
+    bg = ImageColor.getrgb(spec["bg_color"])
+    scaled.putpalette(list(bg) + list(fg))
+    return scaled
+
+
+def _matrix_to_svg(matrix: List[List[bool]], spec: Dict) -> bytes:
+    modules = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < modules and row[x]:
+                x += 1
+            parts.append(f"M{start} {y}h{x - start}v1h{start - x}z")
+    svg = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{spec["size"]}" height="{spec["size"]}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="{spec["bg_color"]}"/>'
+        f'<path fill="{spec["fg_color"]}" d="{"".join(parts)}"/></svg>'
+    )
+    return svg.encode("utf-8")
+
+
+def render_qr(payload: str, spec: Dict) -> bytes:
+    """Render one QR code to PNG, SVG or PDF bytes."""
+    matrix = build_matrix(payload, spec["error_level"], spec["border"])
+    if spec["format"] == "svg":
+        return _matrix_to_svg(matrix, spec)
+
+    image = _matrix_to_image(matrix, spec)
+    buffer = io.BytesIO()
+    if spec["format"] == "pdf":
+        image.convert("RGB").save(buffer, format="PDF", resolution=72.0)
+    else:
+        # A two-entry palette lets the PNG encoder write 1-bit rows, which is
+        # an order of magnitude faster than optimising an RGB image
+        image.save(buffer, format="PNG", bits=1)
+    return buffer.getvalue()
+
+
+def _render_job(job: Tuple[str, Dict]) -> bytes:
+    # Module-level so the process pool can pickle it by reference
+    payload, spec = job
+    return render_qr(payload, spec)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=max(1, QR_WORKERS))
+        return _POOL
+
+
+def render_cached(payload: str, spec: Dict) -> bytes:
+    key = cache_key(payload, spec)
+    data = RENDER_CACHE.get(key)
+    if data is None:
+        data = render_qr(payload, spec)
+        RENDER_CACHE.put(key, data)
+    return data
+
+
+def render_many(payloads: List[str], spec: Dict) -> Iterator[bytes]:
+    """Yield rendered codes in input order, rendering cache misses in the worker pool."""
+    keys = [cache_key(payload, spec) for payload in payloads]
+    ready: Dict[Tuple, bytes] = {}
+    pending: "OrderedDict[Tuple, str]" = OrderedDict()
+    for key, payload in zip(keys, payloads):
+        if key in ready or key in pending:
+            continue
+        data = RENDER_CACHE.get(key)
+        if data is None:
+            pending[key] = payload
+        else:
+            ready[key] = data
+
+    if len(pending) >= QR_POOL_THRESHOLD and QR_WORKERS > 1:
+        rendered = _get_pool().map(
+            _render_job,
+            ((payload, spec) for payload in pending.values()),
+            chunksize=32,
+        )
+    else:
+        rendered = (render_qr(payload, spec) for payload in pending.values())
+
+    pending_keys = iter(pending.keys())
+    for key in keys:
+        # Pull from the pool lazily so early entries stream while later ones render
+        while key not in ready:
+            next_key = next(pending_keys)
+            data = next(rendered)
+            RENDER_CACHE.put(next_key, data)
+            ready[next_key] = data
+        yield ready[key]
+
+
+def parse_payloads(file_storage=None, body: Optional[Dict] = None) -> List[Tuple[str, Optional[str]]]:
+    """Return (payload, filename) pairs from a JSON body or an uploaded CSV/JSON list."""
+    entries: List[Tuple[str, Optional[str]]] = []
+
+    if file_storage is not None and file_storage.filename:
+        raw = file_storage.read().decode("utf-8-sig")
+        if file_storage.filename.lower().endswith(".json"):
+            try:
+                body = {"payloads": json.loads(raw)}
+            except json.JSONDecodeError:
+                raise ValueError("Malformed JSON payload list.")
+        else:
+            reader = csv.reader(io.StringIO(raw))
+            rows = [row for row in reader if row and any(cell.strip() for cell in row)]
+            header = [cell.strip().lower() for cell in rows[0]] if rows else []
+            if "payload" in header or "data" in header:
+                column = header.index("payload") if "payload" in header else header.index("data")
+                name_column = header.index("filename") if "filename" in header else None
+                rows = rows[1:]
+            else:
+                column, name_column = 0, None
+            for row in rows:
+                if column >= len(row):
+                    continue
+                name = row[name_column] if name_column is not None and name_column < len(row) else None
+                entries.append((row[column], name or None))
+
+    if body:
+        items = body.get("payloads")
+        if items is None and body.get("payload") is not None:
+            items = [body["payload"]]
+        if not isinstance(items, list):
+            raise ValueError("Expected a payload or a list of payloads.")
+        for item in items:
+            if isinstance(item, dict):
+                entries.append((str(item.get("payload", "")), item.get("filename")))
+            else:
+                entries.append((str(item), None))
+
+    entries = [(payload, name) for payload, name in entries if payload != ""]
+    if not entries:
+        raise ValueError("No QR payloads supplied.")
+    if len(entries) > QR_MAX_BATCH:
+        raise ValueError(f"QR batch limit is {QR_MAX_BATCH} payloads.")
+    return entries
+
+
+def bundle_names(entries: Iterable[Tuple[str, Optional[str]]], fmt: str, prefix: str) -> List[str]:
+    names = []
+    used: set = set()
+    for index, (_, requested) in enumerate(entries, start=1):
+        base = secure_filename(requested.rsplit(".", 1)[0]) if requested else ""
+        base = base or f"{prefix}_{index:05d}"
+        candidate = f"{base}.{fmt}"
+        suffix = 2
+        while candidate.lower() in used:
+            candidate = f"{base}_{suffix}.{fmt}"
+            suffix += 1
+        used.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable sink so ZipFile streams entries with data descriptors."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(names: List[str], blobs: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield a ZIP archive chunk by chunk as entries become available."""
+    sink = _ChunkSink()
+    # PNG and PDF output is already compressed, deflating it again only costs CPU
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in zip(names, blobs):
+            compression = zipfile.ZIP_DEFLATED if name.endswith(".svg") else zipfile.ZIP_STORED
+            archive.writestr(name, data, compress_type=compression)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    tail = sink.drain()
+    if tail:
+        yield tail
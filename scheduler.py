@@ -0,0 +1,141 @@
+"""Cost-based admission into a fast and a heavy lane.
+
+Every image request gets a cost estimate from header-only information:
+megapixels, input format, operation and whether enhancement is on. Requests
+at or above ``LANE_HEAVY_COST`` run in the heavy lane, the rest in the fast
+lane. Each lane has its own concurrency limit and bounded queue, so a burst
+of 40 MP HEIC enhancement jobs can only use the heavy share of the slots,
+and icon conversions keep flowing.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+LANE_SLOTS = int(os.environ.get("LANE_SLOTS", str(max(2, os.cpu_count() or 1))))
+LANE_HEAVY_SHARE = float(os.environ.get("LANE_HEAVY_SHARE", "0.25"))
+LANE_HEAVY_COST = float(os.environ.get("LANE_HEAVY_COST", "12"))
+LANE_MAX_QUEUE = int(os.environ.get("LANE_MAX_QUEUE", "32"))
+LANE_QUEUE_TIMEOUT = float(os.environ.get("LANE_QUEUE_TIMEOUT", "30"))
+
+# Relative decode cost per megapixel
+FORMAT_FACTORS = {"heic": 3.0, "tiff": 1.5, "webp": 1.5, "png": 1.2, "gif": 1.2, "bmp": 0.6, "jpg": 1.0, "jpeg": 1.0}
+OPERATION_FACTORS = {"convert": 1.0, "resize": 1.2, "crop": 0.5, "compress": 1.5, "compress_target": 4.0, "remove_bg": 4.0, "palette": 0.2, "meme": 1.0}
+ENHANCE_FACTOR = 8.0
+PER_FILE_COST = 0.05
+# Bytes of encoded input per pixel, used when the header cannot be read
+FALLBACK_BYTES_PER_PIXEL = 0.3
+
+
+def estimate_cost(pixels: int, input_format: str, operation: str, enhance: bool = False) -> float:
+    megapixels = pixels / 1_000_000
+    cost = megapixels * FORMAT_FACTORS.get(input_format, 1.0) * OPERATION_FACTORS.get(operation, 1.0)
+    if enhance:
+        cost *= ENHANCE_FACTOR
+    return cost + PER_FILE_COST
+
+
+class LaneBusy(Exception):
+    """The lane queue is full or the wait timed out; maps to HTTP 503."""
+
+    def __init__(self, lane: str, message: str):
+        super().__init__(message)
+        self.lane = lane
+
+
+class Lane:
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "completed": 0, "rejected": 0, "timed_out": 0}
+        self.cost_total = 0.0
+        self._waits: deque = deque(maxlen=1000)
+
+    def acquire(self, cost: float) -> None:
+        started = time.perf_counter()
+        with self._condition:
+            if self.running >= self.limit and self.waiting >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise LaneBusy(self.name, f"The {self.name} lane is full, please retry shortly.")
+            self.waiting += 1
+            try:
+                deadline = started + self.timeout
+                while self.running >= self.limit:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        if self.running < self.limit:
+                            break
+                        self.counters["timed_out"] += 1
+                        raise LaneBusy(self.name, f"Timed out waiting in the {self.name} lane.")
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            self.counters["admitted"] += 1
+            self.cost_total += cost
+            self._waits.append(time.perf_counter() - started)
+
+    def release(self) -> None:
+        with self._condition:
+            self.running -= 1
+            self.counters["completed"] += 1
+            self._condition.notify()
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            waits = sorted(self._waits)
+            admitted = self.counters["admitted"]
+            return {
+                "limit": self.limit,
+                "running": self.running,
+                "waiting": self.waiting,
+                "max_queue": self.max_queue,
+                **self.counters,
+                "avg_cost": round(self.cost_total / admitted, 3) if admitted else None,
+                "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 2) if waits else None,
+                "wait_p95_ms": round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 2) if waits else None,
+            }
+
+
+class LaneScheduler:
+    def __init__(
+        self,
+        slots: int = LANE_SLOTS,
+        heavy_share: float = LANE_HEAVY_SHARE,
+        heavy_cost: float = LANE_HEAVY_COST,
+        max_queue: int = LANE_MAX_QUEUE,
+        timeout: float = LANE_QUEUE_TIMEOUT,
+    ):
+        heavy_slots = max(1, round(slots * heavy_share))
+        fast_slots = max(1, slots - heavy_slots)
+        self.heavy_cost = heavy_cost
+        self.lanes = {
+            "fast": Lane("fast", fast_slots, max_queue, timeout),
+            "heavy": Lane("heavy", heavy_slots, max_queue, timeout),
+        }
+
+    def lane_for(self, cost: float) -> str:
+        return "heavy" if cost >= self.heavy_cost else "fast"
+
+    @contextmanager
+    def slot(self, cost: float, lane: Optional[str] = None) -> Iterator[str]:
+        name = lane or self.lane_for(cost)
+        selected = self.lanes[name]
+        selected.acquire(cost)
+        try:
+            yield name
+        finally:
+            selected.release()
+
+    def metrics(self) -> Dict:
+        return {
+            "heavy_cost_threshold": self.heavy_cost,
+            "lanes": {name: lane.snapshot() for name, lane in self.lanes.items()},
+        }
@@ -0,0 +1,248 @@
+"""Pre-rendered pages and fingerprinted asset bundles.
+
+Almost all page routes render a template that does not depend on the
+request. ``build`` renders every such page once (per deploy) and writes it
+with gzip and, when the ``brotli`` package is installed, brotli variants.
+While rendering, each run of adjacent local ``<link rel="stylesheet">`` or
+``<script src>`` tags is replaced by a single bundle. A bundle is named by
+the hash of its content, so it can be cached for a year.
+
+``PrebuiltSite`` loads the build into memory and answers page and bundle
+requests. It picks an encoding from ``Accept-Encoding``, sets strong ETags
+and answers ``If-None-Match`` with 304. No template is rendered and nothing
+is read from disk per request.
+"""
+
+import gzip
+import hashlib
+import json
+import posixpath
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from flask import Flask, current_app, request
+
+# Optional brotli for the .br variants
+try:
+    import brotli
+
+    BROTLI_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+    BROTLI_SUPPORTED = False
+
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Page routes under these prefixes are never pre-rendered
+DYNAMIC_PREFIXES = ("/api/", "/admin/", "/static/")
+MIME_TYPES = {".html": "text/html; charset=utf-8", ".css": "text/css; charset=utf-8", ".js": "text/javascript; charset=utf-8"}
+
+_STYLESHEET = r'<link\s+rel="stylesheet"\s+href="(?P<css>/static/[^"?#]+\.css)"\s*/?>'
+_SCRIPT = r'<script\s+src="(?P<js>/static/[^"?#]+\.js)"\s*>\s*</script>'
+_ASSET_TAG = re.compile(f"{_STYLESHEET}|{_SCRIPT}")
+_CSS_IMPORT = re.compile(r"""@import\s+(?:url\(\s*)?["']?([^"')\s]+)["']?\s*\)?\s*;""")
+_CSS_URL = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+
+
+def content_hash(data: bytes) -> str:
+    # 32 hex characters, which delivery.is_immutable also treats as single-use
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _is_local(reference: str) -> bool:
+    return not re.match(r"^(?:[a-z][a-z0-9+.-]*:|//|/|#)", reference, re.IGNORECASE)
+
+
+def _static_path(static_folder: Path, url: str) -> Path:
+    return static_folder / url[len("/static/"):]
+
+
+def _css_source(path: Path, static_folder: Path, seen: set) -> str:
+    """CSS with local ``@import``s inlined once each and relative ``url()``s made absolute."""
+    if path in seen:
+        return ""
+    seen.add(path)
+    text = path.read_text(encoding="utf-8")
+    base = "/static/" + path.parent.relative_to(static_folder).as_posix()
+
+    def inline(match) -> str:
+        reference = match.group(1)
+        if not _is_local(reference):
+            return match.group(0)
+        return _css_source((path.parent / reference).resolve(), static_folder, seen)
+
+    def absolute(match) -> str:
+        quote, reference = match.groups()
+        if not _is_local(reference.strip()):
+            return match.group(0)
+        return f"url({quote}{posixpath.normpath(posixpath.join(base, reference.strip()))}{quote})"
+
+    # An @import in the middle of a bundle would be ignored by browsers, so imports are inlined
+    return _CSS_URL.sub(absolute, _CSS_IMPORT.sub(inline, text))
+
+
+def _compress(data: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if BROTLI_SUPPORTED:
+        variants["br"] = brotli.compress(data, quality=11)
+    # A variant that is not smaller is never worth sending
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def _write(path: Path, data: bytes) -> Dict:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    encodings = []
+    for encoding, body in _compress(data).items():
+        Path(f"{path}.{'br' if encoding == 'br' else 'gz'}").write_bytes(body)
+        encodings.append(encoding)
+    return {"etag": content_hash(data), "size": len(data), "encodings": encodings}
+
+
+class _Bundler:
+    def __init__(self, static_folder: Path, output: Path):
+        self.static_folder = static_folder
+        self.output = output
+        self.bundles: Dict[str, Dict] = {}
+
+    def bundle(self, kind: str, urls: List[str]) -> str:
+        if kind == "css":
+            seen: set = set()
+            parts = [_css_source(_static_path(self.static_folder, url).resolve(), self.static_folder, seen) for url in urls]
+            data = "\n".join(parts).encode("utf-8")
+        else:
+            # Classic scripts share one global scope; the separator guards against a missing semicolon
+            parts = [_static_path(self.static_folder, url).read_text(encoding="utf-8") for url in urls]
+            data = "\n;\n".join(parts).encode("utf-8")
+        name = f"{content_hash(data)}.{kind}"
+        url = f"/static/{self.output.relative_to(self.static_folder).as_posix()}/{name}"
+        if url not in self.bundles:
+            self.bundles[url] = {"file": name, "sources": list(urls), **_write(self.output / name, data)}
+        return url
+
+    def rewrite(self, html: str) -> str:
+        """Replace each run of adjacent local stylesheet or script tags by one bundle tag."""
+        pieces: List[str] = []
+        run: List[str] = []
+        kind = None
+        position = 0
+
+        def flush():
+            if not run:
+                return
+            url = self.bundle(kind, run)
+            if kind == "css":
+                pieces.append(f'<link rel="stylesheet" href="{url}">')
+            else:
+                pieces.append(f'<script src="{url}"></script>')
+            run.clear()
+
+        for match in _ASSET_TAG.finditer(html):
+            gap = html[position:match.start()]
+            tag_kind = "css" if match.group("css") else "js"
+            if run and (gap.strip() or tag_kind != kind):
+                flush()
+            if not run:
+                pieces.append(gap)
+            kind = tag_kind
+            run.append(match.group(tag_kind))
+            position = match.end()
+        flush()
+        pieces.append(html[position:])
+        return "".join(pieces)
+
+
+def page_paths(app: Flask) -> List[str]:
+    """Argument-free GET routes outside the API, admin and static trees."""
+    paths = []
+    for rule in app.url_map.iter_rules():
+        if rule.arguments or "GET" not in rule.methods or rule.rule.startswith(DYNAMIC_PREFIXES):
+            continue
+        paths.append(rule.rule)
+    return sorted(paths)
+
+
+def build(app: Flask, output: Path) -> Dict:
+    """Render every static page into ``output`` and write the manifest the server loads."""
+    static_folder = Path(app.static_folder).resolve()
+    output = output.resolve()
+    bundler = _Bundler(static_folder, output)
+    pages: Dict[str, Dict] = {}
+    skipped: List[str] = []
+    client = app.test_client()
+    # Render from the templates even when the app is already serving an older build
+    app.config["SITE_BUILDING"] = True
+    try:
+        responses = {path: client.get(path) for path in page_paths(app)}
+    finally:
+        app.config["SITE_BUILDING"] = False
+    for path, response in responses.items():
+        if response.status_code != 200 or response.mimetype != "text/html":
+            skipped.append(path)
+            continue
+        html = bundler.rewrite(response.get_data(as_text=True))
+        name = "index" if path == "/" else path.strip("/").replace("/", "__")
+        file = f"pages/{name}.html"
+        pages[path] = {"file": file, **_write(output / file, html.encode("utf-8"))}
+
+    manifest = {"built_at": time.time(), "pages": pages, "assets": bundler.bundles, "skipped": skipped}
+    (output / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+class PrebuiltSite:
+    """In-memory copy of a build, answering page and bundle requests."""
+
+    def __init__(self, folder: Path, manifest: Dict, page_max_age: int):
+        self.page_max_age = page_max_age
+        self.entries: Dict[str, Dict] = {}
+        for kind, max_age in (("pages", page_max_age), ("assets", IMMUTABLE_MAX_AGE)):
+            for url, entry in manifest.get(kind, {}).items():
+                path = folder / entry["file"]
+                bodies = {"identity": path.read_bytes()}
+                for encoding in entry["encodings"]:
+                    bodies[encoding] = Path(f"{path}.{'br' if encoding == 'br' else 'gz'}").read_bytes()
+                self.entries[url] = {
+                    "bodies": bodies,
+                    "etag": entry["etag"],
+                    "mimetype": MIME_TYPES[path.suffix],
+                    "max_age": max_age,
+                    "immutable": kind == "assets",
+                }
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": sum(len(body) for entry in self.entries.values() for body in entry["bodies"].values()),
+        }
+
+    def respond(self, path: str):
+        """Response for ``path`` negotiated against the current request, or ``None`` if it is not pre-built."""
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        accepted = request.accept_encodings
+        encoding = next(
+            (name for name in ("br", "gzip") if name in entry["bodies"] and accepted[name]),
+            "identity",
+        )
+        response = current_app.response_class(entry["bodies"][encoding], mimetype=entry["mimetype"])
+        if encoding != "identity":
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        # Each encoding is a different byte sequence, so each gets its own strong ETag
+        response.set_etag(entry["etag"] if encoding == "identity" else f"{entry['etag']}-{encoding}")
+        response.cache_control.public = True
+        response.cache_control.max_age = entry["max_age"]
+        if entry["immutable"]:
+            response.cache_control.immutable = True
+        return response.make_conditional(request)
+
+
+def load(folder: Path, page_max_age: int) -> Optional[PrebuiltSite]:
+    manifest_path = folder / MANIFEST_NAME
+    if not manifest_path.is_file():
+        return None
+    return PrebuiltSite(folder, json.loads(manifest_path.read_text(encoding="utf-8")), page_max_age)
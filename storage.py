@@ -0,0 +1,260 @@
+"""Content-addressed, sharded storage for generated files.
+
+Every output is stored under the SHA-256 of its bytes plus its extension,
+sharded two levels deep (``3f/a2/3fa2...e9.png``) so no directory grows
+large. A key can never point at different bytes, so concurrent requests
+cannot overwrite each other's outputs. Identical outputs share one object.
+Friendly names are not part of the key; they are used only as the download
+filename.
+
+Writers produce a complete file at a ``staging`` path and then ``commit`` it.
+``LocalStorage`` moves the file into place with ``os.replace``, so readers
+see either nothing or the whole file. ``S3Storage`` publishes with a single
+PUT or a multipart upload, both of which S3 makes visible atomically. It
+talks to any S3-compatible endpoint (AWS, MinIO, or a local stand-in such
+as ``moto_server``) through ``S3_ENDPOINT_URL``.
+
+``sweep`` deletes objects older than a cutoff unless a job still references
+them. Committing identical bytes again refreshes an object's age.
+"""
+
+import errno
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+
+from flask import abort, redirect
+
+import delivery
+
+# Optional boto3 for S3-compatible object storage
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+
+    S3_SUPPORTED = True
+except Exception:  # pragma: no cover - optional dependency
+    boto3 = None
+    ClientError = None
+    S3_SUPPORTED = False
+
+HASH_BLOCK = 1024 * 1024
+_KEY = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+
+class StorageError(Exception):
+    """Misconfigured backend or an object that cannot be stored."""
+
+
+def valid_key(key: str) -> bool:
+    return bool(_KEY.match(key))
+
+
+def shard(key: str) -> str:
+    return f"{key[:2]}/{key[2:4]}/{key}"
+
+
+def file_digest(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class Storage(ABC):
+    """Backend interface; keys are only ever produced by ``commit``."""
+
+    def __init__(self, staging_dir: Path):
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def staging(self, ext: str) -> Path:
+        """A fresh path to write an output to before committing it."""
+        return self.staging_dir / f"{uuid.uuid4().hex}.{ext}"
+
+    def commit(self, path: Path, ext: str) -> str:
+        """Publish the finished file at ``path`` under its content key; ``path`` is consumed."""
+        key = f"{file_digest(path)}.{ext.lower()}"
+        if not valid_key(key):
+            raise StorageError(f"Unsupported extension: {ext}")
+        self._publish(Path(path), key)
+        return key
+
+    @abstractmethod
+    def _publish(self, path: Path, key: str) -> None:
+        """Make the file at ``path`` readable under ``key`` in one step and consume ``path``."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """A binary stream of the object; ``FileNotFoundError`` if it is missing."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether ``key`` is stored."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key``; a missing object is not an error."""
+
+    @abstractmethod
+    def objects(self) -> Iterator[Tuple[str, float]]:
+        """Every stored ``(key, last modified timestamp)``."""
+
+    @abstractmethod
+    def response(self, key: str, download_name: str, as_attachment: bool):
+        """A Flask response that delivers the object under ``download_name``."""
+
+    def copy_into(self, key: str, archive, arcname: str) -> None:
+        """Stream an object into an open ``zipfile.ZipFile``."""
+        with self.open(key) as source, archive.open(arcname, "w", force_zip64=True) as target:
+            shutil.copyfileobj(source, target, HASH_BLOCK)
+
+    def sweep(self, older_than: float, keep: Iterable[str] = ()) -> int:
+        """Delete objects last written before ``older_than`` that are not in ``keep``.
+
+        Staging files that old belong to requests that failed before committing.
+        """
+        keep = set(keep)
+        removed = 0
+        for key, modified in list(self.objects()):
+            if modified < older_than and key not in keep:
+                self.delete(key)
+                removed += 1
+        for path in self.staging_dir.iterdir():
+            if path.stat().st_mtime < older_than:
+                path.unlink(missing_ok=True)
+        return removed
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        super().__init__(self.root / ".staging")
+
+    def path(self, key: str) -> Path:
+        return self.root / shard(key)
+
+    def _publish(self, path: Path, key: str) -> None:
+        target = self.path(key)
+        if target.exists():
+            # Same bytes already stored; only its age is refreshed
+            path.unlink()
+            os.utime(target)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "rb") as handle:
+            os.fsync(handle.fileno())
+        try:
+            os.replace(path, target)
+        except OSError as err:
+            if err.errno != errno.EXDEV:
+                raise
+            # Staged on another filesystem: copy next to the target first, so the final step is still a rename
+            partial = target.with_name(f".{uuid.uuid4().hex}.partial")
+            shutil.copyfile(path, partial)
+            os.replace(partial, target)
+            path.unlink()
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def objects(self) -> Iterator[Tuple[str, float]]:
+        for path in self.root.glob("??/??/*"):
+            if valid_key(path.name):
+                yield path.name, path.stat().st_mtime
+
+    def response(self, key: str, download_name: str, as_attachment: bool):
+        return delivery.serve(self.root, shard(key), as_attachment=as_attachment, download_name=download_name)
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, region: Optional[str] = None, url_ttl: int = 3600):
+        if not S3_SUPPORTED:
+            raise StorageError("S3 storage requires boto3. Install boto3 or set STORAGE_BACKEND=local.")
+        super().__init__(Path(tempfile.gettempdir()) / "imageforge-staging")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.url_ttl = url_ttl
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{shard(key)}" if self.prefix else shard(key)
+
+    def _publish(self, path: Path, key: str) -> None:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        try:
+            # Uploading identical bytes again is harmless and refreshes LastModified for sweep
+            self.client.upload_file(str(path), self.bucket, self.object_key(key), ExtraArgs={"ContentType": content_type})
+        finally:
+            path.unlink(missing_ok=True)
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))["Body"]
+        except ClientError as err:
+            raise FileNotFoundError(key) from err
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError:
+            return False
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def objects(self) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/" if self.prefix else ""):
+            for item in page.get("Contents", []):
+                key = item["Key"].rsplit("/", 1)[-1]
+                if valid_key(key):
+                    yield key, item["LastModified"].timestamp()
+
+    def response(self, key: str, download_name: str, as_attachment: bool):
+        if not self.exists(key):
+            abort(404)
+        disposition = "attachment" if as_attachment else "inline"
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.object_key(key),
+                "ResponseContentDisposition": f'{disposition}; filename="{download_name}"',
+            },
+            ExpiresIn=self.url_ttl,
+        )
+        return redirect(url, code=302)
+
+
+def from_env(default_root: Path) -> Storage:
+    backend = os.environ.get("STORAGE_BACKEND", "local").strip().lower()
+    if backend == "local":
+        return LocalStorage(Path(os.environ.get("STORAGE_ROOT") or default_root))
+    if backend == "s3":
+        bucket = os.environ.get("S3_BUCKET")
+        if not bucket:
+            raise StorageError("STORAGE_BACKEND=s3 needs S3_BUCKET.")
+        return S3Storage(
+            bucket,
+            prefix=os.environ.get("S3_PREFIX", ""),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+            region=os.environ.get("S3_REGION"),
+            url_ttl=int(os.environ.get("S3_URL_TTL", "3600")),
+        )
+    raise StorageError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,561 @@
+"""Strip-based, bounded-memory processing for very large images.
+
+Sources are read in horizontal bands, and each band is processed and appended
+to an encoder that writes incrementally, so peak memory follows the band
+height, not the image size.
+
+Band readers:
+
+* raw layouts (uncompressed TIFF strips or tiles, BMP, PPM/PGM) are read by
+  seeking straight to the rows of each band;
+* non-interlaced 8-bit PNG is inflated incrementally. Each band's filtered
+  rows are re-wrapped, after the previous band's last row, into a stored
+  (uncompressed) zlib stream so Pillow's own decoder undoes the filters;
+* anything else (JPEG, compressed TIFF, WebP, ...) falls back to a full
+  decode under Pillow's normal decompression-bomb limit. JPEG uses draft mode
+  when the output is smaller, which cuts decode memory by up to 64x.
+
+Writers: PNG (one zlib stream across all bands) and TIFF (one deflate strip
+per band).
+"""
+
+import math
+import os
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+from PIL import BmpImagePlugin, Image, ImageChops, PngImagePlugin, PpmImagePlugin, TiffImagePlugin
+
+import color_management
+from color_management import ImageCms
+
+BAND_BYTES = int(os.environ.get("STRIP_BAND_MB", "8")) * 1024 * 1024
+# Images above this many pixels go through the strip engine when the operation allows it
+STRIP_THRESHOLD_PIXELS = int(os.environ.get("STRIP_THRESHOLD_MP", "40")) * 1_000_000
+# Hard ceiling for banded sources (Pillow's own bomb check still guards full decodes)
+STRIP_MAX_PIXELS = int(os.environ.get("STRIP_MAX_MP", "1000")) * 1_000_000
+STREAMABLE_OUTPUTS = {"png", "tiff"}
+
+_PNG_RAWMODES = {"L", "LA", "RGB", "RGBA", "P"}
+_FILTER_SUPPORT = {
+    Image.NEAREST: 0.5,
+    Image.BOX: 0.5,
+    Image.BILINEAR: 1.0,
+    Image.HAMMING: 1.0,
+    Image.BICUBIC: 2.0,
+    Image.LANCZOS: 3.0,
+}
+
+Source = Union[str, Path, BinaryIO]
+
+
+def open_unchecked(fp: BinaryIO) -> Image.Image:
+    """Parse a PNG, TIFF, BMP or PPM header without Image.open's decompression-bomb check.
+
+    For header inspection and banded reads only: callers must not decode the
+    returned image in one piece.
+    """
+    fp.seek(0)
+    prefix = fp.read(16)
+    fp.seek(0)
+    for plugin in (PngImagePlugin.PngImageFile, TiffImagePlugin.TiffImageFile, BmpImagePlugin.BmpImageFile, PpmImagePlugin.PpmImageFile):
+        if plugin.format == "PNG" and not PngImagePlugin._accept(prefix):
+            continue
+        if plugin.format == "TIFF" and not TiffImagePlugin._accept(prefix):
+            continue
+        if plugin.format == "BMP" and not BmpImagePlugin._accept(prefix):
+            continue
+        if plugin.format == "PPM" and not PpmImagePlugin._accept(prefix):
+            continue
+        fp.seek(0)
+        return plugin(fp)
+    raise ValueError("Not a band-readable format")
+
+
+def _rows_per_band(width: int, bytes_per_pixel: int = 4) -> int:
+    return max(1, BAND_BYTES // max(1, width * bytes_per_pixel))
+
+
+class BandReader(ABC):
+    """Sequential band access: ``read(y0, y1)`` with non-decreasing ``y0``."""
+
+    banded = True
+
+    def __init__(self, image: Image.Image, fp: BinaryIO):
+        self.image = image
+        self.fp = fp
+        self.mode = image.mode
+        self.size = image.size
+        self.info = dict(image.info)
+        self.owns_file = False
+        self.palette: Optional[List[int]] = None
+        # Bands are converted to sRGB as they are read; only same-mode transforms keep band layouts intact
+        self.transform = None
+        if image.mode in {"RGB", "RGBA"}:
+            self.transform = color_management.transform_for(self.info.get("icc_profile"), image.mode)
+        if image.mode == "P" and image.palette is not None:
+            # Read the header palette directly; getpalette() would decode the whole image
+            rawmode, data = image.palette.getdata()
+            entry_bytes = len(Image.new(image.palette.mode, (1, 1)).tobytes("raw", rawmode))
+            entries = Image.frombytes(image.palette.mode, (len(data) // entry_bytes, 1), data, "raw", rawmode)
+            self.palette = list(entries.convert("RGB").tobytes())
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    def _finish(self, band: Image.Image) -> Image.Image:
+        if self.transform is not None:
+            ImageCms.applyTransform(band, self.transform, inPlace=True)
+        if self.palette is not None:
+            band.putpalette(self.palette)
+            if "transparency" in self.info:
+                band.info["transparency"] = self.info["transparency"]
+        return band
+
+    @abstractmethod
+    def read(self, y0: int, y1: int) -> Image.Image:
+        """Rows ``y0`` to ``y1`` (exclusive) as an image in the output colour space."""
+
+    def close(self) -> None:
+        self.image.close()
+        if self.owns_file:
+            self.fp.close()
+
+
+class RawBandReader(BandReader):
+    """Uncompressed layouts: every row is at a known file offset."""
+
+    def __init__(self, image: Image.Image, fp: BinaryIO):
+        super().__init__(image, fp)
+        self.tiles = []
+        for _, extents, offset, args in image.tile:
+            rawmode, stride, orientation = (tuple(args) + (0, 1))[:3] if isinstance(args, tuple) else (args, 0, 1)
+            x0, y0, x1, y1 = extents
+            if not stride:
+                stride = len(Image.new(self.mode, (x1 - x0, 1)).tobytes("raw", rawmode))
+            self.tiles.append((x0, y0, x1, y1, offset, rawmode, stride, orientation))
+
+    def read(self, y0: int, y1: int) -> Image.Image:
+        band = Image.new(self.mode, (self.width, y1 - y0))
+        for x0, ty0, x1, ty1, offset, rawmode, stride, orientation in self.tiles:
+            top, bottom = max(y0, ty0), min(y1, ty1)
+            if top >= bottom:
+                continue
+            rows = bottom - top
+            if orientation < 0:
+                # Bottom-up storage (BMP): row r of the tile lives at (h - 1 - r)
+                first_stored = (ty1 - ty0) - (bottom - ty0)
+            else:
+                first_stored = top - ty0
+            self.fp.seek(offset + first_stored * stride)
+            data = self.fp.read(rows * stride)
+            piece = Image.frombytes(self.mode, (x1 - x0, rows), data, "raw", rawmode, stride, orientation)
+            band.paste(piece, (x0, top - y0))
+        return self._finish(band)
+
+
+class PngBandReader(BandReader):
+    """Non-interlaced 8-bit PNG decoded forward one band at a time."""
+
+    def __init__(self, image: Image.Image, fp: BinaryIO):
+        super().__init__(image, fp)
+        _, _, offset, rawmode = image.tile[0]
+        self.rawmode = rawmode
+        self.stride = len(Image.new(self.mode, (self.width, 1)).tobytes("raw", rawmode))
+        self._chunks = self._idat_chunks(offset)
+        self._inflater = zlib.decompressobj()
+        self._pending = b""
+        self._previous_row = bytes(self.stride)
+        self._next_row = 0
+        self._window: Optional[Image.Image] = None
+        self._window_top = 0
+
+    def _idat_chunks(self, offset: int) -> Iterator[bytes]:
+        position = offset - 8
+        while True:
+            self.fp.seek(position)
+            header = self.fp.read(8)
+            if len(header) < 8:
+                return
+            length, chunk_type = struct.unpack(">I4s", header)
+            position += 12 + length
+            if chunk_type == b"IDAT":
+                yield self.fp.read(length)
+            elif chunk_type == b"IEND":
+                return
+
+    def _decode_rows(self, count: int) -> Image.Image:
+        needed = count * (self.stride + 1)
+        parts = [self._pending]
+        available = len(self._pending)
+        while available < needed:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                raise ValueError("Truncated PNG data")
+            data = self._inflater.decompress(chunk)
+            parts.append(data)
+            available += len(data)
+        joined = b"".join(parts)
+        filtered, self._pending = joined[:needed], joined[needed:]
+        # Prefix the previous band's last row (filter type 0) so Up/Average/Paeth
+        # rows at the top of this band see the right neighbour
+        wrapped = zlib.compress(b"\x00" + self._previous_row + filtered, 0)
+        decoded = Image.frombytes(self.mode, (self.width, count + 1), wrapped, "zip", self.rawmode)
+        rows = decoded.crop((0, 1, self.width, count + 1))
+        self._previous_row = rows.crop((0, count - 1, self.width, count)).tobytes("raw", self.rawmode)
+        self._next_row += count
+        return rows
+
+    def read(self, y0: int, y1: int) -> Image.Image:
+        if self._window is not None and y0 < self._window_top:
+            raise ValueError("PNG bands must be read top to bottom")
+        if self._window is not None and y0 < self._window_top + self._window.height:
+            keep = self._window.crop((0, y0 - self._window_top, self.width, self._window.height))
+        else:
+            keep = None
+            step = _rows_per_band(self.width)
+            while self._next_row < y0:
+                self._decode_rows(min(step, y0 - self._next_row))
+        missing = y1 - max(y0, self._next_row)
+        fresh = self._decode_rows(missing) if missing > 0 else None
+
+        if keep is not None and fresh is not None:
+            band = Image.new(self.mode, (self.width, keep.height + fresh.height))
+            band.paste(keep, (0, 0))
+            band.paste(fresh, (0, keep.height))
+        else:
+            band = keep if keep is not None else fresh
+        self._window, self._window_top = band, y0
+        return self._finish(band.crop((0, 0, self.width, y1 - y0)))
+
+
+class FullBandReader(BandReader):
+    """Fallback for compressed formats: decode once, serve bands by cropping."""
+
+    banded = False
+
+    def __init__(self, image: Image.Image, fp: BinaryIO, draft_size: Optional[Tuple[int, int]] = None):
+        if draft_size and image.format == "JPEG":
+            image.draft(image.mode, draft_size)
+        image.load()
+        super().__init__(image, fp)
+
+    def read(self, y0: int, y1: int) -> Image.Image:
+        return self._finish(self.image.crop((0, y0, self.width, y1)))
+
+
+def as_file(source: Source) -> Tuple[BinaryIO, bool]:
+    """A readable binary file for ``source``, and whether the caller opened it and must close it."""
+    if isinstance(source, (str, Path)):
+        return open(source, "rb"), True
+    return source, False
+
+
+def _select_reader(fp: BinaryIO, draft_size: Optional[Tuple[int, int]]) -> BandReader:
+    try:
+        image = open_unchecked(fp)
+    except Exception:
+        fp.seek(0)
+        return FullBandReader(Image.open(fp), fp, draft_size)
+
+    if image.width * image.height > STRIP_MAX_PIXELS:
+        raise ValueError(f"Image exceeds the {STRIP_MAX_PIXELS // 1_000_000} MP limit")
+
+    decoders = {tile[0] for tile in image.tile}
+    if decoders == {"raw"}:
+        return RawBandReader(image, fp)
+    if (
+        image.format == "PNG"
+        and decoders == {"zip"}
+        and len(image.tile) == 1
+        and not image.info.get("interlace")
+        and image.tile[0][3] in _PNG_RAWMODES
+    ):
+        return PngBandReader(image, fp)
+
+    Image._decompression_bomb_check(image.size)
+    return FullBandReader(image, fp, draft_size)
+
+
+def open_bands(source: Source, draft_size: Optional[Tuple[int, int]] = None) -> BandReader:
+    """Pick the cheapest band reader for ``source``."""
+    fp, owned = as_file(source)
+    try:
+        reader = _select_reader(fp, draft_size)
+    except Exception:
+        if owned:
+            fp.close()
+        raise
+    reader.owns_file = owned
+    return reader
+
+
+def probe_size(source: Source) -> Tuple[int, int]:
+    """Image dimensions from the header, without a decompression-bomb error for huge inputs."""
+    fp, owned = as_file(source)
+    try:
+        try:
+            image = open_unchecked(fp)
+        except Exception:
+            fp.seek(0)
+            image = Image.open(fp)
+        return image.size
+    finally:
+        if owned:
+            fp.close()
+        else:
+            fp.seek(0)
+
+
+class StreamWriter(ABC):
+    """Incremental encoder; used as a context manager it removes a partial file on error."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @abstractmethod
+    def write(self, band: Image.Image) -> None:
+        """Append ``band``'s rows to the output."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Finish the stream and close the file."""
+
+    def abort(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class PngStreamWriter(StreamWriter):
+    """Writes PNG rows incrementally; the Sub filter keeps each band self-contained."""
+
+    _COLOR_TYPES = {"L": 0, "RGB": 2, "P": 3, "LA": 4, "RGBA": 6}
+
+    def __init__(self, path: Path, size: Tuple[int, int], mode: str, palette: Optional[List[int]] = None):
+        if mode not in self._COLOR_TYPES:
+            raise ValueError(f"Streaming PNG does not support mode {mode}")
+        self.mode = mode
+        self.width, self.height = size
+        self.rows_written = 0
+        super().__init__(path)
+        self._compressor = zlib.compressobj(6)
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, self._COLOR_TYPES[mode], 0, 0, 0))
+        if mode == "P":
+            self._chunk(b"PLTE", bytes((palette or list(range(256)) * 3)[:768]))
+
+    def _chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+    def write(self, band: Image.Image) -> None:
+        if band.mode != self.mode:
+            band = band.convert(self.mode)
+        if self.mode == "P":
+            filtered, filter_type = band, b"\x00"
+        else:
+            # Sub filter: each byte minus the same channel of the pixel to its left
+            shifted = ImageChops.offset(band, 1, 0)
+            shifted.paste(0, (0, 0, 1, band.height))
+            filtered, filter_type = ImageChops.subtract_modulo(band, shifted), b"\x01"
+        data = filtered.tobytes("raw", self.mode)
+        stride = len(data) // band.height
+        rows = b"".join(filter_type + data[row * stride:(row + 1) * stride] for row in range(band.height))
+        compressed = self._compressor.compress(rows)
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+        self.rows_written += band.height
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+        if self.rows_written != self.height:
+            raise ValueError(f"Wrote {self.rows_written} of {self.height} rows")
+
+
+class TiffStreamWriter(StreamWriter):
+    """Writes one Adobe-deflate strip per band and the IFD at the end."""
+
+    _LAYOUT = {"L": (1, 1, None), "LA": (2, 1, 2), "RGB": (3, 2, None), "RGBA": (4, 2, 2)}
+
+    def __init__(self, path: Path, size: Tuple[int, int], mode: str, rows_per_strip: int):
+        if mode not in self._LAYOUT:
+            mode = "RGBA" if "A" in mode or mode == "P" else "RGB"
+        self.mode = mode
+        self.width, self.height = size
+        self.rows_per_strip = rows_per_strip
+        self.offsets: List[int] = []
+        self.counts: List[int] = []
+        super().__init__(path)
+        self._file.write(b"II*\x00\x00\x00\x00\x00")
+
+    def write(self, band: Image.Image) -> None:
+        if band.mode != self.mode:
+            band = band.convert(self.mode)
+        # Split so every strip except the last has exactly rows_per_strip rows
+        for top in range(0, band.height, self.rows_per_strip):
+            strip = band.crop((0, top, self.width, min(band.height, top + self.rows_per_strip)))
+            data = zlib.compress(strip.tobytes("raw", self.mode), 6)
+            self.offsets.append(self._file.tell())
+            self.counts.append(len(data))
+            self._file.write(data)
+            if self._file.tell() % 2:
+                self._file.write(b"\x00")
+
+    def _array(self, values: List[int], fmt: str) -> Tuple[int, int, bytes]:
+        packed = struct.pack(f"<{len(values)}{fmt}", *values)
+        return len(values), len(packed), packed
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        samples, photometric, extra = self._LAYOUT[self.mode]
+        entries = [
+            (256, 4, [self.width]),
+            (257, 4, [self.height]),
+            (258, 3, [8] * samples),
+            (259, 3, [8]),  # Adobe deflate
+            (262, 3, [photometric]),
+            (273, 4, self.offsets),
+            (277, 3, [samples]),
+            (278, 4, [self.rows_per_strip]),
+            (279, 4, self.counts),
+            (284, 3, [1]),
+        ]
+        if extra is not None:
+            entries.append((338, 3, [extra]))
+
+        ifd_offset = self._file.tell()
+        data_offset = ifd_offset + 2 + len(entries) * 12 + 4
+        out_of_line = b""
+        table = struct.pack("<H", len(entries))
+        for tag, field_type, values in entries:
+            count, size, packed = self._array(values, "H" if field_type == 3 else "I")
+            if size <= 4:
+                table += struct.pack("<HHI", tag, field_type, count) + packed.ljust(4, b"\x00")
+            else:
+                table += struct.pack("<HHII", tag, field_type, count, data_offset + len(out_of_line))
+                out_of_line += packed
+        table += b"\x00\x00\x00\x00"
+        self._file.write(table + out_of_line)
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", ifd_offset))
+        self._file.close()
+
+
+def open_writer(path: Path, fmt: str, size: Tuple[int, int], mode: str, rows_per_band: int, palette=None) -> StreamWriter:
+    if fmt == "png":
+        if mode not in PngStreamWriter._COLOR_TYPES:
+            mode = "RGBA" if "A" in mode else "RGB"
+        return PngStreamWriter(path, size, mode, palette)
+    if fmt == "tiff":
+        return TiffStreamWriter(path, size, mode, rows_per_band)
+    raise ValueError(f"Streaming output is not available for {fmt}")
+
+
+def _output_mode(reader: BandReader, fmt: str) -> str:
+    if reader.mode == "P" and (fmt == "tiff" or "transparency" in reader.info):
+        return "RGBA"
+    return reader.mode
+
+
+def stream_convert(source: Source, output_path: Path, fmt: str) -> Tuple[int, int]:
+    reader = open_bands(source)
+    try:
+        rows = _rows_per_band(reader.width)
+        mode = _output_mode(reader, fmt)
+        with open_writer(output_path, fmt, reader.size, mode, rows, reader.palette if mode == "P" else None) as writer:
+            for top in range(0, reader.height, rows):
+                writer.write(reader.read(top, min(reader.height, top + rows)))
+        return reader.size
+    finally:
+        reader.close()
+
+
+def stream_crop(source: Source, output_path: Path, box: Tuple[int, int, int, int], fmt: str) -> Tuple[int, int]:
+    """Crop ``box`` (left, top, right, bottom); only bands inside the box are decoded."""
+    reader = open_bands(source)
+    try:
+        left, top, right, bottom = box
+        if left < 0 or top < 0 or right > reader.width or bottom > reader.height or left >= right or top >= bottom:
+            raise ValueError(f"Crop area out of bounds. Image size: {reader.width}x{reader.height}")
+        size = (right - left, bottom - top)
+        rows = _rows_per_band(reader.width)
+        mode = _output_mode(reader, fmt)
+        with open_writer(output_path, fmt, size, mode, rows, reader.palette if mode == "P" else None) as writer:
+            for band_top in range(top, bottom, rows):
+                band = reader.read(band_top, min(bottom, band_top + rows))
+                writer.write(band.crop((left, 0, right, band.height)))
+        return size
+    finally:
+        reader.close()
+
+
+def stream_resize(
+    source: Source,
+    output_path: Path,
+    size: Tuple[int, int],
+    fmt: str,
+    resample: int = Image.LANCZOS,
+) -> Tuple[int, int]:
+    """Resample band by band.
+
+    Each output band reads the source rows it maps to, plus the filter's
+    support on both sides, and resizes with ``box`` so the taps match a
+    whole-image resize.
+    """
+    width, height = size
+    reader = open_bands(source, draft_size=size)
+    try:
+        scale_y = reader.height / height
+        margin = math.ceil(_FILTER_SUPPORT.get(resample, 3.0) * max(scale_y, 1.0)) + 1
+        out_rows = max(1, _rows_per_band(max(width, reader.width)) // max(1, math.ceil(scale_y)))
+        mode = reader.mode
+        if mode not in {"L", "LA", "RGB", "RGBA"}:
+            # Palette and high bit-depth images cannot be resampled as-is
+            mode = "RGBA" if "A" in mode or mode == "P" else "RGB"
+        with open_writer(output_path, fmt, size, mode, out_rows) as writer:
+            for out_top in range(0, height, out_rows):
+                out_bottom = min(height, out_top + out_rows)
+                src_top, src_bottom = out_top * scale_y, out_bottom * scale_y
+                read_top = max(0, math.floor(src_top) - margin)
+                read_bottom = min(reader.height, math.ceil(src_bottom) + margin)
+                band = reader.read(read_top, read_bottom)
+                if band.mode != mode:
+                    band = band.convert(mode)
+                resized = band.resize(
+                    (width, out_bottom - out_top),
+                    resample,
+                    box=(0, src_top - read_top, reader.width, src_bottom - read_top),
+                )
+                writer.write(resized)
+        return size
+    finally:
+        reader.close()
+
+
+def should_stream(size: Tuple[int, int], output_format: str) -> bool:
+    return size[0] * size[1] > STRIP_THRESHOLD_PIXELS and output_format in STREAMABLE_OUTPUTS
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Importing app creates its job database and output storage; keep both out of the checkout
+_SCRATCH = tempfile.mkdtemp(prefix="imageforge-tests-")
+os.environ.setdefault("IMAGEFORGE_JOB_DB", os.path.join(_SCRATCH, "jobs.sqlite3"))
+os.environ.setdefault("STORAGE_ROOT", os.path.join(_SCRATCH, "storage"))
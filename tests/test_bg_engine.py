@@ -0,0 +1,32 @@
+import random
+
+from PIL import Image
+
+import bg_engine
+
+
+def _reference(image: Image.Image) -> Image.Image:
+    # The per-pixel loop /api/remove-background ran before the engine existed
+    rgba = image.convert("RGBA")
+    rgba.putdata([(255, 255, 255, 0) if r > 200 and g > 200 and b > 200 else (r, g, b, a) for r, g, b, a in rgba.getdata()])
+    return rgba
+
+
+def test_heuristic_matches_the_per_pixel_reference():
+    rng = random.Random(7)
+    image = Image.new("RGBA", (40, 30))
+    # Values cluster around the threshold so both sides of 200 are exercised in every channel
+    image.putdata([tuple(rng.choice((0, 199, 200, 201, 255, rng.randrange(256))) for _ in range(4)) for _ in range(40 * 30)])
+
+    assert bg_engine.remove_white(image).tobytes() == _reference(image).tobytes()
+    rgb = image.convert("RGB")
+    assert bg_engine.remove_white(rgb).tobytes() == _reference(rgb).tobytes()
+
+
+def test_without_a_model_remove_uses_the_heuristic(tmp_path, monkeypatch):
+    monkeypatch.setattr(bg_engine, "BG_MODEL_PATH", tmp_path / "missing.onnx")
+    image = Image.new("RGB", (4, 4), "white")
+
+    result, engine = bg_engine.remove(image)
+    assert engine == "heuristic"
+    assert result.getchannel("A").getextrema() == (0, 0)
@@ -0,0 +1,76 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import chunked_upload
+
+DATA = bytes(range(256)) * 40
+
+
+def _upload(folder, data=DATA, chunk=1000, sha256=None):
+    state = chunked_upload.create_session(folder, "photo.png", len(data), sha256)
+    for offset in range(0, len(data), chunk):
+        state = chunked_upload.append_chunk(folder, state["id"], offset, io.BytesIO(data[offset : offset + chunk]))
+    return state
+
+
+def test_chunks_assemble_into_a_single_use_upload(tmp_path):
+    state = _upload(tmp_path, sha256=hashlib.sha256(DATA).hexdigest())
+    assert chunked_upload.public_state(state)["complete"]
+
+    upload = chunked_upload.take_completed(tmp_path, state["id"])
+    assert upload.filename == "photo.png"
+    assert upload.read() == DATA
+    upload.discard()
+
+    with pytest.raises(chunked_upload.UploadError) as err:
+        chunked_upload.take_completed(tmp_path, state["id"])
+    assert err.value.status == 404
+
+
+def test_out_of_order_chunk_reports_the_acknowledged_offset(tmp_path):
+    state = chunked_upload.create_session(tmp_path, "photo.png", len(DATA))
+    chunked_upload.append_chunk(tmp_path, state["id"], 0, io.BytesIO(DATA[:1000]))
+
+    with pytest.raises(chunked_upload.UploadError) as err:
+        chunked_upload.append_chunk(tmp_path, state["id"], 2000, io.BytesIO(DATA[2000:3000]))
+    assert (err.value.status, err.value.offset) == (409, 1000)
+
+
+def test_bad_chunk_checksum_is_dropped_so_the_chunk_can_be_retried(tmp_path):
+    state = chunked_upload.create_session(tmp_path, "photo.png", len(DATA))
+    with pytest.raises(chunked_upload.UploadError) as err:
+        chunked_upload.append_chunk(tmp_path, state["id"], 0, io.BytesIO(DATA[:1000]), chunk_sha256="0" * 64)
+    assert (err.value.status, err.value.offset) == (422, 0)
+    assert chunked_upload.part_path(tmp_path, state["id"]).stat().st_size == 0
+
+    state = chunked_upload.append_chunk(tmp_path, state["id"], 0, io.BytesIO(DATA[:1000]), hashlib.sha256(DATA[:1000]).hexdigest())
+    assert state["offset"] == 1000
+
+
+def test_whole_file_checksum_mismatch_restarts_the_upload(tmp_path):
+    with pytest.raises(chunked_upload.UploadError) as err:
+        _upload(tmp_path, sha256="0" * 64)
+    assert (err.value.status, err.value.offset) == (422, 0)
+
+
+def test_upload_claimed_by_another_process_is_a_conflict(tmp_path):
+    state = _upload(tmp_path)
+    # Another worker renamed the part file after this one loaded the session
+    os.replace(chunked_upload.part_path(tmp_path, state["id"]), tmp_path / "elsewhere")
+
+    with pytest.raises(chunked_upload.UploadError) as err:
+        chunked_upload.take_completed(tmp_path, state["id"])
+    assert err.value.status == 409
+
+
+def test_purge_stale_forgets_in_memory_session_state(tmp_path):
+    state = chunked_upload.create_session(tmp_path, "photo.png", len(DATA))
+    chunked_upload.append_chunk(tmp_path, state["id"], 0, io.BytesIO(DATA[:1000]))
+    assert state["id"] in chunked_upload._HASHERS and state["id"] in chunked_upload._SESSION_LOCKS
+
+    assert chunked_upload.purge_stale(tmp_path, ttl=-1) == 2
+    assert state["id"] not in chunked_upload._HASHERS
+    assert state["id"] not in chunked_upload._SESSION_LOCKS
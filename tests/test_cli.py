@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from PIL import Image
+
+import cli
+
+
+def _image(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (8, 8), "red").save(path)
+
+
+def test_output_path_keeps_subdirectories_for_relative_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    target = cli.output_path_for(Path("src/sub/b.png"), Path("src").resolve(), tmp_path / "out", "webp")
+    assert target == tmp_path / "out" / "sub" / "b.webp"
+
+
+def test_nested_same_named_files_do_not_overwrite_each_other(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "src" / "b.png")
+    _image(tmp_path / "src" / "sub" / "b.png")
+
+    assert cli.main(["convert", "src", "--out", "out", "--format", "webp", "--workers", "1"]) == 0
+    assert sorted(p.relative_to(tmp_path / "out").as_posix() for p in (tmp_path / "out").rglob("*.webp")) == [
+        "b.webp",
+        "sub/b.webp",
+    ]
+
+
+def test_sources_mapping_to_the_same_output_are_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "src" / "a.jpg")
+    _image(tmp_path / "src" / "a.png")
+
+    assert cli.main(["convert", "src", "--out", "out", "--format", "webp", "--workers", "1"]) == 1
+    assert "is already written from" in capsys.readouterr().err
+    assert [p.name for p in (tmp_path / "out").iterdir()] == ["a.webp"]
@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+import dedup
+
+
+def _upload(image: Image.Image, fmt: str = "PNG", name: str = "upload", **save_options) -> FileStorage:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **save_options)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename=f"{name}.{fmt.lower()}")
+
+
+def _picture(size=(64, 48)) -> Image.Image:
+    image = Image.new("RGB", size)
+    image.putdata([(x * 4, y * 5, (x + y) * 2) for y in range(size[1]) for x in range(size[0])])
+    return image
+
+
+def test_exact_mode_groups_identical_bytes_and_rewinds_streams():
+    first, renamed, other = _upload(_picture(), name="a"), _upload(_picture(), name="b"), _upload(_picture((48, 64)))
+
+    assert dedup.group_duplicates([first, renamed, other], "exact") == [0, 0, 2]
+    assert all(upload.stream.tell() == 0 for upload in (first, renamed, other))
+
+
+def test_exact_mode_keeps_copies_apart_when_their_keys_differ():
+    uploads = [_upload(_picture()) for _ in range(3)]
+    assert dedup.group_duplicates(uploads, "exact", keys=["resize", "crop", "resize"]) == [0, 1, 0]
+
+
+def test_perceptual_mode_groups_re_encoded_copies_of_the_same_size():
+    picture = _picture()
+    uploads = [_upload(picture), _upload(picture, "JPEG", quality=90), _upload(picture.resize((32, 24)))]
+
+    assert dedup.group_duplicates(uploads, "exact") == [0, 1, 2]
+    assert dedup.group_duplicates(uploads, "perceptual") == [0, 0, 2]
+
+
+def test_off_mode_and_summary():
+    uploads = [_upload(_picture()) for _ in range(4)]
+    assert dedup.group_duplicates(uploads, "off") == [0, 1, 2, 3]
+    assert dedup.summarize(dedup.group_duplicates(uploads, "exact"), "exact") == {
+        "mode": "exact",
+        "inputs": 4,
+        "unique": 1,
+        "duplicates": 3,
+        "ratio": 0.75,
+    }
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        dedup.parse_mode("fuzzy")
@@ -0,0 +1,63 @@
+import pytest
+from flask import Flask
+
+import delivery
+
+DATA = bytes(range(256)) * 4
+JOB_NAME = "0123456789abcdef0123456789abcdef_bundle.zip"
+
+
+@pytest.fixture
+def root(tmp_path):
+    return tmp_path / "out"
+
+
+@pytest.fixture
+def client(tmp_path, root):
+    root.mkdir()
+    (root / "report.pdf").write_bytes(DATA)
+    (root / JOB_NAME).write_bytes(DATA)
+    (tmp_path / "secret.txt").write_text("no", encoding="utf-8")
+
+    app = Flask(__name__)
+
+    @app.route("/files/<path:name>")
+    def files(name):
+        return delivery.serve(root, name)
+
+    return app.test_client()
+
+
+def test_strong_content_etag_and_304(client, root):
+    response = client.get("/files/report.pdf")
+    etag, weak = response.get_etag()
+    assert response.status_code == 200 and not weak
+    assert etag == delivery.content_etag(root / "report.pdf")
+
+    revalidated = client.get("/files/report.pdf", headers={"If-None-Match": f'"{etag}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+
+
+def test_single_range_is_partial_content(client):
+    response = client.get("/files/report.pdf", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(DATA)}"
+    assert response.get_data() == DATA[10:20]
+
+
+def test_multiple_ranges_get_the_whole_file(client):
+    response = client.get("/files/report.pdf", headers={"Range": "bytes=0-9,20-29"})
+    assert response.status_code == 200
+    assert response.get_data() == DATA
+    assert "Content-Range" not in response.headers
+
+
+def test_names_with_a_job_id_are_immutable(client):
+    assert client.get(f"/files/{JOB_NAME}").cache_control.immutable
+    assert not client.get("/files/report.pdf").cache_control.immutable
+
+
+def test_paths_outside_the_root_are_not_found(client):
+    assert client.get("/files/../secret.txt").status_code == 404
+    assert client.get("/files/missing.pdf").status_code == 404
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import event_log
+
+
+def _exited_pid() -> int:
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+def _write(path, ratings):
+    path.write_text("".join(json.dumps({"rating": rating, "page": "home"}) + "\n" for rating in ratings), encoding="utf-8")
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_segments_of_exited_processes_are_rotated_on_startup(tmp_path):
+    dead = _exited_pid()
+    _write(tmp_path / f"ratings.{dead}.jsonl", [5, 4])
+    _write(tmp_path / f"ratings-20260101000000-{dead}-abcdef.jsonl", [3])
+    # Segments of running processes, and of other logs, are not touched
+    _write(tmp_path / f"ratings.{os.getppid()}.jsonl", [1])
+    _write(tmp_path / f"feedback.{dead}.jsonl", [2])
+
+    log = event_log.EventLog(tmp_path, "ratings")
+    _wait_for(lambda: len(list(tmp_path.glob("ratings-*.jsonl.gz"))) == 2)
+
+    assert sorted(path.name for path in tmp_path.glob("*.jsonl")) == sorted(
+        [f"ratings.{os.getppid()}.jsonl", f"feedback.{dead}.jsonl"]
+    )
+    assert log.recover_segments() == 0
+    summary = event_log.summarize_ratings(tmp_path)
+    assert summary["count"] == 5
+    assert summary["distribution"] == {"1": 1, "2": 1, "3": 1, "4": 1, "5": 1}
+
+
+def test_buffered_records_reach_the_active_segment_on_flush(tmp_path):
+    log = event_log.EventLog(tmp_path, "ratings", flush_bytes=1 << 20)
+    log.append({"rating": 4, "page": "home"})
+    assert not log.active_path.exists()
+
+    log.flush()
+    assert [record["rating"] for record in event_log.iter_records(log.active_path)] == [4]
+
+
+def test_segment_being_compressed_is_counted_once(tmp_path):
+    plain = tmp_path / "ratings-20260101000000-1-abcdef.jsonl"
+    _write(plain, [5, 3])
+    # compress_segment has published the .gz but not yet removed the plain copy
+    compressed = event_log.compress_segment(plain)
+    _write(plain, [5, 3])
+    assert compressed.exists() and plain.exists()
+
+    assert event_log.summarize_ratings(tmp_path)["count"] == 2
+    plain.unlink()
+    assert event_log.summarize_ratings(tmp_path)["count"] == 2
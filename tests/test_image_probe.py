@@ -0,0 +1,72 @@
+import io
+import json
+import struct
+import zlib
+
+import pytest
+
+import app as app_module
+import image_probe
+
+# Larger than the in-memory decode limit, smaller than the strip engine's
+HUGE = (20000, 15000)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png_header(size) -> bytes:
+    """A PNG that declares ``size`` but carries no pixel data: only a probe can read it."""
+    ihdr = struct.pack(">IIBBBBB", size[0], size[1], 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr) + _chunk(b"IEND", b"")
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_probe_reads_the_header_only():
+    info = image_probe.probe(io.BytesIO(_png_header(HUGE)))
+    assert (info["format"], info["width"], info["height"], info["frames"]) == ("png", *HUGE, 1)
+
+
+def test_unreadable_input_is_a_probe_error():
+    with pytest.raises(image_probe.ProbeError):
+        image_probe.probe(io.BytesIO(b"not an image"))
+
+
+def test_oversized_header_is_rejected_before_decoding_by_api_convert(client):
+    response = client.post(
+        "/api/convert",
+        data={"files[]": (io.BytesIO(_png_header(HUGE)), "huge.png"), "target_format": "jpg"},
+    )
+    # Multi-file conversions report each file's error in its own item
+    [item] = response.get_json()["items"]
+    assert item["status"] == "error"
+    assert "the limit is" in item["error"]
+
+
+def test_oversized_header_is_rejected_before_decoding_by_api_resize(client):
+    response = client.post(
+        "/api/resize",
+        data={"image": (io.BytesIO(_png_header(HUGE)), "huge.png"), "width": "100", "height": "75", "format": "jpg"},
+    )
+    assert response.status_code == 400
+    assert "the limit is" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("fmt", ["jpg", "webp", "pdf"])
+def test_batch_convert_to_an_unstreamable_format_is_rejected_before_decoding(client, fmt):
+    response = client.post(
+        "/api/batch-process",
+        data={
+            "files": (io.BytesIO(_png_header(HUGE)), "huge.png"),
+            "manifest": json.dumps([{"original_name": "huge.png", "original_extension": "png"}]),
+            "operation": "convert",
+            "options": json.dumps({"format": fmt}),
+        },
+    )
+    assert response.status_code == 400
+    assert "the limit is" in response.get_json()["error"]
@@ -0,0 +1,82 @@
+import json
+import time
+
+import pytest
+
+import job_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = job_store.JobStore(tmp_path / "jobs.sqlite3")
+    yield store
+    store.close()
+
+
+def _job(job_id: str, created_at, files=2, bundle_type="zip"):
+    return {
+        "id": job_id,
+        "created_at": created_at,
+        "files": [
+            {"display_name": f"{job_id}_{index}.webp", "size_bytes": 100 + index, "storage_key": f"{job_id}{index}"}
+            for index in range(files)
+        ],
+        "bundle": {"type": bundle_type, "filename": f"{job_id}_bundle.zip", "storage_key": f"{job_id}zip"},
+        "dedup": {"mode": "exact"},
+    }
+
+
+def test_job_round_trips_with_its_files_and_extra_keys(store):
+    store.save_job(_job("a" * 32, "2026-01-02T03:04:05Z"))
+    job = store.get_job("a" * 32)
+
+    assert job["created_at"] == "2026-01-02T03:04:05Z"
+    assert [item["display_name"] for item in job["files"]] == [f"{'a' * 32}_0.webp", f"{'a' * 32}_1.webp"]
+    assert job["bundle"]["type"] == "zip" and job["dedup"] == {"mode": "exact"}
+    assert store.get_job("missing") is None
+
+
+def test_saving_again_replaces_the_file_list(store):
+    store.save_job(_job("job", time.time(), files=3))
+    store.save_job(_job("job", time.time(), files=1))
+    assert len(store.get_job("job")["files"]) == 1
+    assert store.list_jobs()[0]["file_count"] == 1
+
+
+def test_migrate_imports_valid_legacy_files_in_batches(store, tmp_path):
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    for index in range(5):
+        (legacy / f"job{index}.json").write_text(json.dumps(_job(f"job{index}", 1_700_000_000 + index)), encoding="utf-8")
+    (legacy / "broken.json").write_text("{", encoding="utf-8")
+    (legacy / "other.json").write_text(json.dumps({"not": "a job"}), encoding="utf-8")
+
+    assert store.migrate_json(legacy, remove=True, batch_size=2) == 5
+    assert [job["id"] for job in store.list_jobs()] == [f"job{index}" for index in reversed(range(5))]
+    # Only imported files are removed
+    assert sorted(path.name for path in legacy.iterdir()) == ["broken.json", "other.json"]
+
+
+def test_expire_lists_old_jobs_with_their_files_and_delete_cascades(store):
+    now = time.time()
+    store.save_jobs([_job("old", now - 7200), _job("single", now - 7200, files=1, bundle_type="single"), _job("new", now)])
+
+    expired = store.expired(now - 3600)
+    assert {job["id"]: sorted(job["files"]) for job in expired} == {
+        "old": ["old_0.webp", "old_1.webp", "old_bundle.zip"],
+        "single": ["single_0.webp"],
+    }
+
+    assert store.delete_jobs(job["id"] for job in expired) == 2
+    assert [job["id"] for job in store.list_jobs()] == ["new"]
+    assert store.storage_keys() == {"new0", "new1", "newzip"}
+    connection = store._connection()
+    assert connection.execute("SELECT COUNT(*) FROM job_files WHERE job_id IN ('old', 'single')").fetchone()[0] == 0
+
+
+def test_list_jobs_paginates_newest_first(store):
+    store.save_jobs([_job(f"job{index}", 1_700_000_000 + index) for index in range(5)])
+    first = store.list_jobs(limit=2)
+    second = store.list_jobs(limit=2, before=1_700_000_003)
+    assert [job["id"] for job in first] == ["job4", "job3"]
+    assert [job["id"] for job in second] == ["job2", "job1"]
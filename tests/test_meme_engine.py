@@ -0,0 +1,42 @@
+import time
+
+import meme_engine
+
+FONT = "default"
+
+
+def test_wrap_keeps_explicit_newlines_and_fits_each_line():
+    lines = meme_engine.wrap("one does not simply\nwalk into mordor", FONT, 20, 120)
+    assert " ".join(lines) == "one does not simply walk into mordor"
+    assert any(line.startswith("walk") for line in lines)
+    assert all(meme_engine.line_width(FONT, 20, line) <= 120 for line in lines)
+
+
+def test_wrap_splits_a_long_word_into_pieces_that_fit():
+    lines = meme_engine.wrap("W" * 120, FONT, 30, 200)
+    assert "".join(lines) == "W" * 120
+    assert len(lines) > 1
+    assert all(meme_engine.line_width(FONT, 30, line) <= 200 for line in lines)
+    # Greedy: every piece but the last is as long as still fits
+    assert all(meme_engine.line_width(FONT, 30, line + "W") > 200 for line in lines[:-1])
+
+
+def test_long_unbroken_caption_is_cheap_and_leaves_the_measure_cache_alone():
+    meme_engine.line_width.cache_clear()
+    started = time.perf_counter()
+    size, lines = meme_engine.fit("W" * meme_engine.MAX_CAPTION_CHARS, FONT, (600, 200), 0.06)
+    assert time.perf_counter() - started < 2
+    assert "".join(lines) == "W" * meme_engine.MAX_CAPTION_CHARS
+    assert meme_engine.line_width.cache_info().currsize < 200
+
+
+def test_fit_picks_the_largest_size_that_fits_the_box():
+    box = (400, 120)
+    size, lines = meme_engine.fit("such caption very wow", FONT, box, 0.06)
+    width, height = meme_engine._block_size(lines, FONT, size, meme_engine.stroke_for(size, 0.06))
+    assert width <= box[0] and height <= box[1]
+    bigger = size + 1
+    stroke = meme_engine.stroke_for(bigger, 0.06)
+    wider = meme_engine.wrap("such caption very wow", FONT, bigger, box[0] - 2 * stroke)
+    width, height = meme_engine._block_size(wider, FONT, bigger, stroke)
+    assert width > box[0] or height > box[1]
@@ -0,0 +1,48 @@
+import threading
+import time
+
+import pytest
+
+import pipeline
+
+
+def test_results_come_back_in_job_order():
+    # Later jobs finish first; the output order must not change
+    jobs = [(index, 1, lambda index=index: time.sleep(0.01 * (5 - index)) or index * index) for index in range(6)]
+    assert list(pipeline.run_ahead(jobs, budget=10, workers=3)) == [(index, index * index) for index in range(6)]
+
+
+def test_jobs_in_flight_stay_within_the_budget():
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return True
+
+    results = pipeline.run_ahead([(index, 4, work) for index in range(8)], budget=10, workers=8)
+    assert [key for key, _ in results] == list(range(8))
+    # Only two cost-4 jobs fit in 10, counting the one being consumed
+    assert state["peak"] <= 2
+
+
+def test_an_oversized_job_still_runs_alone():
+    order = []
+    jobs = [("big", 100, lambda: order.append("big") or "big"), ("small", 1, lambda: order.append("small") or "small")]
+    assert list(pipeline.run_ahead(jobs, budget=10, workers=2)) == [("big", "big"), ("small", "small")]
+    assert order == ["big", "small"]
+
+
+def test_errors_surface_at_their_position():
+    def fail():
+        raise RuntimeError("decode failed")
+
+    results = pipeline.run_ahead([(0, 1, lambda: 0), (1, 1, fail), (2, 1, lambda: 2)], budget=10, workers=2)
+    assert next(results) == (0, 0)
+    with pytest.raises(RuntimeError, match="decode failed"):
+        next(results)
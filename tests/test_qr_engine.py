@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+import app as app_module
+import qr_engine
+
+pytestmark = pytest.mark.skipif(not qr_engine.QR_SUPPORTED, reason="qrcode is not installed")
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def _cache_stats(client):
+    return client.get("/api/qr/stats").get_json()["cache"]
+
+
+def test_png_is_a_two_colour_image_of_the_requested_size(client):
+    response = client.post("/api/qr", json={"payload": "https://example.com/png", "size": 256})
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    image = Image.open(io.BytesIO(response.get_data()))
+    assert image.size == (256, 256)
+    assert sorted(colour for _, colour in image.convert("RGB").getcolors()) == [(0, 0, 0), (255, 255, 255)]
+
+
+def test_svg_and_pdf_outputs(client):
+    svg = client.post("/api/qr", json={"payload": "https://example.com/svg", "format": "svg", "fg_color": "red"})
+    assert svg.mimetype == "image/svg+xml"
+    assert b"<svg" in svg.get_data() and b"#ff0000" in svg.get_data()
+
+    pdf = client.post("/api/qr", json={"payload": "https://example.com/pdf", "format": "pdf"})
+    assert pdf.mimetype == "application/pdf"
+    assert pdf.get_data().startswith(b"%PDF")
+
+
+def test_csv_batch_is_a_zip_with_one_member_per_row(client):
+    rows = "payload,filename\n" + "".join(f"https://example.com/{index},code{index % 3}\n" for index in range(7))
+    response = client.post(
+        "/api/qr",
+        data={"file": (io.BytesIO(rows.encode("utf-8")), "codes.csv"), "format": "png"},
+    )
+    assert response.status_code == 200
+    assert response.headers["X-QR-Count"] == "7"
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        names = archive.namelist()
+        assert len(names) == 7 and len(set(names)) == 7
+        assert {"code0.png", "code0_2.png", "code0_3.png"} <= set(names)
+        assert archive.read(names[0]).startswith(b"\x89PNG")
+
+
+def test_repeated_code_is_served_from_the_render_cache(client):
+    body = {"payload": "https://example.com/cached", "size": 200}
+    before = _cache_stats(client)
+    first = client.post("/api/qr", json=body).get_data()
+    second = client.post("/api/qr", json=body).get_data()
+    after = _cache_stats(client)
+
+    assert first == second
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_invalid_options_are_rejected(client):
+    assert client.post("/api/qr", json={"payload": "x", "format": "gif"}).status_code == 400
+    assert client.post("/api/qr", json={"payload": "x", "fg_color": "nope"}).status_code == 400
+    assert client.post("/api/qr", json={"payloads": []}).status_code == 400
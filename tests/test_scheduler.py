@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+
+
+def test_cost_grows_with_pixels_format_operation_and_enhancement():
+    icon = scheduler.estimate_cost(256 * 256, "png", "convert")
+    photo = scheduler.estimate_cost(12_000_000, "jpg", "convert")
+    heic = scheduler.estimate_cost(12_000_000, "heic", "convert")
+
+    assert icon < 1 < photo < heic
+    assert scheduler.estimate_cost(12_000_000, "jpg", "convert", enhance=True) > photo * 7
+    assert scheduler.estimate_cost(0, "jpg", "crop") == scheduler.PER_FILE_COST
+
+
+def test_requests_are_assigned_to_lanes_by_cost():
+    lanes = scheduler.LaneScheduler(slots=8, heavy_share=0.25, heavy_cost=12)
+    assert (lanes.lanes["fast"].limit, lanes.lanes["heavy"].limit) == (6, 2)
+    assert lanes.lane_for(scheduler.estimate_cost(1_000_000, "jpg", "convert")) == "fast"
+    assert lanes.lane_for(scheduler.estimate_cost(40_000_000, "heic", "convert", enhance=True)) == "heavy"
+
+    with lanes.slot(50) as lane:
+        assert lane == "heavy"
+        assert lanes.metrics()["lanes"]["heavy"]["running"] == 1
+    heavy = lanes.metrics()["lanes"]["heavy"]
+    assert (heavy["running"], heavy["admitted"], heavy["completed"], heavy["avg_cost"]) == (0, 1, 1, 50.0)
+
+
+def test_full_heavy_lane_does_not_block_the_fast_lane():
+    lanes = scheduler.LaneScheduler(slots=2, heavy_share=0.5, max_queue=0, timeout=5)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def heavy_job():
+        with lanes.slot(100):
+            entered.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=heavy_job)
+    worker.start()
+    try:
+        assert entered.wait(5)
+        # No queue room: the next heavy request is turned away at once
+        with pytest.raises(scheduler.LaneBusy) as err:
+            with lanes.slot(100):
+                pass
+        assert err.value.lane == "heavy"
+        with lanes.slot(0.1) as lane:
+            assert lane == "fast"
+    finally:
+        release.set()
+        worker.join()
+    assert lanes.metrics()["lanes"]["heavy"]["rejected"] == 1
+
+
+def test_waiting_request_times_out():
+    lanes = scheduler.LaneScheduler(slots=2, heavy_share=0.5, timeout=0.05)
+    with lanes.slot(0.1):
+        started = time.perf_counter()
+        with pytest.raises(scheduler.LaneBusy):
+            with lanes.slot(0.1):
+                pass
+        assert time.perf_counter() - started < 2
+    assert lanes.metrics()["lanes"]["fast"]["timed_out"] == 1
@@ -0,0 +1,87 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+import site_build
+
+PAGE = """<!doctype html><html><head>
+<link rel="stylesheet" href="/static/css/base.css">
+<link rel="stylesheet" href="/static/css/theme.css">
+</head><body>{body}<script src="/static/js/app.js"></script></body></html>"""
+
+
+@pytest.fixture
+def site(tmp_path):
+    static = tmp_path / "static"
+    (static / "css" / "img").mkdir(parents=True)
+    (static / "js").mkdir()
+    (static / "css" / "base.css").write_text('@import "reset.css";\nbody { background: url(img/bg.png); }\n' * 20, encoding="utf-8")
+    (static / "css" / "reset.css").write_text("* { margin: 0; }\n", encoding="utf-8")
+    (static / "css" / "theme.css").write_text("h1 { color: red; }\n", encoding="utf-8")
+    (static / "js" / "app.js").write_text("console.log('ready')\n", encoding="utf-8")
+
+    app = Flask(__name__, static_folder=str(static))
+
+    @app.route("/")
+    def index():
+        return PAGE.format(body="<h1>Convert</h1>" * 50)
+
+    @app.route("/api/status")
+    def status():
+        return PAGE.format(body="dynamic")
+
+    manifest = site_build.build(app, static / "dist")
+    return app, manifest, site_build.load(static / "dist", page_max_age=300)
+
+
+def test_build_renders_static_pages_with_bundled_assets(site):
+    _, manifest, prebuilt = site
+    assert list(manifest["pages"]) == ["/"]
+
+    css, js = sorted(manifest["assets"], key=lambda url: url.endswith(".js"))
+    assert manifest["assets"][css]["sources"] == ["/static/css/base.css", "/static/css/theme.css"]
+    assert manifest["assets"][js]["sources"] == ["/static/js/app.js"]
+    html = prebuilt.entries["/"]["bodies"]["identity"].decode("utf-8")
+    assert f'<link rel="stylesheet" href="{css}">' in html and f'<script src="{js}"></script>' in html
+    assert "/static/css/base.css" not in html
+
+    stylesheet = prebuilt.entries[css]["bodies"]["identity"].decode("utf-8")
+    assert stylesheet.count("* { margin: 0; }") == 1
+    assert "url(/static/css/img/bg.png)" in stylesheet
+
+
+def test_encoding_is_negotiated_from_accept_encoding(site):
+    app, _, prebuilt = site
+    with app.test_request_context("/", headers={"Accept-Encoding": "gzip, deflate"}):
+        response = prebuilt.respond("/")
+        assert response.content_encoding == "gzip"
+        assert gzip.decompress(response.get_data()) == prebuilt.entries["/"]["bodies"]["identity"]
+        assert "Accept-Encoding" in response.vary
+        gzip_etag = response.get_etag()[0]
+    with app.test_request_context("/"):
+        response = prebuilt.respond("/")
+        assert response.content_encoding is None
+        assert response.get_etag()[0] != gzip_etag
+        assert response.cache_control.max_age == 300
+
+
+def test_matching_if_none_match_gets_304(site):
+    app, _, prebuilt = site
+    with app.test_request_context("/"):
+        etag = prebuilt.respond("/").get_etag()[0]
+    with app.test_request_context("/", headers={"If-None-Match": f'"{etag}"'}):
+        response = prebuilt.respond("/")
+        assert response.status_code == 304
+    with app.test_request_context("/", headers={"If-None-Match": '"stale"'}):
+        assert prebuilt.respond("/").status_code == 200
+
+
+def test_bundles_are_immutable_and_unknown_paths_fall_through(site):
+    app, manifest, prebuilt = site
+    bundle = next(iter(manifest["assets"]))
+    with app.test_request_context(bundle):
+        response = prebuilt.respond(bundle)
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == site_build.IMMUTABLE_MAX_AGE
+        assert prebuilt.respond("/api/status") is None
@@ -0,0 +1,84 @@
+import errno
+import hashlib
+import os
+import time
+
+import pytest
+
+import storage
+
+
+def _staged(store: storage.Storage, data: bytes, ext: str = "png"):
+    path = store.staging(ext)
+    path.write_bytes(data)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return storage.LocalStorage(tmp_path / "objects")
+
+
+def test_commit_publishes_under_the_content_key(store):
+    path = _staged(store, b"payload")
+    key = store.commit(path, "PNG")
+
+    assert key == f"{hashlib.sha256(b'payload').hexdigest()}.png"
+    assert not path.exists()
+    assert store.path(key) == store.root / key[:2] / key[2:4] / key
+    with store.open(key) as handle:
+        assert handle.read() == b"payload"
+    assert list(store.staging_dir.iterdir()) == []
+
+
+def test_identical_bytes_share_one_object_and_refresh_its_age(store):
+    key = store.commit(_staged(store, b"same"), "png")
+    os.utime(store.path(key), (0, 0))
+
+    assert store.commit(_staged(store, b"same"), "png") == key
+    assert [name for name, _ in store.objects()] == [key]
+    assert store.path(key).stat().st_mtime > time.time() - 60
+
+
+def test_commit_rejects_unusable_extensions(store):
+    with pytest.raises(storage.StorageError):
+        store.commit(_staged(store, b"data", "bin"), "not/an/ext")
+
+
+def test_cross_device_staging_still_lands_with_a_rename(store, monkeypatch):
+    real_replace = os.replace
+    calls = []
+
+    def replace(source, target):
+        calls.append((str(source), str(target)))
+        if len(calls) == 1:
+            raise OSError(errno.EXDEV, "cross-device link")
+        real_replace(source, target)
+
+    monkeypatch.setattr(storage.os, "replace", replace)
+    path = _staged(store, b"moved")
+    key = store.commit(path, "png")
+
+    assert store.path(key).read_bytes() == b"moved"
+    assert calls[1][0].endswith(".partial") and calls[1][1] == str(store.path(key))
+    assert not path.exists()
+    assert not list(store.path(key).parent.glob("*.partial"))
+
+
+def test_sweep_removes_old_unreferenced_objects_and_abandoned_staging(store):
+    old = store.commit(_staged(store, b"old"), "png")
+    kept = store.commit(_staged(store, b"kept"), "png")
+    fresh = store.commit(_staged(store, b"fresh"), "png")
+    abandoned = _staged(store, b"half written")
+    for stale in (store.path(old), store.path(kept), abandoned):
+        os.utime(stale, (0, 0))
+
+    assert store.sweep(older_than=time.time() - 60, keep=[kept]) == 1
+    assert not store.exists(old)
+    assert store.exists(kept) and store.exists(fresh)
+    assert not abandoned.exists()
+
+
+def test_backends_must_implement_the_interface(tmp_path):
+    with pytest.raises(TypeError):
+        storage.Storage(tmp_path)
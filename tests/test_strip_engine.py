@@ -0,0 +1,77 @@
+import pytest
+from PIL import Image, ImageChops
+
+import strip_engine
+
+
+def _gradient(mode: str, size=(97, 61)) -> Image.Image:
+    width, height = size
+    image = Image.new("RGBA", size)
+    image.putdata([((x * 7) % 256, (y * 11) % 256, (x * y) % 256, 255 - (x + y) % 256) for y in range(height) for x in range(width)])
+    return image.convert(mode)
+
+
+def _max_difference(first: Image.Image, second: Image.Image) -> int:
+    assert first.size == second.size
+    extrema = ImageChops.difference(first, second).getextrema()
+    return max(high for _, high in extrema) if isinstance(extrema[0], tuple) else extrema[1]
+
+
+@pytest.fixture(autouse=True)
+def small_bands(monkeypatch):
+    # A few rows per band, so every image crosses many band boundaries
+    monkeypatch.setattr(strip_engine, "BAND_BYTES", 97 * 4 * 5)
+
+
+@pytest.mark.parametrize(
+    "mode, suffix, reader",
+    [
+        ("RGB", "png", strip_engine.PngBandReader),
+        ("RGBA", "png", strip_engine.PngBandReader),
+        ("L", "png", strip_engine.PngBandReader),
+        ("RGB", "bmp", strip_engine.RawBandReader),
+        ("RGB", "ppm", strip_engine.RawBandReader),
+        ("RGB", "tiff", strip_engine.RawBandReader),
+        ("RGB", "jpg", strip_engine.FullBandReader),
+    ],
+)
+def test_banded_convert_matches_a_full_decode(tmp_path, mode, suffix, reader):
+    source = tmp_path / f"source.{suffix}"
+    _gradient(mode).save(source)
+    bands = strip_engine.open_bands(source)
+    try:
+        assert type(bands) is reader
+    finally:
+        bands.close()
+
+    for fmt in ("png", "tiff"):
+        target = tmp_path / f"out.{fmt}"
+        assert strip_engine.stream_convert(source, target, fmt) == (97, 61)
+        with Image.open(source) as full, Image.open(target) as streamed:
+            assert streamed.mode == full.mode
+            assert _max_difference(streamed, full) == 0
+
+
+def test_banded_crop_matches_a_full_crop(tmp_path):
+    source = tmp_path / "source.png"
+    _gradient("RGB").save(source)
+    box = (5, 13, 90, 52)
+
+    assert strip_engine.stream_crop(source, tmp_path / "out.png", box, "png") == (85, 39)
+    with Image.open(source) as full, Image.open(tmp_path / "out.png") as streamed:
+        assert _max_difference(streamed, full.crop(box)) == 0
+
+
+@pytest.mark.parametrize("size", [(40, 25), (150, 90)])
+def test_banded_resize_matches_a_full_resize(tmp_path, size):
+    source = tmp_path / "source.png"
+    _gradient("RGB").save(source)
+
+    strip_engine.stream_resize(source, tmp_path / "out.png", size, "png")
+    with Image.open(source) as full, Image.open(tmp_path / "out.png") as streamed:
+        assert _max_difference(streamed, full.resize(size, Image.LANCZOS)) <= 1
+
+
+def test_base_classes_cannot_be_instantiated(tmp_path):
+    with pytest.raises(TypeError):
+        strip_engine.StreamWriter(tmp_path / "out.bin")
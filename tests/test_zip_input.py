@@ -0,0 +1,42 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+import app as app_module
+import zip_input
+
+
+def _archive(members) -> zipfile.ZipFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return zip_input.open_archive(buffer)
+
+
+def _png(size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_scan_skips_noise_and_unsupported_members():
+    archive = _archive({"a/x.png": _png(), "b/x.png": _png(), "notes.txt": b"hi", "__MACOSX/._x.png": b""})
+    scanned = zip_input.scan(archive, app_module.ALLOWED_EXTENSIONS)
+
+    assert [info.filename for info in scanned["accepted"]] == ["a/x.png", "b/x.png"]
+    assert scanned["skipped"] == [{"name": "notes.txt", "reason": "unsupported file type: txt"}]
+    assert [member.filename for member in zip_input.iter_members(archive, scanned["accepted"])] == ["x.png", "x_2.png"]
+
+
+def test_member_that_inflates_past_the_limit_leaves_no_partial_upload(monkeypatch):
+    archive = _archive({"big.png": _png((256, 256))})
+    [member] = zip_input.iter_members(archive, zip_input.scan(archive, app_module.ALLOWED_EXTENSIONS)["accepted"])
+    # The first block is written before the byte count catches the overrun
+    monkeypatch.setattr(zip_input, "ZIP_MAX_MEMBER_BYTES", zip_input.COPY_BLOCK + 1)
+
+    with pytest.raises(ValueError, match="inflates past"):
+        app_module.handle_file(member, {}, "convert", {"format": "png"}, False, "zipjob", 0, set())
+    assert not list(app_module.UPLOAD_FOLDER.glob("zipjob_*"))